@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Concurrent-writer stress test for note storage.
+
+Starts many processes against one throw-away NOTES_DIR (inside a
+temporary HOME, so real notes are never touched):
+
+- appenders add numbered lines to a shared note, with optimistic
+  read / `write(expected_hash=...)` / retry-on-conflict cycles,
+- status updaters keep changing the same note's status,
+- readers keep reading it and check every version they see is whole,
+- creators race to create the same new note.
+
+Afterwards it checks that
+
+- every appended line is present exactly once (no lost updates),
+- no reader ever saw a partial note (no torn writes),
+- exactly one creator succeeded,
+- the metadata index matches the notes, and no temporary or lock
+  files were left behind.
+
+Usage:
+    python benchmarks/concurrency.py [--backend filesystem|sqlite]
+                                     [--appenders N] [--updaters N]
+                                     [--readers N] [--iterations N]
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SHARED_TITLE = "Shared Note"
+RACE_TITLE = "Race Note"
+
+_HEADER_RE = re.compile(r"<!-- status: (open|in progress|done) -->\n")
+_LINE_RE = re.compile(r"writer-\d+ line-\d+\n")
+
+
+# ----------------------------------------------------------------------
+# Worker processes
+# ----------------------------------------------------------------------
+def _worker(role, number, iterations):
+    """
+    Run one worker; prints a JSON summary on stdout.
+    """
+    from notes.config import STATUSES
+    from notes.storage import ConflictError, get_backend
+    from notes.utils.hashing import content_hash
+
+    backend = get_backend()
+    result = {"role": role, "conflicts": 0, "torn": [], "created": False}
+
+    if role == "appender":
+        for line in range(iterations):
+            while True:
+                text = backend.read(SHARED_TITLE)
+                try:
+                    backend.write(
+                        SHARED_TITLE,
+                        f"{text}writer-{number} line-{line}\n",
+                        expected_hash=content_hash(text.encode("utf-8")),
+                    )
+                    break
+                except ConflictError:
+                    result["conflicts"] += 1
+
+    elif role == "updater":
+        for i in range(iterations):
+            backend.set_status(SHARED_TITLE, STATUSES[(number + i) % len(STATUSES)])
+
+    elif role == "reader":
+        deadline = time.monotonic() + iterations * 0.02
+        while time.monotonic() < deadline:
+            text = backend.read(SHARED_TITLE)
+            if not _is_whole(text):
+                result["torn"].append(text[:200])
+
+    elif role == "creator":
+        try:
+            backend.create(RACE_TITLE, f"<!-- status: open -->\n# {RACE_TITLE}\n\n{number}\n")
+            result["created"] = True
+        except FileExistsError:
+            pass
+
+    print(json.dumps(result))
+
+
+def _is_whole(text):
+    """
+    A version of the shared note as some writer left it.
+    """
+    match = _HEADER_RE.match(text)
+    if match is None or not text.startswith(f"# {SHARED_TITLE}\n\n", match.end()):
+        return False
+    body = text[match.end() + len(SHARED_TITLE) + 4:]
+    return _LINE_RE.sub("", body) == ""
+
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+def _spawn(role, number, iterations, env):
+    return subprocess.Popen(
+        [sys.executable, __file__, "--worker", role, str(number), str(iterations)],
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+
+def _check_index(env):
+    """
+    Compare the filesystem backend's index with the notes on disk.
+    """
+    script = (
+        "import json\n"
+        "from notes.storage.index import refresh_index\n"
+        "from notes.utils.hashing import content_hash\n"
+        "from notes.config import NOTES_DIR\n"
+        "bad = [name for name, entry in refresh_index().items()\n"
+        "       if entry['hash'] != content_hash((NOTES_DIR / name).read_bytes())]\n"
+        "print(json.dumps(bad))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], env=env, stdout=subprocess.PIPE, text=True, check=True
+    ).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", choices=("filesystem", "sqlite"), default="filesystem")
+    parser.add_argument("--appenders", type=int, default=4)
+    parser.add_argument("--updaters", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--creators", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--worker", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        role, number, iterations = args.worker
+        _worker(role, int(number), int(iterations))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="notes-concurrency-") as home:
+        env = dict(os.environ)
+        env.update(
+            HOME=home,
+            NOTES_BACKEND=args.backend,
+            NOTES_NO_DAEMON="1",
+            PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT / "src"), env.get("PYTHONPATH")])),
+        )
+        subprocess.run(
+            [sys.executable, "-c",
+             "from notes.storage import get_backend\n"
+             f"get_backend().write({SHARED_TITLE!r}, '<!-- status: open -->\\n# {SHARED_TITLE}\\n\\n')"],
+            env=env, check=True,
+        )
+
+        start = time.perf_counter()
+        procs = (
+            [_spawn("appender", n, args.iterations, env) for n in range(args.appenders)]
+            + [_spawn("updater", n, args.iterations, env) for n in range(args.updaters)]
+            + [_spawn("reader", n, args.iterations, env) for n in range(args.readers)]
+            + [_spawn("creator", n, args.iterations, env) for n in range(args.creators)]
+        )
+        results = []
+        for proc in procs:
+            out, _ = proc.communicate()
+            if proc.returncode != 0:
+                print(f"FAIL  worker exited with status {proc.returncode}")
+                sys.exit(1)
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        elapsed = time.perf_counter() - start
+
+        read_env = dict(env)
+        final = subprocess.run(
+            [sys.executable, "-c",
+             "import sys\nfrom notes.storage import get_backend\n"
+             f"sys.stdout.write(get_backend().read({SHARED_TITLE!r}))"],
+            env=read_env, stdout=subprocess.PIPE, text=True, check=True,
+        ).stdout
+
+        failures = []
+        expected = {
+            f"writer-{n} line-{line}"
+            for n in range(args.appenders)
+            for line in range(args.iterations)
+        }
+        lines = final.splitlines()
+        found = [line for line in lines if line.startswith("writer-")]
+        missing = expected - set(found)
+        if missing:
+            failures.append(f"{len(missing)} appended lines lost, e.g. {sorted(missing)[:3]}")
+        if len(found) != len(set(found)):
+            failures.append(f"{len(found) - len(set(found))} appended lines duplicated")
+        if not _is_whole(final):
+            failures.append("final note is malformed")
+
+        torn = [text for result in results for text in result["torn"]]
+        if torn:
+            failures.append(f"{len(torn)} partial notes read, e.g. {torn[0]!r}")
+
+        created = sum(result["created"] for result in results)
+        if args.creators and created != 1:
+            failures.append(f"{created} creators succeeded (expected exactly 1)")
+
+        notes_dir = Path(home) / ".local" / "share" / "notes"
+        leftovers = [p.name for p in notes_dir.rglob("*.tmp")]
+        leftovers += [p.name for p in (notes_dir / ".notes" / "locks").glob("*")]
+        if leftovers:
+            failures.append(f"temporary or lock files left behind: {leftovers[:5]}")
+
+        if args.backend == "filesystem":
+            stale = _check_index(env)
+            if stale:
+                failures.append(f"index out of date for {stale}")
+
+        conflicts = sum(result["conflicts"] for result in results)
+        print(
+            f"{args.backend}: {len(procs)} processes, {len(found)} appends, "
+            f"{args.updaters * args.iterations} status updates, "
+            f"{conflicts} conflicts retried, {elapsed:.2f}s"
+        )
+        for failure in failures:
+            print(f"FAIL  {failure}")
+        if failures:
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
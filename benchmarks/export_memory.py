@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Peak memory of exporting a very large note to HTML.
+
+Writes one synthetic note of the given size (log lines with headings,
+lists and fenced code, like archived raw logs) into a throw-away notes
+directory (inside a temporary HOME, so real notes are never touched),
+exports it with `notes export --title ... --html --force` and measures
+the peak resident set size of that process.
+
+Afterwards it checks that
+
+- the peak RSS stayed below the budget, however large the note,
+- the export contains the note's last line,
+- the export manifest recorded the note's content hash.
+
+Usage:
+    python benchmarks/export_memory.py [--size-mb N] [--budget-mb N]
+                                       [--backend filesystem|sqlite]
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+TITLE = "Raw Log"
+LAST_LINE = "end-of-log marker"
+
+
+# ----------------------------------------------------------------------
+# Synthetic note
+# ----------------------------------------------------------------------
+def _write_note(path, size):
+    """
+    Write about `size` bytes of Markdown to `path`; returns its SHA-256.
+    """
+    digest = hashlib.sha256()
+    with open(path, "wb") as fh:
+        def put(text):
+            data = text.encode("utf-8")
+            digest.update(data)
+            fh.write(data)
+
+        put(f"<!-- status: open -->\n# {TITLE}\n\n")
+        written = 0
+        section = 0
+        while written < size:
+            section += 1
+            lines = [f"## Section {section}\n\n"]
+            lines += [
+                f"2024-05-01T12:{i % 60:02d}:00 INFO request id={section}-{i} took {i % 97}ms\n"
+                for i in range(400)
+            ]
+            lines.append("\n- retried: *3*\n- failed: **0**\n\n```\nstack trace\n  at main()\n```\n\n")
+            block = "".join(lines)
+            put(block)
+            written += len(block)
+        put(f"\n{LAST_LINE}\n")
+    return digest.hexdigest()
+
+
+def _peak_rss_mb(argv, env):
+    """
+    Run a command; return its exit status and peak RSS in MiB.
+    """
+    proc = subprocess.Popen(argv, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # Kilobytes on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return proc.returncode, usage.ru_maxrss * scale / (1 << 20)
+
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size-mb", type=int, default=200, help="Size of the note (default: 200)")
+    parser.add_argument(
+        "--budget-mb", type=int, default=150, help="Allowed peak RSS of the export (default: 150)"
+    )
+    parser.add_argument("--backend", choices=("filesystem", "sqlite"), default="filesystem")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="notes-export-memory-") as home:
+        env = dict(os.environ)
+        env.update(
+            HOME=home,
+            NOTES_BACKEND=args.backend,
+            NOTES_NO_DAEMON="1",
+            PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT / "src"), env.get("PYTHONPATH")])),
+        )
+        # Results must not depend on the caller's rendering settings
+        env.pop("NOTES_MARKDOWN_EXTRAS", None)
+        env.pop("NOTES_TRACE", None)
+
+        notes_dir = Path(home) / ".local" / "share" / "notes"
+        notes_dir.mkdir(parents=True)
+        note_path = notes_dir / (TITLE.replace(" ", "_") + ".md")
+        source_hash = _write_note(note_path, args.size_mb << 20)
+        if args.backend == "sqlite":
+            subprocess.run(
+                [sys.executable, "-m", "notes.main", "migrate", "--to", "sqlite"],
+                env=dict(env, NOTES_BACKEND="filesystem"), stdout=subprocess.DEVNULL, check=True,
+            )
+            note_path.unlink()
+
+        start = time.perf_counter()
+        code, peak = _peak_rss_mb(
+            [sys.executable, "-m", "notes.main", "export", "--title", TITLE, "--html", "--force"],
+            env,
+        )
+        elapsed = time.perf_counter() - start
+
+        failures = []
+        if code != 0:
+            failures.append(f"export exited with status {code}")
+        if peak > args.budget_mb:
+            failures.append(f"peak RSS {peak:.0f} MiB exceeds the budget of {args.budget_mb} MiB")
+
+        out_path = Path(home) / "Downloads" / (TITLE.replace(" ", "_") + ".html")
+        if not out_path.exists():
+            failures.append(f"{out_path.name} was not written")
+        else:
+            with open(out_path, "rb") as fh:
+                fh.seek(max(0, out_path.stat().st_size - 4096))
+                if LAST_LINE.encode() not in fh.read():
+                    failures.append("the export does not end with the note's last line")
+
+        try:
+            manifest = json.loads((notes_dir / ".notes" / "exports.json").read_text())
+        except FileNotFoundError:
+            manifest = {}
+        recorded = [entry.get("source") for entry in manifest.get("outputs", {}).values()]
+        if source_hash not in recorded:
+            failures.append("the export manifest does not record the note's hash")
+
+        print(
+            f"{args.backend}: exported a {args.size_mb} MiB note in {elapsed:.1f}s, "
+            f"peak RSS {peak:.0f} MiB (budget {args.budget_mb} MiB)"
+        )
+        for failure in failures:
+            print(f"FAIL  {failure}")
+        if failures:
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
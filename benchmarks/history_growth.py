@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Storage used by the version history of a note edited many times.
+
+Creates one note of the given size in a throw-away notes directory
+(inside a temporary HOME, so real notes are never touched), then saves
+it again and again, changing a few lines or appending a few each time,
+and records every version as `notes edit` does. Then it changes the
+note's status again and again, recording each change as `notes status`
+does.
+
+Afterwards it checks that
+
+- the history takes at most the budget (by default 2% of the note's
+  size per version, where full copies would take 100%),
+- every version reads back exactly as it was saved,
+- saving an unchanged note records nothing,
+- a status change adds under 1 KiB to the history, however large the
+  note (it is recorded from streamed hashes, without a diff).
+
+Usage:
+    python benchmarks/history_growth.py [--size-kb N] [--versions N]
+                                        [--status-changes N] [--budget PERCENT]
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+TITLE = "Growing Note"
+
+
+def _database_size(path):
+    # The database with its write-ahead log, if not checkpointed yet
+    files = [path, path.with_name(path.name + "-wal")]
+    return sum(f.stat().st_size for f in files if f.exists())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size-kb", type=int, default=512, help="Size of the note (default: 512)")
+    parser.add_argument("--versions", type=int, default=200, help="Versions saved (default: 200)")
+    parser.add_argument(
+        "--status-changes", type=int, default=50, help="Status changes made (default: 50)"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=2,
+        metavar="PERCENT",
+        help="Allowed history size per version, in percent of the note (default: 2)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="notes-history-") as home:
+        # The notes modules read their locations when imported
+        os.environ.update(HOME=home, NOTES_BACKEND="filesystem")
+        os.environ.pop("NOTES_NO_HISTORY", None)
+        sys.path.insert(0, str(REPO_ROOT / "src"))
+        from notes.config import HISTORY_DB_PATH
+        from notes.storage.backends import get_backend
+        from notes.storage.history import (
+            load_blob,
+            record_version,
+            recording_status_change,
+            versions,
+        )
+
+        rng = random.Random(1)
+        lines = ["<!-- status: open -->\n", f"# {TITLE}\n", "\n"]
+        while sum(map(len, lines)) < args.size_kb << 10:
+            lines.append(
+                f"- item {len(lines)}: {rng.getrandbits(64):016x} measured {rng.random():.4f}\n"
+            )
+
+        backend = get_backend()
+        saved = {}
+        start = time.perf_counter()
+        for number in range(args.versions):
+            if number:
+                # A small edit: a few lines changed, a few appended
+                for _ in range(3):
+                    row = rng.randrange(3, len(lines))
+                    lines[row] = lines[row].replace("measured", "remeasured", 1)
+                lines.append(f"- entry of save {number}\n")
+            text = "".join(lines)
+            backend.write(TITLE, text)
+            digest = record_version(TITLE, "edit")
+            saved[digest] = text
+        elapsed = time.perf_counter() - start
+        edits_size = _database_size(HISTORY_DB_PATH)
+
+        statuses = ("done", "in progress", "open")
+        start = time.perf_counter()
+        for number in range(args.status_changes):
+            with recording_status_change([TITLE]):
+                backend.set_status(TITLE, statuses[number % len(statuses)])
+            saved[versions(TITLE)[-1].hash] = backend.read(TITLE)
+        status_elapsed = time.perf_counter() - start
+        status_growth = _database_size(HISTORY_DB_PATH) - edits_size
+
+        failures = []
+        if record_version(TITLE, "edit") is not None:
+            failures.append("an unchanged note was recorded again")
+        recorded = set(v.hash for v in versions(TITLE))
+        if recorded != set(saved) or len(versions(TITLE)) != args.versions + args.status_changes:
+            failures.append(f"{len(versions(TITLE))} versions recorded, {len(saved)} distinct saved")
+        damaged = sum(load_blob(digest).decode("utf-8") != text for digest, text in saved.items())
+        if damaged:
+            failures.append(f"{damaged} versions do not read back as saved")
+
+        note_size = len("".join(lines).encode("utf-8"))
+        full_copies = note_size * args.versions
+        per_version = edits_size / args.versions / note_size * 100
+        if per_version > args.budget:
+            failures.append(
+                f"{per_version:.1f}% of the note per version exceeds the budget of {args.budget}%"
+            )
+        per_status = status_growth / max(1, args.status_changes)
+        if per_status > 1024:
+            failures.append(f"a status change adds {per_status:.0f} bytes to the history")
+
+        print(
+            f"{args.versions} versions of a {note_size >> 10} KiB note in {elapsed:.1f}s: "
+            f"history {edits_size >> 10} KiB ({per_version:.2f}% of the note per version; "
+            f"full copies would take {full_copies >> 20} MiB)"
+        )
+        print(
+            f"{args.status_changes} status changes in {status_elapsed:.1f}s "
+            f"({status_elapsed / max(1, args.status_changes) * 1000:.0f} ms each), "
+            f"history grew {status_growth} bytes"
+        )
+        for failure in failures:
+            print(f"FAIL  {failure}")
+        if failures:
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the `notes` entry point.
+
+Runs each subcommand in a fresh interpreter with `-X importtime`, inside a
+throw-away HOME so real notes are never touched, and checks that
+
+- the time spent importing modules beyond what a bare `python -m` run
+  already loads stays within the per-command budget, and
+- modules that the command does not need (WeasyPrint, markdown2, Rich)
+  are never imported.
+
+Usage:
+    python benchmarks/startup.py [--repeat N] [--scale FACTOR]
+
+Exits with status 1 if any budget is exceeded.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# ----------------------------------------------------------------------
+# Budgets
+# (command line, import budget in milliseconds, forbidden top-level modules)
+# ----------------------------------------------------------------------
+CASES = [
+    (["-V"], 120, {"weasyprint", "markdown2", "sqlite3"}),
+    (["add", "--title", "Bench Note"], 100, {"weasyprint", "markdown2"}),
+    (["edit", "--title", "Bench Note"], 60, {"weasyprint", "markdown2", "rich"}),
+    (["status", "--title", "Bench Note", "--set", "done"], 100, {"weasyprint", "markdown2"}),
+    (["list"], 120, {"weasyprint", "markdown2", "sqlite3"}),
+    (["backup"], 100, {"weasyprint", "markdown2", "sqlite3"}),
+    (["export", "--title", "Bench Note", "--html"], 150, {"weasyprint", "sqlite3"}),
+]
+
+# `import time: self [us] | cumulative | imported package`
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _importtime(cmd, env):
+    """
+    Run a command under `-X importtime` and return {module: self time in us}.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *cmd],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, _, _, name = match.groups()
+            times[name] = int(self_us)
+    return times
+
+
+def _measure(args, env, baseline):
+    """
+    Run one command and return (import time in ms, imported top-level modules),
+    ignoring modules the interpreter loads for any `python -m` invocation.
+    """
+    times = _importtime(["-m", "notes.main", *args], env)
+    own = {name: us for name, us in times.items() if name not in baseline}
+    return sum(own.values()) / 1000, {name.split(".")[0] for name in times}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command (best is kept)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply all budgets (slow machines)")
+    opts = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ)
+        env["HOME"] = home
+        env["EDITOR"] = "true"
+        env["PYTHONPATH"] = os.pathsep.join(
+            p for p in [str(REPO_ROOT / "src"), env.get("PYTHONPATH")] if p
+        )
+
+        # Seed one note so edit/status/export have something to work on
+        subprocess.run(
+            [sys.executable, "-m", "notes.main", "add", "--title", "Bench Note"],
+            env=env, stdout=subprocess.DEVNULL, check=True,
+        )
+
+        baseline = set(_importtime(["-c", "import runpy"], env))
+
+        print(f"{'command':<50} {'best ms':>8} {'budget':>8}")
+        for args, budget_ms, forbidden in CASES:
+            budget_ms *= opts.scale
+            best = None
+            modules = set()
+            for _ in range(opts.repeat):
+                elapsed, modules = _measure(args, env, baseline)
+                best = elapsed if best is None else min(best, elapsed)
+
+            leaked = sorted(forbidden & modules)
+            ok = best <= budget_ms and not leaked
+            failures += not ok
+
+            label = "notes " + " ".join(args)
+            line = f"{label:<50} {best:8.1f} {budget_ms:8.0f}"
+            if leaked:
+                line += f"  imported: {', '.join(leaked)}"
+            print(line + ("" if ok else "  FAIL"))
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
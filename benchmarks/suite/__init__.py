@@ -0,0 +1,12 @@
+"""
+End-to-end benchmark suite for the `notes` CLI.
+
+Generates synthetic notes directories (see `corpus`), times every
+subcommand against them in fresh processes (see `cases`), and stores
+the results as JSON that later runs compare against (see `results`).
+
+Run from the repository root:
+
+    python -m benchmarks.suite --notes 1k,10k --output results.json
+    python -m benchmarks.suite --notes 1k,10k --baseline results.json
+"""
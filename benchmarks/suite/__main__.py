@@ -0,0 +1,216 @@
+"""
+Run the benchmark suite.
+
+Usage:
+    python -m benchmarks.suite [--notes 1k,10k] [--sizes small] [--backend filesystem]
+                               [--repeat N] [--cases PATTERN,...] [--pdf]
+                               [--output FILE] [--baseline FILE] [--threshold 0.2]
+    python -m benchmarks.suite --generate DIR [--notes 100k] [--sizes mixed]
+
+Each corpus is generated into a throw-away HOME (under --tmpdir) and
+deleted afterwards unless --keep is given. Exits with status 1 if a
+case fails or regresses against the baseline.
+"""
+import argparse
+import fnmatch
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from . import results as results_mod
+from .cases import Context, cases_for, make_env, run_case, warm_up
+from .corpus import SIZE_DISTRIBUTIONS, generate_corpus
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+_SUFFIXES = {"k": 1000, "m": 1000000}
+
+
+def _count(value: str) -> int:
+    """
+    "500", "10k" or "1M" → number of notes.
+    """
+    value = value.strip().lower()
+    factor = _SUFFIXES.get(value[-1:], 1)
+    digits = value[:-1] if factor > 1 else value
+    try:
+        return int(float(digits) * factor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid note count: {value!r}")
+
+
+def _label(count: int) -> str:
+    for suffix, factor in (("M", 1000000), ("k", 1000)):
+        if count >= factor and count % factor == 0:
+            return f"{count // factor}{suffix}"
+    return str(count)
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1 << 20):,.1f} MB"
+
+
+# ----------------------------------------------------------------------
+# One corpus
+# ----------------------------------------------------------------------
+def _bench_corpus(opts, count: int, results: dict, baseline) -> int:
+    """
+    Generate one corpus and run every selected case; returns the number
+    of failed or regressed cases.
+    """
+    corpus_key = f"{_label(count)}-{opts.sizes}"
+    if opts.backend != "filesystem":
+        corpus_key += f"-{opts.backend}"
+
+    home = Path(tempfile.mkdtemp(prefix="notes-bench-", dir=opts.tmpdir))
+    try:
+        print(f"\n== {corpus_key}: generating {count:,} notes in {home}", flush=True)
+        info = generate_corpus(
+            home / ".local" / "share" / "notes",
+            count,
+            opts.sizes,
+            opts.seed,
+            progress=lambda n: print(f"   {n:,} notes", flush=True),
+        )
+        print(f"   {_megabytes(info.total_bytes)} in {info.seconds:.1f}s")
+        results["corpora"][corpus_key] = info._asdict()
+
+        env = make_env(home, "filesystem", REPO_ROOT)
+        if opts.backend != "filesystem":
+            subprocess.run(
+                [sys.executable, "-m", "notes.main", "migrate", "--to", opts.backend],
+                cwd=home, env=env, stdout=subprocess.DEVNULL, check=True,
+            )
+            env = make_env(home, opts.backend, REPO_ROOT)
+        ctx = Context(home, count, env)
+        warm_up(ctx)
+
+        print(f"{'case':<32} {'best ms':>10} {'median ms':>10} {'baseline':>10} {'change':>8}")
+        failures = 0
+        for case in cases_for(count):
+            if opts.cases and not any(fnmatch.fnmatchcase(case.name, p) for p in opts.cases):
+                continue
+            if case.needs_pdf and not opts.pdf:
+                continue
+            if case.max_notes is not None and count > case.max_notes:
+                print(f"{case.name:<32} {'skipped (corpus too large)':>30}")
+                continue
+
+            timing = run_case(case, ctx, opts.repeat)
+            key = f"{corpus_key}/{case.name}"
+            entry = results_mod.record(results, key, timing.samples, timing.error)
+            line = f"{case.name:<32}"
+            if timing.error:
+                failures += 1
+                print(f"{line} FAILED: {timing.error}")
+                continue
+            line += f" {entry['best'] * 1000:10.1f} {entry['median'] * 1000:10.1f}"
+
+            if baseline is not None:
+                comparison = results_mod.compare(
+                    {"results": {key: entry}}, baseline, opts.threshold
+                )
+                if comparison:
+                    c = comparison[0]
+                    if c.baseline is not None:
+                        line += f" {c.baseline * 1000:10.1f}"
+                    if c.change is not None:
+                        line += f" {c.change:+8.0%}"
+                    if c.regressed:
+                        failures += 1
+                        line += "  REGRESSION"
+            print(line, flush=True)
+        return failures
+    finally:
+        if opts.keep:
+            print(f"   kept {home}")
+        else:
+            shutil.rmtree(home, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------
+# Entry point
+# ----------------------------------------------------------------------
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite",
+        description="Time every notes subcommand against synthetic notes directories.",
+    )
+    parser.add_argument(
+        "--notes",
+        default="1k",
+        type=lambda v: [_count(part) for part in v.split(",")],
+        help="Corpus sizes, comma-separated (e.g. 1k,10k,100k,1M; default: 1k)",
+    )
+    parser.add_argument(
+        "--sizes",
+        choices=sorted(SIZE_DISTRIBUTIONS),
+        default="small",
+        help="Note size distribution: tiny (<300 B), small (~1.5 kB), "
+             "mixed (mostly small, some up to 8 MB), large (~256 kB) (default: small)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument(
+        "--backend", choices=["filesystem", "sqlite"], default="filesystem",
+        help="Storage backend to benchmark (default: filesystem)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case (default: 3)")
+    parser.add_argument(
+        "--cases",
+        type=lambda v: [p.strip() for p in v.split(",") if p.strip()],
+        help="Only run cases matching these patterns (e.g. 'list.*,status.*')",
+    )
+    parser.add_argument("--pdf", action="store_true", help="Also time PDF export (needs WeasyPrint)")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="Compare against a previous results file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="Relative slow-down that counts as a regression (default: 0.2 = 20%%)",
+    )
+    parser.add_argument("--tmpdir", help="Where corpora are generated (default: system temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpora")
+    parser.add_argument(
+        "--generate", type=Path, metavar="DIR",
+        help="Only generate a corpus into the notes directory DIR, then exit",
+    )
+    opts = parser.parse_args()
+
+    if opts.generate is not None:
+        for count in opts.notes:
+            info = generate_corpus(opts.generate, count, opts.sizes, opts.seed)
+            print(f"{count:,} notes, {_megabytes(info.total_bytes)} in {info.seconds:.1f}s")
+        return 0
+
+    baseline = results_mod.load(opts.baseline) if opts.baseline else None
+    results = results_mod.new_results(REPO_ROOT)
+    results["settings"] = {
+        "sizes": opts.sizes, "seed": opts.seed, "backend": opts.backend, "repeat": opts.repeat,
+    }
+
+    start = time.perf_counter()
+    failures = sum(_bench_corpus(opts, count, results, baseline) for count in opts.notes)
+
+    if opts.output is not None:
+        results_mod.save(results, opts.output)
+        print(f"\nResults written to {opts.output}")
+
+    if baseline is not None:
+        changes = [
+            c.change
+            for c in results_mod.compare(results, baseline, opts.threshold)
+            if c.change is not None
+        ]
+        if changes:
+            print(f"Median change against the baseline: {statistics.median(changes):+.0%}")
+
+    print(f"Finished in {time.perf_counter() - start:.0f}s, "
+          + (f"{failures} cases failed or regressed" if failures else "no failures"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+The commands that are timed, and how to run them.
+
+Every case runs `python -m notes.main ...` in a fresh interpreter, so
+timings include interpreter start-up and imports exactly as users see
+them. Cases run in the order listed: read-only ones first, then those
+that change the corpus (a little).
+"""
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Sequence, Union
+
+from .corpus import title_for
+
+# (argv, or a function of the repetition number returning argv)
+Argv = Union[Sequence[str], Callable[[int], Sequence[str]]]
+
+
+class Context(NamedTuple):
+    """
+    Where a benchmark run lives.
+    """
+
+    home: Path
+    notes: int
+    env: dict
+
+    @property
+    def notes_dir(self) -> Path:
+        return self.home / ".local" / "share" / "notes"
+
+    @property
+    def state_dir(self) -> Path:
+        return self.notes_dir / ".notes"
+
+    @property
+    def downloads_dir(self) -> Path:
+        return self.home / "Downloads"
+
+
+class Case(NamedTuple):
+    """
+    One timed command.
+
+    `prepare` runs (untimed) before every repetition, e.g. to drop a
+    cache for a cold measurement. Cases are skipped for corpora larger
+    than `max_notes`, and run `repeat` times at most (expensive cases
+    set this to 1).
+    """
+
+    name: str
+    argv: Argv
+    prepare: Optional[Callable[[Context, int], None]] = None
+    max_notes: Optional[int] = None
+    repeat: Optional[int] = None
+    needs_pdf: bool = False
+
+
+# ----------------------------------------------------------------------
+# Preparation steps
+# ----------------------------------------------------------------------
+def _drop_index(ctx: Context, _: int) -> None:
+    (ctx.state_dir / "index.json").unlink(missing_ok=True)
+
+
+def _drop_search_index(ctx: Context, _: int) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        (ctx.state_dir / f"search.sqlite{suffix}").unlink(missing_ok=True)
+
+
+def _drop_exports(ctx: Context, _: int) -> None:
+    (ctx.state_dir / "exports.json").unlink(missing_ok=True)
+    shutil.rmtree(ctx.state_dir / "render-cache", ignore_errors=True)
+
+
+def _drop_backups(ctx: Context, _: int) -> None:
+    (ctx.state_dir / "backups.json").unlink(missing_ok=True)
+    for archive in ctx.downloads_dir.glob("notes_backup_*"):
+        archive.unlink()
+
+
+def _write_title_list(ctx: Context, _: int) -> None:
+    # 1% of the notes, at most 2,000
+    count = max(1, min(2000, ctx.notes // 100))
+    step = max(1, ctx.notes // count)
+    with open(ctx.home / "titles.txt", "w", encoding="utf-8") as fh:
+        for number in range(0, ctx.notes, step)[:count]:
+            fh.write(title_for(number) + "\n")
+
+
+# A note of a few megabytes, for status changes with history kept
+LARGE_TITLE = "Bench Large Note"
+LARGE_LINES = 100000
+
+_WRITE_NOTE = (
+    "import sys\n"
+    "from notes.storage.backends import get_backend\n"
+    "get_backend().write(sys.argv[1], sys.stdin.read())\n"
+)
+
+
+def _write_large_note(ctx: Context, i: int) -> None:
+    if i:
+        return
+    lines = [f"<!-- status: open -->\n# {LARGE_TITLE}\n\n"]
+    lines += [f"- measurement {n}: {n * 7919 % 100003} units\n" for n in range(LARGE_LINES)]
+    subprocess.run(
+        [sys.executable, "-c", _WRITE_NOTE, LARGE_TITLE],
+        input="".join(lines), text=True, cwd=ctx.home, env=ctx.env, check=True,
+    )
+
+
+# ----------------------------------------------------------------------
+# Case list
+# ----------------------------------------------------------------------
+# Alternated so every repetition really changes the status
+_STATUSES = ("done", "open")
+
+
+def cases_for(notes: int) -> List[Case]:
+    """
+    Every case, for a corpus of `notes` notes.
+    """
+    middle = title_for(notes // 2)
+    return [
+        Case("startup", ["-V"]),
+        Case("list.cold-index", ["list", "--format", "tsv"], prepare=_drop_index),
+        Case("list.tsv", ["list", "--format", "tsv"]),
+        Case("list.table", ["list"], max_notes=20000),
+        Case("list.filtered", ["list", "--status", "done", "--sort", "mtime", "--limit", "20"]),
+        Case("search.cold-index", ["search", "lorem ipsum"], prepare=_drop_search_index,
+             max_notes=200000, repeat=1),
+        Case("search", ["search", "roadmap customer"]),
+        Case("export.one.html", ["export", "--title", middle, "--html", "--force"]),
+        Case("export.one.pdf", ["export", "--title", middle, "--pdf", "--force"], needs_pdf=True),
+        Case("export.all.html", ["export", "--all", "--html", "--jobs", "0"],
+             prepare=_drop_exports, max_notes=100000, repeat=1),
+        Case("export.all.html.up-to-date", ["export", "--all", "--html"], max_notes=100000),
+        Case("backup.full", ["backup", "--full"], prepare=_drop_backups, repeat=1),
+        Case("backup.incremental", ["backup"]),
+        Case("backup.verify", ["backup", "--verify"], repeat=1),
+        Case("status.one", lambda i: ["status", "--title", middle, "--set", _STATUSES[i % 2]]),
+        # The first repetition also records the note's first version
+        Case(
+            "status.large",
+            lambda i: ["status", "--title", LARGE_TITLE, "--set", _STATUSES[i % 2]],
+            prepare=_write_large_note,
+        ),
+        Case(
+            "status.bulk",
+            lambda i: ["status", "--titles-from", "titles.txt", "--set", _STATUSES[i % 2]],
+            prepare=_write_title_list,
+        ),
+        Case("add", lambda i: ["add", "--title", f"Bench Added {i}"]),
+        Case("edit", ["edit", "--title", middle]),
+        Case("delete", lambda i: ["delete", "--title", f"Bench Added {i}"]),
+    ]
+
+
+# ----------------------------------------------------------------------
+# Running
+# ----------------------------------------------------------------------
+class Timing(NamedTuple):
+    """
+    Wall-clock seconds of every repetition, or the error that stopped it.
+    """
+
+    samples: List[float]
+    error: Optional[str] = None
+
+
+def run_case(case: Case, ctx: Context, repeat: int) -> Timing:
+    """
+    Run one case `repeat` times (or fewer, see Case) and time each run.
+    """
+    samples = []
+    for i in range(min(repeat, case.repeat or repeat)):
+        if case.prepare is not None:
+            case.prepare(ctx, i)
+        argv = case.argv(i) if callable(case.argv) else case.argv
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-m", "notes.main", *argv],
+            cwd=ctx.home,
+            env=ctx.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            message = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+            return Timing(samples, f"exit status {proc.returncode}: {message}")
+        samples.append(elapsed)
+    return Timing(samples)
+
+
+def warm_up(ctx: Context) -> None:
+    """
+    Build the metadata and search indexes (untimed), so each case starts
+    from the steady state of a notes directory in use, whichever cases
+    ran before it.
+    """
+    for argv in (["list", "--format", "tsv"], ["search", "warm up"]):
+        subprocess.run(
+            [sys.executable, "-m", "notes.main", *argv],
+            cwd=ctx.home, env=ctx.env, stdout=subprocess.DEVNULL, check=True,
+        )
+
+
+def make_env(home: Path, backend: str, repo_root: Path) -> dict:
+    """
+    Environment running the checked-out `notes` against `home`.
+    """
+    env = dict(os.environ)
+    env.update(
+        HOME=str(home),
+        EDITOR="true",
+        NOTES_BACKEND=backend,
+        NOTES_NO_DAEMON="1",
+        PYTHONPATH=os.pathsep.join(
+            p for p in [str(repo_root / "src"), env.get("PYTHONPATH")] if p
+        ),
+    )
+    # Results must not depend on the caller's rendering or profiling settings
+    env.pop("NOTES_MARKDOWN_EXTRAS", None)
+    env.pop("NOTES_TRACE", None)
+    # Changes are timed with their version history recorded
+    env.pop("NOTES_NO_HISTORY", None)
+    return env
@@ -0,0 +1,206 @@
+"""
+Synthetic NOTES_DIR corpora.
+
+Notes are written straight to disk in the layout of the filesystem
+backend (one `Title_With_Underscores.md` per note, status comment on
+the first line), without importing `notes`, so generating a million
+notes does not pay for locks, fsyncs or index updates.
+
+Everything is derived from a seed: the same arguments always produce
+the same titles, statuses, sizes, contents and modification times.
+"""
+import math
+import os
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, NamedTuple
+
+# Statuses and how often they occur
+STATUS_WEIGHTS = (("open", 50), ("in progress", 20), ("done", 30))
+
+# Modification times are spread over this many days before "now"
+MTIME_SPREAD_DAYS = 365
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua meeting project "
+    "release backlog sprint review design draft todo fix deploy server "
+    "client notes idea research summary budget roadmap customer feedback"
+).split()
+
+
+# ----------------------------------------------------------------------
+# Note size distributions (bytes of Markdown after the header)
+# ----------------------------------------------------------------------
+def _lognormal(rng: random.Random, median: float, sigma: float, low: int, high: int) -> int:
+    return int(min(high, max(low, rng.lognormvariate(math.log(median), sigma))))
+
+
+def _tiny(rng: random.Random) -> int:
+    return rng.randint(50, 300)
+
+
+def _small(rng: random.Random) -> int:
+    return _lognormal(rng, 1500, 0.8, 100, 64 * 1024)
+
+
+def _mixed(rng: random.Random) -> int:
+    # Mostly ordinary notes, a few pasted logs and a handful of dumps
+    roll = rng.random()
+    if roll < 0.005:
+        return rng.randint(1 << 20, 8 << 20)
+    if roll < 0.05:
+        return rng.randint(64 * 1024, 1 << 20)
+    return _small(rng)
+
+
+def _large(rng: random.Random) -> int:
+    return _lognormal(rng, 256 * 1024, 1.0, 16 * 1024, 8 << 20)
+
+
+SIZE_DISTRIBUTIONS: Dict[str, Callable[[random.Random], int]] = {
+    "tiny": _tiny,
+    "small": _small,
+    "mixed": _mixed,
+    "large": _large,
+}
+
+
+class CorpusInfo(NamedTuple):
+    """
+    What `generate_corpus` wrote.
+    """
+
+    notes: int
+    sizes: str
+    seed: int
+    total_bytes: int
+    seconds: float
+
+
+# ----------------------------------------------------------------------
+# Content
+# ----------------------------------------------------------------------
+def title_for(number: int) -> str:
+    """
+    Title of the n-th generated note.
+    """
+    return f"Note {number:07d}"
+
+
+def filename_for(title: str) -> str:
+    # Same rule as notes.storage.titles.filename_for() (generated titles
+    # have nothing to escape); notes is not imported by the generator
+    return f"{title}.md".replace(" ", "_")
+
+
+def _text_pool(rng: random.Random, size: int = 1 << 20) -> str:
+    """
+    About `size` characters of Markdown (paragraphs, lists, code) from
+    which note bodies are cut.
+    """
+    blocks = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.6:
+            words = rng.choices(_WORDS, k=rng.randint(20, 120))
+            block = " ".join(words).capitalize() + "."
+        elif kind < 0.8:
+            block = "\n".join(
+                "- " + " ".join(rng.choices(_WORDS, k=rng.randint(3, 10)))
+                for _ in range(rng.randint(2, 8))
+            )
+        elif kind < 0.9:
+            block = "## " + " ".join(rng.choices(_WORDS, k=rng.randint(2, 5))).title()
+        else:
+            block = "```\n" + "\n".join(
+                f"{rng.choice(_WORDS)} = {rng.randint(0, 9999)}" for _ in range(rng.randint(2, 10))
+            ) + "\n```"
+        blocks.append(block)
+        length += len(block) + 2
+    return "\n\n".join(blocks) + "\n\n"
+
+
+def _body(pool: str, rng: random.Random, size: int) -> str:
+    """
+    `size` characters cut from the pool at a random paragraph, wrapping
+    around (and repeating the pool) for notes larger than it.
+    """
+    start = pool.find("\n\n", rng.randrange(len(pool))) + 2
+    if start < 2 or start >= len(pool):
+        start = 0
+    parts = []
+    remaining = size
+    while remaining > 0:
+        piece = pool[start:start + remaining]
+        parts.append(piece)
+        remaining -= len(piece)
+        start = 0
+    body = "".join(parts)
+    return body if body.endswith("\n") else body + "\n"
+
+
+# ----------------------------------------------------------------------
+# Generation
+# ----------------------------------------------------------------------
+def iter_notes(count: int, sizes: str = "small", seed: int = 0) -> Iterator[tuple]:
+    """
+    Yield (title, status, text, mtime) for every note of a corpus.
+    """
+    rng = random.Random(seed)
+    pool = _text_pool(rng)
+    size_of = SIZE_DISTRIBUTIONS[sizes]
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    weights = [weight for _, weight in STATUS_WEIGHTS]
+    now = time.time()
+
+    for number in range(count):
+        title = title_for(number)
+        status = rng.choices(statuses, weights)[0]
+        text = f"<!-- status: {status} -->\n# {title}\n\n" + _body(pool, rng, size_of(rng))
+        mtime = now - rng.random() * MTIME_SPREAD_DAYS * 86400
+        yield title, status, text, mtime
+
+
+def generate_corpus(
+    notes_dir: Path,
+    count: int,
+    sizes: str = "small",
+    seed: int = 0,
+    progress: Callable[[int], None] = None,
+) -> CorpusInfo:
+    """
+    Write `count` synthetic notes into `notes_dir` (created if needed).
+
+    Parameters
+    ----------
+    notes_dir : Path
+        Target directory, usually `<HOME>/.local/share/notes`
+    count : int
+        Number of notes
+    sizes : str
+        Size distribution, one of SIZE_DISTRIBUTIONS
+    seed : int
+        Seed for every random choice
+    progress : callable or None
+        Called with the number of notes written so far, every 10,000
+    """
+    if sizes not in SIZE_DISTRIBUTIONS:
+        raise ValueError(f"Unknown size distribution {sizes!r}")
+
+    start = time.perf_counter()
+    notes_dir.mkdir(parents=True, exist_ok=True)
+    total = 0
+    for written, (title, _, text, mtime) in enumerate(iter_notes(count, sizes, seed), start=1):
+        data = text.encode("utf-8")
+        path = os.path.join(notes_dir, filename_for(title))
+        with open(path, "wb") as fh:
+            fh.write(data)
+        os.utime(path, (mtime, mtime))
+        total += len(data)
+        if progress is not None and written % 10000 == 0:
+            progress(written)
+
+    return CorpusInfo(count, sizes, seed, total, time.perf_counter() - start)
@@ -0,0 +1,125 @@
+"""
+Benchmark results as JSON, and comparison against a baseline.
+
+A results file looks like:
+
+    {
+      "version": 1,
+      "created": "2024-05-01T09:30:00",
+      "machine": {"python": "3.12.2", "platform": "Linux-...", "cpus": 8},
+      "commit": "abc1234",
+      "results": {
+        "10k-small/list.tsv": {"best": 0.21, "median": 0.22, "samples": [...]},
+        ...
+      }
+    }
+
+Keys are "<corpus>/<case>". Cases are compared by their best time,
+which is the least sensitive to noise from other processes.
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+RESULTS_VERSION = 1
+
+# Differences below this many seconds are noise, whatever the ratio
+NOISE_FLOOR = 0.010
+
+
+def _commit(repo_root: Path) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=repo_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def new_results(repo_root: Path) -> dict:
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "commit": _commit(repo_root),
+        "corpora": {},
+        "results": {},
+    }
+
+
+def record(results: dict, key: str, samples: List[float], error: Optional[str] = None) -> dict:
+    """
+    Store the samples of one case; returns the stored entry.
+    """
+    entry = {"samples": [round(s, 6) for s in samples]}
+    if samples:
+        entry["best"] = round(min(samples), 6)
+        entry["median"] = round(statistics.median(samples), 6)
+    if error:
+        entry["error"] = error
+    results["results"][key] = entry
+    return entry
+
+
+def save(results: dict, path: Path) -> None:
+    path.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+
+def load(path: Path) -> dict:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported results version {data.get('version')!r}")
+    return data
+
+
+# ----------------------------------------------------------------------
+# Baseline comparison
+# ----------------------------------------------------------------------
+class Comparison(NamedTuple):
+    key: str
+    best: Optional[float]
+    baseline: Optional[float]
+    regressed: bool
+
+    @property
+    def change(self) -> Optional[float]:
+        """Relative change of the best time (0.25 = 25% slower)."""
+        if not self.best or not self.baseline:
+            return None
+        return self.best / self.baseline - 1
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[Comparison]:
+    """
+    Compare every case present in both files.
+
+    A case regresses when its best time exceeds the baseline's by more
+    than `threshold` (0.2 = 20%) and by more than NOISE_FLOOR seconds,
+    or when it failed although it succeeded in the baseline.
+    """
+    comparisons = []
+    base_results: Dict[str, dict] = baseline.get("results", {})
+    for key, entry in results["results"].items():
+        base = base_results.get(key)
+        if base is None:
+            continue
+        best, base_best = entry.get("best"), base.get("best")
+        if best is None or base_best is None:
+            regressed = best is None and base_best is not None
+        else:
+            regressed = best > base_best * (1 + threshold) and best - base_best > NOISE_FLOOR
+        comparisons.append(Comparison(key, best, base_best, regressed))
+    return comparisons
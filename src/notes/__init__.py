@@ -1,11 +1,21 @@
-from importlib import metadata
+__all__ = ["__version__"]
 
-try:
-    # When the package is installed (wheel, sdist, editable) this returns the
-    # version that Hatch wrote into the distribution metadata.
-    __version__: str = metadata.version(__name__)   # e.g. "1.2.3"
-except metadata.PackageNotFoundError:               # pragma: no cover
-    # Fallback for a source checkout where the package isn’t installed yet.
-    __version__ = "0+unknown"
 
-__all__ = ["__version__"]
+def __getattr__(name: str):
+    # Resolve the version lazily: importlib.metadata scans site-packages,
+    # which is wasted work for every command except `notes -V`.
+    if name != "__version__":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from importlib import metadata
+
+    try:
+        # When the package is installed (wheel, sdist, editable) this returns the
+        # version that Hatch wrote into the distribution metadata.
+        version: str = metadata.version(__name__)   # e.g. "1.2.3"
+    except metadata.PackageNotFoundError:           # pragma: no cover
+        # Fallback for a source checkout where the package isn’t installed yet.
+        version = "0+unknown"
+
+    globals()["__version__"] = version
+    return version
@@ -0,0 +1,276 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, TypeVar
+
+from .config import DEFAULT_STATUS, STATUS_COMMENT_TEMPLATE
+from .exporters.batch import (
+    _HTML,
+    _PDF,
+    ExportResult,
+    _requested,
+    _split_stale,
+    _version_for,
+    export_note,
+)
+from .exporters.manifest import ExportManifest
+from .storage.backends import ConflictError, NoteRecord, get_backend, reset_backend
+from .storage.backends.base import CONFLICT_RETRIES
+from .utils.hashing import content_hash
+
+_T = TypeVar("_T")
+
+
+class NoteContent(NamedTuple):
+    """
+    A note's full text together with its metadata.
+
+    `record.hash` is the hash of exactly this `text`.
+    """
+
+    record: NoteRecord
+    text: str
+
+
+# ----------------------------------------------------------------------
+# Blocking implementations (run on the I/O threads)
+# ----------------------------------------------------------------------
+def _create(title: str, text: Optional[str]) -> NoteRecord:
+    from .storage.history import record_version
+    from .storage.search import update_search_entry
+
+    if text is None:
+        text = f"{STATUS_COMMENT_TEMPLATE.format(DEFAULT_STATUS)}# {title}\n\n"
+    backend = get_backend()
+    backend.create(title, text)
+    update_search_entry(title)
+    record_version(title, "create")
+    return _existing_record(title)
+
+
+def _read(title: str) -> NoteContent:
+    # Text and metadata are read separately; start over if the note
+    # was replaced in between
+    backend = get_backend()
+    for _ in range(CONFLICT_RETRIES):
+        text = backend.read(title)
+        record = _existing_record(title)
+        if record.hash == content_hash(text.encode("utf-8")):
+            return NoteContent(record, text)
+    raise ConflictError(f"Note {title!r} kept changing while being read")
+
+
+def _query(
+    status: Optional[str],
+    modified_since: Optional[float],
+    sort: str,
+    limit: Optional[int],
+    offset: int,
+) -> List[NoteRecord]:
+    return list(get_backend().query(status, modified_since, sort, limit, offset))
+
+
+def _set_status(title: str, new_status: str) -> NoteRecord:
+    from .storage.history import recording_status_change
+    from .storage.search import update_search_status
+
+    backend = get_backend()
+    before = _existing_record(title)
+    with recording_status_change([title]):
+        backend.set_status(title, new_status)
+    update_search_status(title, before.hash)
+    return _existing_record(title)
+
+
+def _delete(title: str) -> None:
+    from .storage.history import record_version
+    from .storage.search import remove_search_entry
+
+    record_version(title, "untracked")
+    get_backend().delete(title)
+    remove_search_entry(title)
+    record_version(title, "delete")
+
+
+def _existing_record(title: str) -> NoteRecord:
+    record = get_backend().record(title)
+    if record is None:
+        raise FileNotFoundError(f"No note titled {title!r}")
+    return record
+
+
+# ----------------------------------------------------------------------
+# Asynchronous API
+# ----------------------------------------------------------------------
+class AsyncNotes:
+    """
+    Notes for asyncio programs (web services, bots, ...).
+
+    Every operation is a coroutine returning data instead of printing
+    it. Blocking disk work runs on a bounded pool of I/O threads, and
+    Markdown/PDF rendering on a bounded pool of worker processes, so
+    many concurrent requests neither block the event loop nor queue
+    behind a single thread. Failures are raised as the storage layer
+    raises them: FileNotFoundError for unknown titles, FileExistsError
+    when creating a title that is taken, ValueError for a title that
+    cannot name a note, ConflictError when a note keeps changing
+    underneath an update.
+
+    Operations on different notes run in parallel; those on the same
+    note are serialized by the note's lock, which also excludes other
+    `notes` processes.
+
+    Parameters
+    ----------
+    io_workers : int
+        Threads for disk I/O (default: CPUs + 4, at most 32)
+    render_workers : int
+        Processes for exports, started on the first export; 0 or less
+        uses one per CPU (default)
+
+    Examples
+    --------
+    >>> async with AsyncNotes() as notes:
+    ...     await notes.create("Meeting", "# Meeting\\n\\nAgenda")
+    ...     records = await notes.list(status="open", limit=50)
+    ...     await notes.set_status("Meeting", "done")
+    ...     result = await notes.export("Meeting", html=True)
+    """
+
+    def __init__(self, io_workers: Optional[int] = None, render_workers: int = 0):
+        if io_workers is None:
+            io_workers = min(32, (os.cpu_count() or 1) + 4)
+        if render_workers <= 0:
+            render_workers = os.cpu_count() or 1
+        self._io_pool = ThreadPoolExecutor(io_workers, thread_name_prefix="notes-io")
+        self._render_workers = render_workers
+        self._render_pool: Optional[ProcessPoolExecutor] = None
+        self._manifest: Optional[ExportManifest] = None
+        self._manifest_lock = threading.Lock()
+
+    async def __aenter__(self) -> "AsyncNotes":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Wait for running operations and stop the worker threads and processes.
+        """
+        pools: List[Executor] = [self._io_pool]
+        if self._render_pool is not None:
+            pools.append(self._render_pool)
+            self._render_pool = None
+        loop = asyncio.get_running_loop()
+        for pool in pools:
+            await loop.run_in_executor(None, pool.shutdown)
+
+    async def _run(self, pool: Executor, fn: Callable[..., _T], *args) -> _T:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+    # ------------------------------------------------------------------
+    # Notes
+    # ------------------------------------------------------------------
+    async def create(self, title: str, text: Optional[str] = None) -> NoteRecord:
+        """
+        Store a new note and return its metadata.
+
+        Without `text`, the note starts like `notes add` starts it: the
+        default status and a heading with the title.
+        """
+        return await self._run(self._io_pool, _create, title, text)
+
+    async def read(self, title: str) -> NoteContent:
+        """
+        A note's full text and metadata.
+        """
+        return await self._run(self._io_pool, _read, title)
+
+    async def record(self, title: str) -> Optional[NoteRecord]:
+        """
+        A note's metadata, or None if it does not exist.
+        """
+        return await self._run(self._io_pool, get_backend().record, title)
+
+    async def list(
+        self,
+        status: Optional[str] = None,
+        modified_since: Optional[float] = None,
+        sort: str = "title",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[NoteRecord]:
+        """
+        Metadata of matching notes, see `StorageBackend.query`.
+        """
+        return await self._run(
+            self._io_pool, _query, status, modified_since, sort, limit, offset
+        )
+
+    async def set_status(self, title: str, new_status: str) -> NoteRecord:
+        """
+        Change a note's status and return its new metadata.
+        """
+        return await self._run(self._io_pool, _set_status, title, new_status)
+
+    async def delete(self, title: str) -> None:
+        """
+        Remove a note permanently.
+        """
+        await self._run(self._io_pool, _delete, title)
+
+    # ------------------------------------------------------------------
+    # Exports
+    # ------------------------------------------------------------------
+    async def export(
+        self, title: str, pdf: bool = False, html: bool = False, force: bool = False
+    ) -> ExportResult:
+        """
+        Export a note to the DOWNLOADS_DIR, as `notes export` does.
+
+        Formats already up to date are skipped unless `force` is set.
+        Rendering errors are reported in the result, not raised.
+        """
+        record = await self._run(self._io_pool, _existing_record, title)
+        stale, skipped = await self._run(self._io_pool, self._plan, record, pdf, html, force)
+        if not stale:
+            return ExportResult(title, [], skipped=skipped, source_hash=record.hash)
+
+        # Workers render and write the files; the manifest is only
+        # touched here, as in `notes export --jobs N`
+        result = await self._run(
+            self._renderer(), export_note, title, _PDF in stale, _HTML in stale
+        )
+        await self._run(self._io_pool, self._record_outputs, result)
+        return result._replace(skipped=skipped)
+
+    def _renderer(self) -> ProcessPoolExecutor:
+        if self._render_pool is None:
+            import multiprocessing
+
+            # Forking a process that runs threads can copy locks held by
+            # them; spawned workers start clean
+            self._render_pool = ProcessPoolExecutor(
+                self._render_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=reset_backend,
+            )
+        return self._render_pool
+
+    def _plan(self, record: NoteRecord, pdf: bool, html: bool, force: bool):
+        with self._manifest_lock:
+            if self._manifest is None:
+                self._manifest = ExportManifest.load()
+            return _split_stale(
+                record.title, record.hash, _requested(pdf, html), self._manifest, force
+            )
+
+    def _record_outputs(self, result: ExportResult) -> None:
+        if result.source_hash is None or not result.outputs:
+            return
+        with self._manifest_lock:
+            for out_path in result.outputs:
+                self._manifest.record(out_path, result.source_hash, _version_for(out_path))
+            self._manifest.save()
@@ -1,20 +1,78 @@
 import argparse
 import sys
-from rich.console import Console
-
-from . import __version__
-from . import config
-from .storage import (
-    create_note,
-    edit_note,
-    delete_note,
-    list_notes,
-    set_status,
-    get_note_path,
-)
-from .storage.backup import backup_notes
-from .exporters import export_html, export_pdf
-from .utils.editor import launch_editor  # (used indirectly via storage functions)
+
+# Heavy modules (Rich, the storage layer, the exporters and WeasyPrint behind
+# them) are imported inside the branch that needs them, so simple commands
+# such as `notes -V` or `notes edit` start without loading them.
+
+# ----------------------------------------------------------------------
+# Helper: parse --modified-since
+# Accepts an ISO date or date-time, or an age such as 90m, 12h or 7d;
+# returns a Unix timestamp.
+# ----------------------------------------------------------------------
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _parse_since(value: str) -> float:
+    import time
+
+    unit = value[-1:].lower()
+    if unit in _AGE_UNITS and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * _AGE_UNITS[unit]
+
+    import datetime
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid date or age: {value!r} (e.g. 2024-05-01, 2024-05-01T09:30, 12h, 7d)"
+        )
+
+
+# ----------------------------------------------------------------------
+# Helper: parse counts such as --limit and --offset
+# ----------------------------------------------------------------------
+def _non_negative(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be a whole number of 0 or more: {value!r}")
+    return number
+
+
+# ----------------------------------------------------------------------
+# Helper: options selecting many notes at once (status, delete, export)
+# ----------------------------------------------------------------------
+def _add_selection_args(cmd: argparse.ArgumentParser, verb: str) -> None:
+    cmd.add_argument(
+        "--title",
+        action="append",
+        help=f"Title of a note to {verb} (repeat for several notes)",
+    )
+    cmd.add_argument(
+        "--titles-from",
+        metavar="FILE",
+        help="Read more titles from FILE, one per line (- for stdin)",
+    )
+    cmd.add_argument(
+        "--status",
+        choices=["open", "in progress", "done"],
+        help=f"{verb.capitalize()} every note with this status",
+    )
+    cmd.add_argument(
+        "--modified-since",
+        type=_parse_since,
+        metavar="WHEN",
+        help=f"{verb.capitalize()} every note modified since a date or age (see list)",
+    )
+    cmd.add_argument(
+        "--match",
+        metavar="PATTERN",
+        help=f'{verb.capitalize()} every note whose title matches a pattern (e.g. "Sprint 12*")',
+    )
+
 
 # ----------------------------------------------------------------------
 # Helper: build the argument parser
@@ -32,6 +90,17 @@ def _build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Show the installed notes version and exit",
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print where the command spent its time (to stderr)",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="FILE",
+        help="Like --profile, and also write a Chrome trace (FILE.json) "
+             "or cProfile statistics (FILE.prof)",
+    )
 
     # Subcommands container
     sub = parser.add_subparsers(dest="command", required=False)
@@ -48,17 +117,70 @@ def _build_parser() -> argparse.ArgumentParser:
 
     # ----- delete ------------------------------------------------------
     # Delete an existing note
-    delete = sub.add_parser("delete", help="Delete a note")
-    delete.add_argument("--title", required=True, help="Title of the note")
+    delete = sub.add_parser("delete", help="Delete notes")
+    _add_selection_args(delete, "delete")
 
     # ----- list --------------------------------------------------------
     # List all notes with metadata (titles, statuses, etc.)
-    sub.add_parser("list", help="List all notes")
+    list_cmd = sub.add_parser("list", help="List all notes")
+    list_cmd.add_argument(
+        "--status",
+        choices=["open", "in progress", "done"],
+        help="Only list notes with this status",
+    )
+    list_cmd.add_argument(
+        "--modified-since",
+        type=_parse_since,
+        metavar="WHEN",
+        help="Only notes modified since a date (2024-05-01, 2024-05-01T09:30) or age (90m, 12h, 7d)",
+    )
+    list_cmd.add_argument(
+        "--sort",
+        choices=["title", "mtime", "status"],
+        default="title",
+        help="Order by title, modification time (newest first) or status (default: title)",
+    )
+    list_cmd.add_argument("--limit", type=_non_negative, metavar="N", help="Show at most N notes")
+    list_cmd.add_argument(
+        "--offset", type=_non_negative, default=0, metavar="N", help="Skip the first N notes"
+    )
+    list_cmd.add_argument(
+        "--format",
+        choices=["table", "json", "tsv"],
+        default="table",
+        help="Output format (default: table)",
+    )
+
+    # ----- search ------------------------------------------------------
+    # Full-text search over note contents
+    search = sub.add_parser("search", help="Search notes by content")
+    search.add_argument("query", help='Words and "quoted phrases" to look for')
+    search.add_argument(
+        "--status",
+        choices=["open", "in progress", "done"],
+        help="Only show notes with this status",
+    )
+    search.add_argument(
+        "--limit", type=_non_negative, default=20, help="Maximum number of results (default: 20)"
+    )
+
+    # ----- complete ----------------------------------------------------
+    # Print matching titles, one per line, for shell completion scripts
+    complete = sub.add_parser("complete", help="List titles starting with (or matching) a text")
+    complete.add_argument("text", nargs="?", default="", help="Beginning of a title")
+    complete.add_argument(
+        "--fuzzy",
+        action="store_true",
+        help="Match the characters of TEXT in order anywhere in the title, best first",
+    )
+    complete.add_argument(
+        "--limit", type=_non_negative, metavar="N", help="Print at most N titles (default: all, 20 with --fuzzy)"
+    )
 
     # ----- status ------------------------------------------------------
     # Change the status of a note (open, in progress, done)
-    status = sub.add_parser("status", help="Change a note's status")
-    status.add_argument("--title", required=True, help="Title of the note")
+    status = sub.add_parser("status", help="Change the status of notes")
+    _add_selection_args(status, "update")
     status.add_argument(
         "--set",
         required=True,
@@ -69,23 +191,217 @@ def _build_parser() -> argparse.ArgumentParser:
     # ----- export ------------------------------------------------------
     # Export a single note or all notes into PDF/HTML formats
     export = sub.add_parser("export", help="Export notes")
-    export.add_argument("--title", help="Title of a single note (omit for --all)")
+    _add_selection_args(export, "export")
     export.add_argument("--pdf", action="store_true", help="Export as PDF")
     export.add_argument("--html", action="store_true", help="Export as HTML")
     export.add_argument("--all", action="store_true", help="Export all notes")
+    export.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Worker processes for --all (0 = one per CPU, default: 1)",
+    )
+    export.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-export notes even if their exported files are up to date",
+    )
+    export.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and re-export notes whenever they are saved",
+    )
+    export.add_argument(
+        "--combined",
+        action="store_true",
+        help="With --all --pdf: write every note into one PDF with a table of contents",
+    )
+    export.add_argument(
+        "--site",
+        metavar="DIR",
+        help="Build a static website of the notes (all, or those selected) in DIR; "
+             "only pages whose content changed are rewritten",
+    )
+
+    # ----- migrate -----------------------------------------------------
+    # Copy all notes into another storage backend, or reorganize the
+    # notes directory
+    migrate = sub.add_parser(
+        "migrate", help="Copy all notes to another storage backend, or change the directory layout"
+    )
+    target = migrate.add_mutually_exclusive_group(required=True)
+    target.add_argument(
+        "--to",
+        choices=["filesystem", "sqlite"],
+        help="Target storage backend",
+    )
+    target.add_argument(
+        "--layout",
+        choices=["flat", "sharded"],
+        help="Move the note files into one directory (flat) or into hashed "
+             "subdirectories (sharded, for very large collections)",
+    )
 
     # ----- backup ------------------------------------------------------
-    # Backup all notes into a ZIP archive
-    sub.add_parser("backup", help="Create a ZIP backup of all notes")
+    # Backup notes into a compressed archive (incremental by default)
+    backup = sub.add_parser("backup", help="Create a compressed backup of the notes")
+    backup.add_argument(
+        "--full",
+        action="store_true",
+        help="Include every note, not just those changed since the last backup",
+    )
+    backup.add_argument(
+        "--stdout",
+        action="store_true",
+        help="Stream the archive to standard output instead of ~/Downloads",
+    )
+    backup.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Compression threads (default: one per CPU)",
+    )
+    backup.add_argument(
+        "--verify",
+        nargs="?",
+        const="",
+        metavar="ARCHIVE",
+        help="Check an archive (default: the latest) and its parents instead of backing up",
+    )
+
+    # ----- daemon ------------------------------------------------------
+    # Keep a warm process serving list/status/export/backup over a socket
+    daemon = sub.add_parser(
+        "daemon", help="Run a background server that answers commands faster"
+    )
+    daemon.add_argument("--stop", action="store_true", help="Stop the running daemon")
+
+    # ----- restore -----------------------------------------------------
+    restore = sub.add_parser("restore", help="Restore notes from a backup archive")
+    restore.add_argument("archive", help="Backup archive (.tar.gz, or - for stdin)")
+    restore.add_argument(
+        "--missing-only",
+        action="store_true",
+        help="Only restore deleted notes; keep existing ones even if they changed",
+    )
+
+    # ----- history / diff / revert -------------------------------------
+    # Every version of a note is kept; list, compare and bring them back
+    history = sub.add_parser("history", help="List the saved versions of a note")
+    history.add_argument("--title", required=True, help="Title of the note (also of a deleted one)")
+    history.add_argument(
+        "--limit", type=_non_negative, metavar="N", help="Show only the N newest versions"
+    )
+
+    diff = sub.add_parser("diff", help="Show the changes between versions of a note")
+    diff.add_argument("--title", required=True, help="Title of the note")
+    diff.add_argument(
+        "--from",
+        dest="old",
+        metavar="VERSION",
+        help="Version number or hash prefix (default: the newest version that "
+             "differs from --to)",
+    )
+    diff.add_argument(
+        "--to",
+        dest="new",
+        metavar="VERSION",
+        help="Version number or hash prefix (default: the note as it is now)",
+    )
+
+    revert = sub.add_parser("revert", help="Restore an earlier version of a note")
+    revert.add_argument("--title", required=True, help="Title of the note (also of a deleted one)")
+    revert.add_argument(
+        "--to",
+        required=True,
+        metavar="VERSION",
+        help="Version number or hash prefix, as listed by history",
+    )
 
     return parser
 
 
+# ----------------------------------------------------------------------
+# Helper: decide whether a command can be served by the daemon
+# Commands that need the user's terminal (editor) or raw stdin/stdout
+# always run in-process.
+# ----------------------------------------------------------------------
+_FORWARDED_COMMANDS = ("list", "status", "export", "backup")
+
+
+def _forwardable(args) -> bool:
+    if args.command not in _FORWARDED_COMMANDS:
+        return False
+    if args.command == "export" and args.watch:
+        # Long-running: would hold the daemon for as long as it watches
+        return False
+    if getattr(args, "titles_from", None) == "-":
+        # Titles come from this process's stdin
+        return False
+    return not (args.command == "backup" and args.stdout)
+
+
+# ----------------------------------------------------------------------
+# Helper: resolve the notes chosen with the selection options
+# A single --title keeps the one-note behaviour (and messages); anything
+# else is a batch, applied in this one process with a summary report.
+# ----------------------------------------------------------------------
+def _is_batch(args) -> bool:
+    return (
+        len(args.title or []) > 1
+        or args.titles_from is not None
+        or args.status is not None
+        or args.modified_since is not None
+        or args.match is not None
+    )
+
+
+def _selected_titles(args):
+    from .storage.bulk import read_titles, select_titles
+
+    titles = None
+    if args.title or args.titles_from is not None:
+        titles = list(args.title or [])
+        if args.titles_from == "-":
+            titles += read_titles(sys.stdin)
+        elif args.titles_from is not None:
+            try:
+                with open(args.titles_from, encoding="utf-8") as fh:
+                    titles += read_titles(fh)
+            except OSError as exc:
+                from .utils.console import console
+                console.print(f"[red]Error:[/red] Cannot read titles: {exc}")
+                return None
+    return select_titles(titles, args.status, args.modified_since, args.match)
+
+
+def _no_selection(command: str) -> None:
+    from .utils.console import console
+    console.print(
+        f"[red]Error:[/red] Provide --title, --titles-from or a filter "
+        f"(--status, --modified-since, --match) to {command}."
+    )
+
+
+def _silence_stdout() -> None:
+    """
+    Point stdout at /dev/null after the reader went away, so flushing at
+    exit does not raise a second BrokenPipeError.
+    """
+    import os
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+
+
 # ----------------------------------------------------------------------
 # Main entry point called from the console-script
 # Handles parsing, dispatch, and execution of CLI commands.
 # ----------------------------------------------------------------------
-def run(argv=None) -> None:
+def run(argv=None, forward: bool = True) -> None:
     parser = _build_parser()
     args = parser.parse_args(argv)
 
@@ -93,7 +409,8 @@ def run(argv=None) -> None:
     # Version shortcut: print version and exit immediately
     # --------------------------------------------------------------
     if getattr(args, "version", False):
-        console = Console()
+        from . import __version__
+        from .utils.console import console
         console.print(f"[bold]notes[/bold] version {__version__}")
         return
 
@@ -104,43 +421,212 @@ def run(argv=None) -> None:
         parser.print_help()
         return
 
+    # --------------------------------------------------------------
+    # Profile the command (--profile or NOTES_TRACE); it then always
+    # runs in this process, where it can be measured
+    # --------------------------------------------------------------
+    profile, output = _profile_settings(args)
+    if not profile:
+        _run_command(args, argv, forward)
+        return
+
+    from .utils import profiling
+    profiling.start(output)
+    try:
+        with profiling.span(f"notes {args.command}"):
+            _run_command(args, argv, forward=False)
+    finally:
+        profiling.stop()
+
+
+# ----------------------------------------------------------------------
+# Helper: profiling settings from the command line or NOTES_TRACE
+# Returns (enabled, output file or None).
+# ----------------------------------------------------------------------
+def _profile_settings(args):
+    if args.command == "daemon":
+        # Runs until stopped; its spans would pile up in memory
+        return False, None
+    if args.profile or args.profile_output:
+        return True, args.profile_output
+    from .config import TRACE, TRACE_OUTPUT
+    return TRACE, TRACE_OUTPUT
+
+
+# ----------------------------------------------------------------------
+# Helper: run one parsed subcommand
+# ----------------------------------------------------------------------
+def _run_command(args, argv, forward: bool) -> None:
+    # --------------------------------------------------------------
+    # Hand the command to a running `notes daemon`, if there is one
+    # --------------------------------------------------------------
+    if forward and _forwardable(args):
+        from .daemon.client import forward_command
+        code = forward_command(sys.argv[1:] if argv is None else list(argv))
+        if code is not None:
+            if code:
+                sys.exit(code)
+            return
+
     # --------------------------------------------------------------
     # Dispatch subcommands to their respective implementations
     # --------------------------------------------------------------
     if args.command == "add":
+        from .storage.filesystem import create_note
         create_note(args.title)
 
     elif args.command == "edit":
+        from .storage.filesystem import edit_note
         edit_note(args.title)
 
     elif args.command == "delete":
-        delete_note(args.title)
+        if _is_batch(args):
+            from .storage.bulk import bulk_delete, print_report
+            titles = _selected_titles(args)
+            if titles is not None:
+                print_report(bulk_delete(titles))
+        elif args.title:
+            from .storage.filesystem import delete_note
+            delete_note(args.title[0])
+        else:
+            _no_selection("delete")
 
     elif args.command == "list":
-        list_notes()
+        from .storage.filesystem import list_notes
+        try:
+            list_notes(
+                status=args.status,
+                modified_since=args.modified_since,
+                sort=args.sort,
+                limit=args.limit,
+                offset=args.offset,
+                fmt=args.format,
+            )
+        except BrokenPipeError:
+            # Output piped into e.g. `head`, which has seen enough
+            _silence_stdout()
+
+    elif args.command == "search":
+        from .storage.filesystem import search_notes
+        search_notes(args.query, args.status, args.limit)
+
+    elif args.command == "complete":
+        from .storage.filesystem import complete_titles
+        try:
+            complete_titles(args.text, args.fuzzy, args.limit)
+        except BrokenPipeError:
+            _silence_stdout()
 
     elif args.command == "status":
-        set_status(args.title, args.set)
+        if _is_batch(args):
+            # Many notes: one process, one index update, one summary
+            from .storage.bulk import bulk_set_status, print_report
+            titles = _selected_titles(args)
+            if titles is not None:
+                print_report(bulk_set_status(titles, args.set))
+        elif args.title:
+            from .storage.filesystem import set_status
+            set_status(args.title[0], args.set)
+        else:
+            _no_selection("update")
 
     elif args.command == "export":
-        if args.all:
+        if args.site is not None:
+            if args.pdf or args.html or args.combined or args.watch:
+                from .utils.console import console
+                console.print(
+                    "[red]Error:[/red] --site cannot be combined with --pdf, --html, "
+                    "--combined or --watch."
+                )
+            elif args.title or _is_batch(args):
+                # Only the selected notes
+                titles = _selected_titles(args)
+                if titles is not None:
+                    _export_site(args.site, args.jobs, args.force, titles)
+            else:
+                _export_site(args.site, args.jobs, args.force)
+        elif args.combined and not (args.all and args.pdf):
+            from .utils.console import console
+            console.print("[red]Error:[/red] --combined requires --all and --pdf.")
+        elif args.all and args.combined:
+            # One PDF for the whole notebook (plus per-note HTML if asked)
+            _export_combined(args.force)
+            if args.html:
+                _export_all(False, True, args.jobs, args.force)
+        elif args.all:
             # Export every note in the requested formats
-            for note_file in config.NOTES_DIR.glob("*.md"):
-                title = note_file.stem.replace("_", " ")
-                _export_one(title, args.pdf, args.html)
+            _export_all(args.pdf, args.html, args.jobs, args.force)
+            if args.watch:
+                _watch_exports(args.pdf, args.html)
+        elif _is_batch(args):
+            # Export the selected notes, with a summary instead of one
+            # line per file
+            from .storage.bulk import bulk_export, print_report
+            titles = _selected_titles(args)
+            if titles is not None:
+                print_report(bulk_export(titles, args.pdf, args.html, args.jobs, args.force))
+                if args.watch:
+                    _watch_exports(args.pdf, args.html, titles)
         elif args.title:
             # Export a single specified note
-            _export_one(args.title, args.pdf, args.html)
+            _export_one(args.title[0], args.pdf, args.html, args.force)
+            if args.watch:
+                _watch_exports(args.pdf, args.html, args.title)
         else:
             # Error: user didn’t specify --title or --all
-            console = Console()
+            from .utils.console import console
             console.print(
                 "[red]Error:[/red] Provide --title or --all.", style="red", file=sys.stderr
             )
 
+    elif args.command == "migrate":
+        if args.layout:
+            from .storage.filesystem import migrate_layout
+            migrate_layout(args.layout)
+        else:
+            from .storage.filesystem import migrate_notes
+            migrate_notes(args.to)
+
     elif args.command == "backup":
-        # Create a ZIP archive containing all notes
-        backup_notes()
+        # Create an archive containing all (changed) notes
+        if args.verify is not None:
+            # Check checksums and manifests without writing anything
+            from pathlib import Path
+            from .storage.backup import verify_backup
+            if not verify_backup(Path(args.verify) if args.verify else None):
+                sys.exit(1)
+        else:
+            from .storage.backup import backup_notes
+            backup_notes(full=args.full, to_stdout=args.stdout, jobs=args.jobs)
+
+    elif args.command == "daemon":
+        if args.stop:
+            from .daemon.client import request_stop
+            from .utils.console import console
+            if not request_stop():
+                console.print("[yellow]No notes daemon is running.[/yellow]")
+        else:
+            # Serve commands from a warm process until stopped
+            from .daemon.server import serve
+            serve()
+
+    elif args.command == "restore":
+        # Bring back missing or changed notes from an archive chain
+        from pathlib import Path
+        from .storage.backup import restore_notes
+        restore_notes(Path(args.archive), missing_only=args.missing_only)
+
+    elif args.command == "history":
+        from .storage.history import show_history
+        show_history(args.title, args.limit)
+
+    elif args.command == "diff":
+        from .storage.history import show_diff
+        show_diff(args.title, args.old, args.new)
+
+    elif args.command == "revert":
+        from .storage.history import revert_note
+        revert_note(args.title, args.to)
 
 
 # ----------------------------------------------------------------------
@@ -148,24 +634,153 @@ def run(argv=None) -> None:
 # Reads a note, converts it into the requested formats (PDF/HTML),
 # and prints coloured feedback messages.
 # ----------------------------------------------------------------------
-def _export_one(title: str, pdf: bool, html: bool) -> None:
-    console = Console()
-    note_path = get_note_path(title)
+def _export_one(title: str, pdf: bool, html: bool, force: bool = False) -> None:
+    from .exporters import ExportManifest, export_note
+    from .storage.backends import get_backend
+    from .storage.filesystem import find_note
 
     # Check if note exists
-    if not note_path.exists():
-        console.print(f"[red]Error:[/red] Note '{title}' not found.", style="red")
+    title = find_note(get_backend(), title)
+    if title is None:
+        return
+
+    # Render once, then write every requested format that is out of date
+    manifest = ExportManifest.load()
+    result = export_note(title, pdf, html, manifest, force)
+    manifest.save()
+    _print_export_result(result)
+
+
+# ----------------------------------------------------------------------
+# Helper: export every note
+# Fans the work out over `jobs` processes and reports each note as soon
+# as it finishes; failures are listed but never abort the run.
+# Notes whose exports are already up to date are skipped.
+# ----------------------------------------------------------------------
+def _export_all(pdf: bool, html: bool, jobs: int, force: bool = False) -> None:
+    from .exporters import export_notes
+    from .storage.backends import get_backend
+    from .utils.console import console
+
+    records = get_backend().records()
+    total = len(records)
+    failed = []
+    up_to_date = 0
+
+    results = export_notes(records, pdf, html, jobs, force)
+    for done, result in enumerate(results, start=1):
+        if result.error:
+            failed.append(result.title)
+        elif not result.outputs:
+            # Nothing to report per note; keep the output short
+            up_to_date += 1
+            continue
+        console.print(f"[dim]\\[{done}/{total}][/dim]", end=" ")
+        _print_export_result(result)
+
+    exported = total - len(failed) - up_to_date
+    console.print(
+        f"[bold]Exported {exported} of {total} notes[/bold]"
+        + (f", {up_to_date} up to date" if up_to_date else "")
+        + (f", [red]{len(failed)} failed[/red]" if failed else "")
+    )
+
+
+# ----------------------------------------------------------------------
+# Helper: keep exports current
+# Subscribes to the notes watcher and re-exports each note after it is
+# saved, until interrupted with Ctrl-C.
+# ----------------------------------------------------------------------
+def _watch_exports(pdf: bool, html: bool, titles=None) -> None:
+    import time
+    from .exporters import ExportManifest, export_note, export_notes
+    from .storage.backends import get_backend
+    from .storage.watcher import NotesWatcher
+    from .utils.console import console
+
+    if get_backend().name != "filesystem":
+        console.print("[red]Error:[/red] --watch needs the filesystem storage backend.")
         return
+    if titles is not None:
+        titles = set(titles)
+
+    def on_change(events) -> None:
+        if any(event.kind == "rescan" for event in events):
+            # Events were lost: let the manifest find what is stale
+            records = [r for r in get_backend().records() if titles is None or r.title in titles]
+            results = list(export_notes(records, pdf, html))
+        else:
+            manifest = ExportManifest.load()
+            results = [
+                export_note(event.title, pdf, html, manifest)
+                for event in events
+                if event.kind == "changed" and (titles is None or event.title in titles)
+            ]
+            manifest.save()
+        for result in results:
+            if result.outputs or result.error:
+                _print_export_result(result)
+
+    with NotesWatcher() as watcher:
+        watcher.subscribe(on_change)
+        console.print(f"[dim]Watching for changes ({watcher.mode}), press Ctrl-C to stop[/dim]")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+# ----------------------------------------------------------------------
+# Helper: export every note into a single PDF
+# ----------------------------------------------------------------------
+def _export_combined(force: bool = False) -> None:
+    from .exporters import export_combined_pdf
+    from .storage.backends import get_backend
+    from .utils.console import console
+
+    records = get_backend().records()
+    result = export_combined_pdf(records, force)
+    _print_export_result(result)
+    if result.outputs:
+        console.print(f"[bold]Combined {len(records)} notes into one PDF[/bold]")
 
-    # Read note content as markdown
-    markdown_text = note_path.read_text(encoding="utf-8")
 
-    # Export to HTML if requested
-    if html:
-        out_path = export_html(title, markdown_text)
-        console.print(f"[green]Exported HTML:[/green] {out_path}")
+# ----------------------------------------------------------------------
+# Helper: build a static website of the notes
+# ----------------------------------------------------------------------
+def _export_site(directory: str, jobs: int, force: bool = False, titles=None) -> None:
+    from pathlib import Path
+    from .exporters.site import build_site
+    from .storage.backends import get_backend
+    from .utils.console import console
+
+    records = get_backend().records()
+    if titles is not None:
+        selected = set(titles)
+        records = [record for record in records if record.title in selected]
+
+    site_dir = Path(directory)
+    result = build_site(site_dir, records, jobs, force)
+    for title, error in result.failed:
+        console.print(f"[red]Error:[/red] Exporting '{title}' failed: {error}")
+    console.print(
+        f"[bold]Built {len(records)} notes into {site_dir}[/bold]: "
+        f"{len(result.written)} pages written, {result.up_to_date} up to date"
+        + (f", {len(result.removed)} removed" if result.removed else "")
+        + (f", [red]{len(result.failed)} failed[/red]" if result.failed else "")
+    )
+
+
+def _print_export_result(result) -> None:
+    from .utils.console import console
+
+    if result.error:
+        console.print(f"[red]Error:[/red] Exporting '{result.title}' failed: {result.error}")
+        return
 
-    # Export to PDF if requested
-    if pdf:
-        out_path = export_pdf(title, markdown_text)
-        console.print(f"[green]Exported PDF:[/green] {out_path}")
+    for out_path in result.outputs:
+        kind = "PDF" if out_path.suffix == ".pdf" else "HTML"
+        console.print(f"[green]Exported {kind}:[/green] {out_path}")
+    for out_path in result.skipped:
+        console.print(f"[dim]Up to date:[/dim] {out_path}")
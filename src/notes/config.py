@@ -14,10 +14,131 @@ NOTES_DIR = HOME / ".local" / "share" / "notes"
 # Default location to save exported files (e.g., PDFs/HTMLs)
 DOWNLOADS_DIR = HOME / "Downloads"
 
+# Single-file database used by the "sqlite" storage backend
+SQLITE_DB_PATH = NOTES_DIR / "notes.sqlite3"
+
+# Hidden directory next to the notes holding derived data (indexes, caches).
+# Kept in its own subdirectory so rewriting it never touches NOTES_DIR's mtime.
+STATE_DIR = NOTES_DIR / ".notes"
+
 # Ensure required directories exist when the module is imported
 # (prevents runtime errors when creating or exporting notes)
 NOTES_DIR.mkdir(parents=True, exist_ok=True)
 DOWNLOADS_DIR.mkdir(parents=True, exist_ok=True)
+STATE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+# ----------------------------------------------------------------------
+# Storage backend
+# ----------------------------------------------------------------------
+
+# How notes are stored: "filesystem" (one Markdown file per note) or
+# "sqlite" (a single database file). Use `notes migrate` to switch.
+STORAGE_BACKEND = os.environ.get("NOTES_BACKEND", "filesystem")
+
+
+# ----------------------------------------------------------------------
+# Derived data
+# ----------------------------------------------------------------------
+
+# Metadata index (title, status, mtime, size, hash) used by `notes list`
+INDEX_PATH = STATE_DIR / "index.json"
+
+# Every title with its filename, sorted, for lookups and shell completion
+TITLES_PATH = STATE_DIR / "titles.json"
+
+# Manifest of exported files, used to skip notes that have not changed
+EXPORT_MANIFEST_PATH = STATE_DIR / "exports.json"
+
+# SQLite database holding the full-text search index
+SEARCH_DB_PATH = STATE_DIR / "search.sqlite"
+
+# Checksums of the notes as of the last backup (for incremental backups)
+BACKUP_STATE_PATH = STATE_DIR / "backups.json"
+
+# Rendered HTML keyed by content hash, so unchanged notes are not re-rendered
+RENDER_CACHE_DIR = STATE_DIR / "render-cache"
+
+
+# ----------------------------------------------------------------------
+# Version history
+# ----------------------------------------------------------------------
+
+# SQLite database holding every saved version of every note (compressed
+# blobs named by their content hash, and the list of versions per note).
+# Unlike the other files here it cannot be rebuilt from the notes.
+HISTORY_DB_PATH = STATE_DIR / "history.sqlite"
+
+# Store versions as deltas against earlier versions of the same note
+# (False: a compressed full copy of each distinct version)
+HISTORY_DELTAS = True
+
+# Changed regions longer than this many lines (old and new together) are
+# stored as inserted text instead of being diffed line by line, which
+# takes quadratic time in the worst case
+HISTORY_DIFF_LINES = 20000
+
+# NOTES_NO_HISTORY=1 stops recording versions
+KEEP_HISTORY = os.environ.get("NOTES_NO_HISTORY", "") in ("", "0")
+
+
+# ----------------------------------------------------------------------
+# Concurrent access
+# ----------------------------------------------------------------------
+
+# Advisory lock files (one per note while it is being written)
+LOCK_DIR = STATE_DIR / "locks"
+
+# Edits that could not be saved because the note changed in the meantime
+CONFLICTS_DIR = STATE_DIR / "conflicts"
+
+
+# ----------------------------------------------------------------------
+# Markdown rendering
+# ----------------------------------------------------------------------
+
+# markdown2 extras to enable, comma-separated in NOTES_MARKDOWN_EXTRAS
+# (e.g. "fenced-code-blocks,tables,strike"). None by default, which
+# matches plain markdown2.markdown() output.
+MARKDOWN_EXTRAS = tuple(
+    extra.strip()
+    for extra in os.environ.get("NOTES_MARKDOWN_EXTRAS", "").split(",")
+    if extra.strip()
+)
+
+# Rendered documents kept in memory / on disk (least recently used go first)
+RENDER_CACHE_MEMORY_ENTRIES = 256
+RENDER_CACHE_DISK_ENTRIES = 4096
+
+# Notes at least this large (in bytes) are exported to HTML piece by piece
+# straight into the output file, so memory use does not grow with them
+# (and rendering time grows linearly: markdown2 slows down more than
+# proportionally on long documents)
+STREAM_EXPORT_BYTES = 1 << 20
+
+
+# ----------------------------------------------------------------------
+# Daemon
+# ----------------------------------------------------------------------
+
+# Unix domain socket served by `notes daemon`. While it exists, `list`,
+# `status`, `export` and `backup` are forwarded to the daemon.
+DAEMON_SOCKET_PATH = Path(os.environ.get("NOTES_SOCKET") or STATE_DIR / "daemon.sock")
+
+# NOTES_NO_DAEMON=1 always runs commands in-process
+USE_DAEMON = os.environ.get("NOTES_NO_DAEMON", "") in ("", "0")
+
+
+# ----------------------------------------------------------------------
+# Profiling
+# ----------------------------------------------------------------------
+
+# NOTES_TRACE=1 profiles every command like `notes --profile`, printing a
+# timing summary to stderr; NOTES_TRACE=FILE also writes a Chrome trace
+# (FILE.json) or cProfile statistics (FILE.prof), like --profile-output.
+_trace = os.environ.get("NOTES_TRACE", "")
+TRACE = _trace not in ("", "0")
+TRACE_OUTPUT = _trace if _trace not in ("", "0", "1") else None
 
 
 # ----------------------------------------------------------------------
@@ -27,6 +148,13 @@ DOWNLOADS_DIR.mkdir(parents=True, exist_ok=True)
 # Default status assigned to a new note
 DEFAULT_STATUS = "open"
 
+# Every status, in workflow order (used when sorting by status)
+STATUSES = ("open", "in progress", "done")
+
+# Only this many leading bytes of a note are examined for its status
+# comment, so large notes are never read in full just for their status
+STATUS_HEADER_BYTES = 4096
+
 # Template used to embed note status in Markdown files
 # Example: "<!-- status: open -->"
 STATUS_COMMENT_TEMPLATE = "<!-- status: {} -->\n"
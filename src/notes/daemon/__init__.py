@@ -0,0 +1,14 @@
+from .client import forward_command, request_stop
+
+__all__ = ["forward_command", "request_stop", "serve"]
+
+
+def __getattr__(name: str):
+    # Resolve the server lazily: it pulls in socketserver and threading,
+    # while the client is imported by every command that may be forwarded.
+    if name != "serve":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from .server import serve
+
+    return serve
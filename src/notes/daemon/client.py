@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+from typing import List, Optional
+
+from ..config import (
+    DAEMON_SOCKET_PATH,
+    KEEP_HISTORY,
+    MARKDOWN_EXTRAS,
+    NOTES_DIR,
+    STORAGE_BACKEND,
+    USE_DAEMON,
+)
+
+# Kept small on purpose: this module is imported by the CLI on every
+# forwarded command, so it only needs socket and json.
+
+
+def config_fingerprint() -> dict:
+    """
+    Settings a command's result depends on.
+
+    The daemon only serves clients whose fingerprint matches its own;
+    anyone else (e.g. a shell with a different NOTES_BACKEND) runs the
+    command in-process.
+    """
+    return {
+        "notes_dir": str(NOTES_DIR),
+        "backend": STORAGE_BACKEND,
+        "markdown_extras": list(MARKDOWN_EXTRAS),
+        "keep_history": KEEP_HISTORY,
+    }
+
+
+def _terminal() -> dict:
+    """
+    Describe the client's terminal so the daemon renders for it.
+    """
+    try:
+        width = os.get_terminal_size(sys.stdout.fileno()).columns
+    except (OSError, ValueError):
+        width = 80
+    return {
+        "tty": sys.stdout.isatty(),
+        "width": width,
+        "env": {key: os.environ[key] for key in ("TERM", "COLORTERM", "NO_COLOR") if key in os.environ},
+    }
+
+
+def _connect(path: Optional[str] = None):
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path or str(DAEMON_SOCKET_PATH))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+# ----------------------------------------------------------------------
+# Forward a command to a running daemon
+# ----------------------------------------------------------------------
+def forward_command(argv: List[str]) -> Optional[int]:
+    """
+    Run a command in the daemon and stream its output here.
+
+    Returns
+    -------
+    int or None
+        The command's exit status, or None if no daemon is running (or
+        it declined the request) and the caller should run the command
+        itself.
+    """
+    if not USE_DAEMON or not DAEMON_SOCKET_PATH.exists():
+        return None
+    sock = _connect()
+    if sock is None:
+        # Stale socket file left by a daemon that is gone
+        return None
+
+    request = {
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "fingerprint": config_fingerprint(),
+        "terminal": _terminal(),
+    }
+    with sock, sock.makefile("rwb") as stream:
+        try:
+            stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            stream.flush()
+            for line in stream:
+                message = json.loads(line)
+                if "out" in message:
+                    sys.stdout.write(message["out"])
+                    sys.stdout.flush()
+                elif "exit" in message:
+                    return message["exit"]
+                elif "refused" in message:
+                    return None
+        except BrokenPipeError:
+            # Our reader (e.g. `head`) exited; closing the connection
+            # tells the daemon to stop producing output
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 0
+        except (OSError, ValueError):
+            pass
+
+    # The daemon went away mid-command; it may have partly run, so the
+    # command is not repeated here
+    sys.stderr.write("notes: lost connection to the daemon\n")
+    return 1
+
+
+def daemon_running() -> bool:
+    """
+    True if a daemon is serving the socket.
+    """
+    sock = _connect() if DAEMON_SOCKET_PATH.exists() else None
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def request_stop() -> bool:
+    """
+    Ask a running daemon to shut down. Returns False if none is running.
+    """
+    sock = _connect() if DAEMON_SOCKET_PATH.exists() else None
+    if sock is None:
+        return False
+    with sock:
+        sock.sendall(json.dumps({"control": "stop"}).encode("utf-8") + b"\n")
+        sock.recv(1024)
+    return True
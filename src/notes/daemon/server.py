@@ -0,0 +1,265 @@
+import json
+import os
+import signal
+import socketserver
+import threading
+from typing import Optional
+
+from ..config import DAEMON_SOCKET_PATH
+from ..utils.console import console
+from .client import _connect, config_fingerprint
+
+# Seconds between background refreshes of the note metadata
+REFRESH_INTERVAL = 2.0
+
+
+# ----------------------------------------------------------------------
+# Output sent back to the client
+# ----------------------------------------------------------------------
+class _ClientStream:
+    """
+    File-like object turning console output into protocol messages.
+    """
+
+    def __init__(self, wfile, tty: bool):
+        self.wfile = wfile
+        self.tty = tty
+
+    def write(self, text: str) -> int:
+        _send(self.wfile, {"out": text})
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return self.tty
+
+
+def _send(wfile, message: dict) -> None:
+    wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+    wfile.flush()
+
+
+def _client_console(terminal: dict, stream: _ClientStream):
+    """
+    A Rich console rendering for the client's terminal, not the daemon's.
+    """
+    from rich.console import Console
+
+    env = terminal.get("env", {})
+    if not terminal.get("tty") or "NO_COLOR" in env:
+        color_system = None
+    elif env.get("COLORTERM") in ("truecolor", "24bit"):
+        color_system = "truecolor"
+    elif "256" in env.get("TERM", ""):
+        color_system = "256"
+    else:
+        color_system = "standard"
+    return Console(
+        file=stream,
+        force_terminal=bool(terminal.get("tty")),
+        color_system=color_system,
+        width=int(terminal.get("width") or 80),
+        highlight=True,
+    )
+
+
+# ----------------------------------------------------------------------
+# Request handling
+# ----------------------------------------------------------------------
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+
+        if request.get("control") == "stop":
+            _send(self.wfile, {"stopping": True})
+            threading.Thread(target=self.server.shutdown).start()
+            return
+
+        if request.get("fingerprint") != config_fingerprint():
+            _send(self.wfile, {"refused": "configuration differs"})
+            return
+
+        try:
+            code = self.server.run_command(request, self.wfile)
+            _send(self.wfile, {"exit": code})
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up (e.g. Ctrl-C); nothing left to report to
+            pass
+
+
+class NotesDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serve CLI commands over a Unix socket from one warm process.
+
+    Connections are accepted concurrently, but commands run one at a
+    time: they share the storage backend, the caches and the console.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        super().__init__(socket_path, _Handler)
+        self.command_lock = threading.Lock()
+
+    def run_command(self, request: dict, wfile) -> int:
+        """
+        Run one CLI invocation, streaming its output to `wfile`.
+
+        Returns the command's exit status.
+        """
+        from ..cli import run
+
+        stream = _ClientStream(wfile, bool(request["terminal"].get("tty")))
+        target = _client_console(request["terminal"], stream)
+        with self.command_lock, console.redirect(target):
+            try:
+                os.chdir(request.get("cwd") or "/")
+                run(request["argv"], forward=False)
+            except SystemExit as exc:
+                return exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception as exc:
+                target.print(f"[red]Error:[/red] {type(exc).__name__}: {exc}")
+                return 1
+        return 0
+
+
+# ----------------------------------------------------------------------
+# Keeping state warm
+# ----------------------------------------------------------------------
+def _warm_up() -> None:
+    """
+    Import and initialize everything commands need, once.
+    """
+    import io
+
+    from rich.console import Console
+    from rich.table import Table
+
+    from ..exporters.markdown_renderer import get_renderer
+    from ..storage.backends import get_backend
+
+    # Lay out a table once, so the first listing does not pay for the
+    # measuring and wrapping code
+    table = Table(title="notes")
+    table.add_column("Title")
+    table.add_row("notes")
+    Console(file=io.StringIO(), width=80).print(table)
+
+    get_renderer().render("# notes\n")
+    get_backend().records()
+    try:
+        from ..exporters.pdf_exporter import _pdf_resources
+        _pdf_resources()
+    except Exception as exc:
+        # PDF export reports the same error when it is used
+        console.print(f"[yellow]PDF export unavailable:[/yellow] {exc}")
+
+
+def _watch_notes(server: NotesDaemon):
+    """
+    Apply changes to the notes directory as they happen.
+
+    With the watcher running, the metadata index is trusted as is, so
+    commands never stat every note. Returns the running watcher.
+    """
+    from ..storage.index import refresh_index, set_watched
+    from ..storage.search import sync_search_index
+    from ..storage.watcher import NotesWatcher, update_derived_data
+
+    def on_change(events) -> None:
+        with server.command_lock:
+            update_derived_data(events)
+
+    watcher = NotesWatcher()
+    watcher.subscribe(on_change)
+    watcher.start()
+    # Catch up on anything that changed before the watch was in place
+    with server.command_lock:
+        refresh_index()
+        # Searches no longer sync the search index themselves
+        sync_search_index()
+        set_watched(True)
+    console.print(f"[dim]Watching notes ({watcher.mode})[/dim]")
+    return watcher
+
+
+def _refresh_loop(server: NotesDaemon, stop: threading.Event) -> None:
+    """
+    Keep the note metadata current between requests, so commands find
+    it already up to date (for backends without a directory to watch).
+    """
+    from ..storage.backends import get_backend
+
+    while not stop.wait(REFRESH_INTERVAL):
+        with server.command_lock:
+            try:
+                get_backend().records()
+            except Exception as exc:
+                console.print(f"[red]Refresh failed:[/red] {exc}")
+
+
+# ----------------------------------------------------------------------
+# Run the daemon
+# ----------------------------------------------------------------------
+def serve(socket_path: Optional[str] = None) -> None:
+    """
+    Run `notes daemon` in the foreground until stopped.
+
+    Stops on SIGINT/SIGTERM or `notes daemon --stop`; the socket file
+    is removed on exit, so clients fall back to running commands
+    themselves.
+    """
+    path = socket_path or str(DAEMON_SOCKET_PATH)
+    if os.path.exists(path):
+        sock = _connect(path)
+        if sock is not None:
+            sock.close()
+            console.print(f"[yellow]A notes daemon is already running[/yellow] ({path})")
+            return
+        # Left behind by a daemon that did not exit cleanly
+        os.unlink(path)
+
+    _warm_up()
+
+    old_umask = os.umask(0o077)
+    try:
+        server = NotesDaemon(path)
+    finally:
+        os.umask(old_umask)
+
+    def _terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _terminate)
+
+    from ..storage.backends import get_backend
+
+    stop = threading.Event()
+    watcher = None
+    if get_backend().name == "filesystem":
+        watcher = _watch_notes(server)
+    else:
+        threading.Thread(target=_refresh_loop, args=(server, stop), daemon=True).start()
+
+    console.print(f"[green]notes daemon listening on[/green] {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if watcher is not None:
+            watcher.stop()
+        server.server_close()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    console.print("[dim]notes daemon stopped[/dim]")
@@ -1,3 +1,6 @@
-from .markdown_renderer import render_markdown_to_html
-from .html_exporter import export_html
-from .pdf_exporter import export_pdf
+from .markdown_renderer import MarkdownRenderer, get_renderer, render_markdown_to_html
+from .html_exporter import export_html, write_html, write_html_stream
+from .pdf_exporter import export_pdf, write_combined_pdf, write_pdf
+from .manifest import ExportManifest
+from .batch import ExportResult, export_combined_pdf, export_note, export_notes
+from .site import SiteResult, build_site
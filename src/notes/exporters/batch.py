@@ -0,0 +1,325 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..config import STREAM_EXPORT_BYTES
+from ..storage.backends import NoteRecord, get_backend, reset_backend
+from ..utils import profiling
+from ..utils.hashing import content_hash
+from . import html_exporter, pdf_exporter
+from .manifest import ExportManifest
+from .markdown_renderer import render_markdown_to_html
+
+
+class ExportResult(NamedTuple):
+    """
+    Outcome of exporting one note.
+
+    `outputs` lists the files written and `skipped` those that were
+    already up to date; `error` is set when the export failed, so one
+    broken note never aborts a bulk run.
+    """
+
+    title: str
+    outputs: List[Path]
+    error: Optional[str] = None
+    skipped: Sequence[Path] = ()
+    source_hash: Optional[str] = None
+
+
+class _Format(NamedTuple):
+    name: str
+    output_path: Callable[[str], Path]
+    write: Callable[[str, str], Path]
+    version: str
+
+
+_HTML = _Format("html", html_exporter.html_output_path, html_exporter.write_html, html_exporter.EXPORTER_VERSION)
+_PDF = _Format("pdf", pdf_exporter.pdf_output_path, pdf_exporter.write_pdf, pdf_exporter.EXPORTER_VERSION)
+
+
+def _requested(pdf: bool, html: bool) -> List[_Format]:
+    return [fmt for fmt, wanted in ((_HTML, html), (_PDF, pdf)) if wanted]
+
+
+def _version_for(out_path: Path) -> str:
+    return _PDF.version if out_path.suffix == ".pdf" else _HTML.version
+
+
+def _split_stale(
+    title: str,
+    source_hash: str,
+    formats: List[_Format],
+    manifest: Optional[ExportManifest],
+    force: bool,
+) -> Tuple[List[_Format], List[Path]]:
+    """
+    Separate the formats that need exporting from those already up to date.
+    """
+    if manifest is None or force:
+        return formats, []
+
+    stale, skipped = [], []
+    for fmt in formats:
+        out_path = fmt.output_path(title)
+        if manifest.is_current(out_path, source_hash, fmt.version):
+            skipped.append(out_path)
+        else:
+            stale.append(fmt)
+    return stale, skipped
+
+
+# ----------------------------------------------------------------------
+# Export a single note (runs in worker processes for bulk exports)
+# ----------------------------------------------------------------------
+def export_note(
+    title: str,
+    pdf: bool,
+    html: bool,
+    manifest: Optional[ExportManifest] = None,
+    force: bool = False,
+) -> ExportResult:
+    """
+    Export one note to the requested formats.
+
+    The Markdown is rendered only once, even when both HTML and PDF
+    are requested. With a manifest, formats whose output is already up
+    to date are skipped and fresh outputs are recorded (the caller
+    saves the manifest). Any exception is captured in the result,
+    together with the files written before it happened.
+
+    Notes of STREAM_EXPORT_BYTES or more are exported to HTML without
+    ever being loaded whole, and are not render-cached (see `_export_streamed`); a PDF still needs
+    the whole document.
+    """
+    outputs: List[Path] = []
+    try:
+        with profiling.span("export.note", title=title):
+            backend = get_backend()
+            with backend.open_note(title) as fh:
+                fh.seek(0, os.SEEK_END)
+                size = fh.tell()
+                fh.seek(0)
+                if size >= STREAM_EXPORT_BYTES:
+                    streamed = _export_streamed(title, fh, pdf, html, manifest, force)
+                    if streamed is not None:
+                        return streamed
+                data = fh.read()
+            profiling.count("notes_read")
+            profiling.count("bytes_read", len(data))
+            markdown_text = data.decode("utf-8")
+            source_hash = content_hash(data)
+            del data
+            stale, skipped = _split_stale(
+                title, source_hash, _requested(pdf, html), manifest, force
+            )
+
+            if stale:
+                with profiling.span("render"):
+                    html_body = render_markdown_to_html(markdown_text)
+                for fmt in stale:
+                    with profiling.span(f"write.{fmt.name}"):
+                        out_path = fmt.write(title, html_body)
+                    outputs.append(out_path)
+                    if manifest is not None:
+                        manifest.record(out_path, source_hash, fmt.version)
+
+        return ExportResult(title, outputs, skipped=skipped, source_hash=source_hash)
+
+    except Exception as exc:
+        return ExportResult(title, outputs, f"{type(exc).__name__}: {exc}")
+
+
+def _export_streamed(
+    title: str,
+    fh,
+    pdf: bool,
+    html: bool,
+    manifest: Optional[ExportManifest],
+    force: bool,
+) -> Optional[ExportResult]:
+    """
+    Export a large note read from `fh` to HTML piece by piece, or
+    return None if a PDF is due too (which needs the whole note).
+
+    Whether exports are up to date is decided by the hash in the note's
+    metadata, so an up-to-date note is not even read; the manifest
+    records the hash of the text actually exported, computed while
+    streaming.
+    """
+    record = get_backend().record(title)
+    if record is None:
+        raise FileNotFoundError(f"No note titled {title!r}")
+    stale, skipped = _split_stale(title, record.hash, _requested(pdf, html), manifest, force)
+    if _PDF in stale:
+        return None
+    if not stale:
+        return ExportResult(title, [], skipped=skipped, source_hash=record.hash)
+
+    digest = hashlib.sha256()
+    with profiling.span("write.html.stream"):
+        out_path = html_exporter.write_html_stream(title, fh, digest)
+    profiling.count("notes_read")
+    profiling.count("bytes_read", fh.tell())
+    source_hash = digest.hexdigest()
+    if manifest is not None:
+        manifest.record(out_path, source_hash, _HTML.version)
+    return ExportResult(title, [out_path], skipped=skipped, source_hash=source_hash)
+
+
+# ----------------------------------------------------------------------
+# Export many notes, optionally across a process pool
+# ----------------------------------------------------------------------
+def export_notes(
+    records: Iterable[NoteRecord],
+    pdf: bool,
+    html: bool,
+    jobs: int = 1,
+    force: bool = False,
+) -> Iterator[ExportResult]:
+    """
+    Export notes and yield results as they complete.
+
+    Notes whose outputs are recorded as up to date in the export
+    manifest are skipped unless `force` is set.
+
+    Parameters
+    ----------
+    records : iterable of NoteRecord
+        Notes to export, as listed by the storage backend
+    pdf, html : bool
+        Formats to produce
+    jobs : int
+        Number of worker processes; 1 exports in-process,
+        0 or less uses one worker per CPU.
+    force : bool
+        Re-export every note regardless of the manifest
+    """
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+
+    manifest = ExportManifest.load()
+    try:
+        if jobs == 1:
+            for record in records:
+                yield export_note(record.title, pdf, html, manifest, force)
+        else:
+            yield from _export_in_pool(records, pdf, html, jobs, manifest, force)
+    finally:
+        # Keep progress even if the run is interrupted
+        manifest.save()
+
+
+def _export_in_pool(
+    records: Iterable[NoteRecord],
+    pdf: bool,
+    html: bool,
+    jobs: int,
+    manifest: ExportManifest,
+    force: bool,
+) -> Iterator[ExportResult]:
+    """
+    Decide what is stale in this process, render it in worker processes,
+    and record the workers' outputs in the manifest as they arrive.
+
+    Staleness is judged from the content hashes the storage backend
+    already knows, so up-to-date notes are never read. Workers never
+    touch the manifest, so there is a single writer. A note whose worker
+    fails gets a failed result; if the pool itself breaks, the notes
+    still pending are exported in this process.
+    """
+    requested = _requested(pdf, html)
+    # Notes left to export in this process once the pool is broken
+    serial: List[Tuple[str, List[_Format], Sequence[Path]]] = []
+
+    # Spawned, not forked: under the daemon this process runs threads,
+    # whose locks a forked worker could inherit in a held state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(jobs, mp_context=context, initializer=reset_backend) as pool:
+        futures = {}
+        for record in records:
+            title = record.title
+            stale, skipped = _split_stale(title, record.hash, requested, manifest, force)
+            if not stale:
+                yield ExportResult(title, [], skipped=skipped, source_hash=record.hash)
+                continue
+
+            job = (title, stale, skipped)
+            if serial:
+                serial.append(job)
+                continue
+            try:
+                future = pool.submit(export_note, title, _PDF in stale, _HTML in stale)
+            except BrokenProcessPool:
+                serial.append(job)
+                continue
+            futures[future] = job
+        # Worker processes are not profiled: their time is the caller's
+        # own time in a profile
+        profiling.count("notes_submitted", len(futures))
+
+        for future in as_completed(futures):
+            title, stale, skipped = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                # A worker died (killed, out of memory...): every pending
+                # note lands here and is exported below instead
+                serial.append((title, stale, skipped))
+                continue
+            except Exception as exc:
+                result = ExportResult(title, [], f"{type(exc).__name__}: {exc}")
+            yield _record_outputs(result._replace(skipped=skipped), manifest)
+
+    for title, stale, skipped in serial:
+        result = export_note(title, _PDF in stale, _HTML in stale)
+        yield _record_outputs(result._replace(skipped=skipped), manifest)
+
+
+def _record_outputs(result: ExportResult, manifest: ExportManifest) -> ExportResult:
+    if result.source_hash is not None:
+        for out_path in result.outputs:
+            manifest.record(out_path, result.source_hash, _version_for(out_path))
+    return result
+
+
+# ----------------------------------------------------------------------
+# Export many notes into one combined PDF
+# ----------------------------------------------------------------------
+def export_combined_pdf(records: Sequence[NoteRecord], force: bool = False) -> ExportResult:
+    """
+    Export the given notes, in order, as a single PDF with a table of
+    contents and one note per page.
+
+    The PDF is skipped if it was produced from exactly these notes (same
+    titles, order and content) by the current exporter version.
+    """
+    out_path = pdf_exporter.combined_pdf_output_path()
+    title = out_path.name
+    source_hash = content_hash(
+        "\n".join(f"{record.title}\0{record.hash}" for record in records).encode("utf-8")
+    )
+
+    manifest = ExportManifest.load()
+    if not force and manifest.is_current(out_path, source_hash, pdf_exporter.COMBINED_VERSION):
+        return ExportResult(title, [], skipped=[out_path], source_hash=source_hash)
+
+    try:
+        backend = get_backend()
+        with profiling.span("render"):
+            sections = [
+                (record.title, render_markdown_to_html(backend.read(record.title)))
+                for record in records
+            ]
+        with profiling.span("write.pdf"):
+            pdf_exporter.write_combined_pdf(sections)
+    except Exception as exc:
+        return ExportResult(title, [], f"{type(exc).__name__}: {exc}")
+
+    manifest.record(out_path, source_hash, pdf_exporter.COMBINED_VERSION)
+    manifest.save()
+    return ExportResult(title, [out_path], source_hash=source_hash)
@@ -1,6 +1,11 @@
 from pathlib import Path
+from typing import BinaryIO
 from ..config import DOWNLOADS_DIR
-from .markdown_renderer import render_markdown_to_html
+from ..storage.titles import filename_for
+from ..utils.atomic import atomic_write, atomic_writer
+from ..utils.hashing import content_hash
+from .manifest import ExportManifest
+from .markdown_renderer import get_renderer, render_markdown_to_html
 
 # ----------------------------------------------------------------------
 # Minimal CSS for monospace rendering in HTML
@@ -13,10 +18,25 @@ MONO_CSS = """
 </style>
 """
 
+# Identifies the output produced by this exporter. Bump the revision when
+# the generated HTML changes; the stylesheet and the Markdown renderer
+# configuration (markdown2 version, extras) are hashed in automatically.
+EXPORTER_VERSION = "html-1-" + content_hash(
+    (MONO_CSS + get_renderer().version).encode("utf-8")
+)[:12]
+
+
+def html_output_path(title: str) -> Path:
+    """
+    Path of the HTML file exported for a note title.
+    """
+    return DOWNLOADS_DIR / filename_for(title, ".html")
+
+
 # ----------------------------------------------------------------------
 # Export a Markdown note as an HTML file
 # ----------------------------------------------------------------------
-def export_html(title: str, markdown_text: str) -> Path:
+def export_html(title: str, markdown_text: str, force: bool = False) -> Path:
     """
     Convert Markdown content into an HTML file with monospace styling.
 
@@ -26,23 +46,81 @@ def export_html(title: str, markdown_text: str) -> Path:
         Title of the note (used to generate the HTML filename)
     markdown_text : str
         The Markdown content to convert
+    force : bool
+        Re-export even if the existing file is already up to date
 
     Returns
     -------
     Path
         Path to the generated HTML file in the DOWNLOADS_DIR
+        (unchanged if it was already up to date)
     """
+    out_path = html_output_path(title)
+    source_hash = content_hash(markdown_text.encode("utf-8"))
+
+    # Skip the export if this exact note was already exported
+    manifest = ExportManifest.load()
+    if not force and manifest.is_current(out_path, source_hash, EXPORTER_VERSION):
+        return out_path
+
     # Convert Markdown to HTML
-    html_body = render_markdown_to_html(markdown_text)
+    write_html(title, render_markdown_to_html(markdown_text))
+
+    manifest.record(out_path, source_hash, EXPORTER_VERSION)
+    manifest.save()
+    return out_path
+
+
+def write_html(title: str, html_body: str) -> Path:
+    """
+    Write already-rendered HTML to the DOWNLOADS_DIR.
+
+    Lets callers that export several formats render the Markdown once.
 
+    Parameters
+    ----------
+    title : str
+        Title of the note (used to generate the HTML filename)
+    html_body : str
+        HTML produced by `render_markdown_to_html`
+
+    Returns
+    -------
+    Path
+        Path to the generated HTML file in the DOWNLOADS_DIR
+    """
     # Apply monospace CSS
     full_html = MONO_CSS + html_body
 
     # Generate filename from the title
-    filename = f"{title.replace(' ', '_')}.html"
-    out_path = DOWNLOADS_DIR / filename
+    out_path = html_output_path(title)
+
+    # Write the HTML content to disk (replaced atomically, so a browser
+    # reloading it never sees a partial file)
+    atomic_write(out_path, full_html, fsync=False)
+
+    return out_path
 
-    # Write the HTML content to disk
-    out_path.write_text(full_html, encoding="utf-8")
 
+def write_html_stream(title: str, fh: BinaryIO, digest=None) -> Path:
+    """
+    Render a Markdown note read from a binary file and write it as HTML,
+    piece by piece, so memory use stays bounded for notes of any size.
+
+    See `MarkdownRenderer.render_stream` for how the note is cut and
+    for `digest`. Used for notes of STREAM_EXPORT_BYTES or more.
+
+    Returns
+    -------
+    Path
+        Path to the generated HTML file in the DOWNLOADS_DIR
+    """
+    out_path = html_output_path(title)
+    with atomic_writer(out_path, fsync=False) as out:
+        out.write(MONO_CSS.encode("utf-8"))
+        for number, html in enumerate(get_renderer().render_stream(fh, digest)):
+            # Blocks are separated by a blank line, as in a whole document
+            if number:
+                out.write(b"\n")
+            out.write(html.encode("utf-8"))
     return out_path
@@ -0,0 +1,93 @@
+import json
+from pathlib import Path
+
+from ..config import EXPORT_MANIFEST_PATH
+from ..utils import profiling
+from ..utils.atomic import atomic_write
+
+# Bump whenever the manifest layout changes; older files are ignored.
+MANIFEST_VERSION = 1
+
+
+class ExportManifest:
+    """
+    Record of what every exported file was generated from.
+
+    Each output path maps to:
+    - the content hash of the source note,
+    - the exporter version (format revision + stylesheet hash),
+    - the output's size and mtime when it was written.
+
+    An output is up to date only if all of these still match, so
+    changing the note, the CSS, or touching/deleting the exported
+    file all trigger a fresh export.
+    """
+
+    def __init__(self, path: Path = EXPORT_MANIFEST_PATH):
+        self.path = path
+        self.entries: dict = {}
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Load / save helpers
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, path: Path = EXPORT_MANIFEST_PATH) -> "ExportManifest":
+        """
+        Read the manifest from disk (empty if missing or incompatible).
+        """
+        manifest = cls(path)
+        try:
+            with profiling.span("manifest.load"):
+                data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return manifest
+
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            manifest.entries = data.get("outputs", {})
+        return manifest
+
+    def save(self) -> None:
+        """
+        Write the manifest atomically, if anything was recorded.
+        """
+        if not self._dirty:
+            return
+        with profiling.span("manifest.save"):
+            atomic_write(
+                self.path,
+                json.dumps({"version": MANIFEST_VERSION, "outputs": self.entries}),
+                fsync=False,
+            )
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Queries / updates
+    # ------------------------------------------------------------------
+    def is_current(self, out_path: Path, source_hash: str, version: str) -> bool:
+        """
+        True if `out_path` was produced from this exact source by this
+        exporter version and has not been modified since.
+        """
+        entry = self.entries.get(str(out_path))
+        if entry is None or entry["source"] != source_hash or entry["version"] != version:
+            return False
+
+        try:
+            st = out_path.stat()
+        except FileNotFoundError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
+
+    def record(self, out_path: Path, source_hash: str, version: str) -> None:
+        """
+        Remember that `out_path` was just written from `source_hash`.
+        """
+        st = out_path.stat()
+        self.entries[str(out_path)] = {
+            "source": source_hash,
+            "version": version,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+        }
+        self._dirty = True
@@ -1,5 +1,322 @@
+import codecs
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional
+
 import markdown2
 
+from ..config import (
+    MARKDOWN_EXTRAS,
+    RENDER_CACHE_DIR,
+    RENDER_CACHE_DISK_ENTRIES,
+    RENDER_CACHE_MEMORY_ENTRIES,
+)
+from ..utils import profiling
+from ..utils.atomic import atomic_write
+from ..utils.hashing import CHUNK_SIZE, content_hash
+
+# Bump when the HTML produced for the same Markdown and extras changes
+RENDERER_REVISION = 1
+
+# Characters of Markdown rendered at once when streaming a large note;
+# a piece is cut at the first block boundary after this size, and at any
+# line once it is PIECE_LIMIT_FACTOR times larger. markdown2 renders
+# pieces of 8-128 KiB at the same speed per byte, larger ones slower.
+PIECE_CHARS = 64 << 10
+PIECE_LIMIT_FACTOR = 4
+
+# Reference-style link definitions ("[id]: https://..."), which apply to
+# the whole document and are repeated before every piece; at most this
+# many characters of them are kept
+_LINK_DEFINITION = re.compile(rb"^ {0,3}\[[^\]\n]+\]:[ \t]*\S[^\n]*$", re.MULTILINE)
+LINK_DEFINITIONS_CHARS = 16 << 10
+
+# Fence of a fenced code block, and a line continuing a list
+_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+_LIST_ITEM = re.compile(r"(?:[*+-]|\d+[.)])[ \t]")
+
+
+# ----------------------------------------------------------------------
+# Markdown renderer with a shared markdown2 instance and an LRU cache
+# ----------------------------------------------------------------------
+class MarkdownRenderer:
+    """
+    Render Markdown with one configured `markdown2.Markdown` instance.
+
+    `markdown2.markdown()` builds a new converter (and its regexes) on
+    every call; this class builds it once. Rendered HTML is cached by a
+    hash of the Markdown text and the renderer version, first in a
+    bounded in-memory LRU, then in a bounded on-disk cache so other
+    processes (export workers, later runs) reuse it too.
+
+    Parameters
+    ----------
+    extras : iterable of str
+        markdown2 extras to enable (e.g. "tables", "fenced-code-blocks")
+    cache_dir : Path or None
+        Directory of the on-disk cache; None disables it
+    memory_entries, disk_entries : int
+        Maximum number of cached documents in memory and on disk
+    """
+
+    def __init__(
+        self,
+        extras: Iterable[str] = MARKDOWN_EXTRAS,
+        cache_dir: Optional[Path] = RENDER_CACHE_DIR,
+        memory_entries: int = RENDER_CACHE_MEMORY_ENTRIES,
+        disk_entries: int = RENDER_CACHE_DISK_ENTRIES,
+    ):
+        self.extras = tuple(extras)
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        # Identifies the output: cached entries from other versions never match
+        self.version = (
+            f"md-{RENDERER_REVISION}-markdown2-{markdown2.__version__}-"
+            + ",".join(sorted(self.extras))
+        )
+        self._markdown: Optional[markdown2.Markdown] = None
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        # markdown2.Markdown keeps per-document state while converting,
+        # and the LRU is reordered on every hit
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    def render(self, markdown_text: str) -> str:
+        """
+        Return the HTML for a Markdown string, from the cache if possible.
+        """
+        key = content_hash((self.version + "\0" + markdown_text).encode("utf-8"))
+
+        with self._lock:
+            html = self._memory.get(key)
+            if html is not None:
+                self._memory.move_to_end(key)
+                profiling.count("render_memory_hits")
+                return html
+
+        html = self._disk_get(key)
+        if html is None:
+            profiling.count("render_misses")
+            html = self.convert(markdown_text)
+            self._disk_put(key, html)
+        else:
+            profiling.count("render_disk_hits")
+
+        with self._lock:
+            self._memory[key] = html
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+        return html
+
+    def convert(self, markdown_text: str) -> str:
+        """
+        Render Markdown without the cache.
+        """
+        with self._lock, profiling.span("markdown.convert"):
+            if self._markdown is None:
+                self._markdown = markdown2.Markdown(extras=list(self.extras))
+            return str(self._markdown.convert(markdown_text))
+
+    def render_stream(
+        self,
+        fh: BinaryIO,
+        digest=None,
+        transform: Optional[Callable[[str], str]] = None,
+    ) -> Iterator[str]:
+        """
+        Render a Markdown document read from a binary file, piece by piece.
+
+        The document is read in chunks and cut into pieces of about
+        PIECE_CHARS characters, which are rendered one at a time and
+        not cached, so memory use is bounded whatever the document's
+        size. Pieces end where a new block starts at the left margin
+        after a blank line, outside fenced code and not within a list,
+        so they render as the whole document would. Reference-style
+        link definitions are collected first and apply to every piece.
+        Where no such boundary comes for PIECE_LIMIT_FACTOR pieces, a
+        piece ends at the next line (a fenced code block is closed and
+        reopened), which may split a paragraph or list in two.
+        Footnotes are listed after the piece that refers to them.
+
+        `digest` (a hashlib object) is updated with every byte read, and
+        `transform`, if given, rewrites each piece's Markdown before it
+        is rendered.
+        """
+        definitions = _link_definitions(fh)
+        fh.seek(0)
+        for piece in _split_markdown(fh, digest):
+            if transform is not None:
+                piece = transform(piece)
+            yield self.convert(definitions + piece if definitions else piece)
+
+    # ------------------------------------------------------------------
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.html"
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        if self.cache_dir is None or self.disk_entries <= 0:
+            return None
+        path = self._disk_path(key)
+        try:
+            html = path.read_text(encoding="utf-8")
+            # Mark as recently used for pruning
+            os.utime(path)
+        except OSError:
+            return None
+        return html
+
+    def _disk_put(self, key: str, html: str) -> None:
+        if self.cache_dir is None or self.disk_entries <= 0:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, html, fsync=False)
+        except OSError:
+            # The cache is an optimization only
+            return
+
+        # Checking the size on every write would cost a directory scan
+        self._disk_writes += 1
+        if self._disk_writes % 256 == 1:
+            self.prune()
+
+    def prune(self) -> None:
+        """
+        Delete the least recently used files beyond `disk_entries`.
+        """
+        if self.cache_dir is None:
+            return
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as shards:
+                for shard in shards:
+                    if not shard.is_dir():
+                        continue
+                    with os.scandir(shard.path) as files:
+                        for entry in files:
+                            entries.append((entry.stat().st_mtime_ns, entry.path))
+        except OSError:
+            return
+        if len(entries) <= self.disk_entries:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self.disk_entries]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def _link_definitions(fh: BinaryIO) -> str:
+    """
+    Every reference-style link definition of a document, one per line.
+    """
+    found: List[bytes] = []
+    size = 0
+    tail = b""
+    for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+        # Only complete lines are searched; the rest waits for the next chunk
+        data = tail + chunk
+        end = data.rfind(b"\n") + 1
+        data, tail = data[:end], data[end:]
+        for match in _LINK_DEFINITION.finditer(data):
+            size += len(match.group())
+            if size > LINK_DEFINITIONS_CHARS:
+                break
+            found.append(match.group().rstrip(b"\r"))
+    found.extend(m.group() for m in _LINK_DEFINITION.finditer(tail))
+    if not found:
+        return ""
+    return b"\n".join(found).decode("utf-8", errors="replace") + "\n\n"
+
+
+def _split_markdown(fh: BinaryIO, digest=None) -> Iterator[str]:
+    """
+    Decode a Markdown document read from `fh` and cut it into pieces
+    (see `MarkdownRenderer.render_stream`).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    limit = PIECE_CHARS * PIECE_LIMIT_FACTOR
+    piece: List[str] = []
+    size = 0
+    fence: Optional[str] = None
+    fence_line = ""
+    blank = False
+    partial = ""
+
+    def lines() -> Iterator[str]:
+        nonlocal partial
+        while True:
+            chunk = fh.read(CHUNK_SIZE)
+            if digest is not None:
+                digest.update(chunk)
+            text = partial + decoder.decode(chunk, final=not chunk)
+            parts = text.split("\n")
+            partial = parts.pop()
+            for part in parts:
+                yield part + "\n"
+            if not chunk:
+                break
+            if len(partial) > limit:
+                # One huge line: cut it, rather than hold all of it
+                yield partial
+                partial = ""
+        if partial:
+            yield partial
+
+    for line in lines():
+        stripped = line.strip()
+        if size >= PIECE_CHARS:
+            starts_block = (
+                fence is None
+                and blank
+                and stripped
+                and line[0] not in " \t"
+                and not _LIST_ITEM.match(line)
+            )
+            if starts_block or size >= limit:
+                if fence is not None:
+                    if not piece[-1].endswith("\n"):
+                        piece.append("\n")
+                    piece.append(fence + "\n")
+                yield "".join(piece)
+                piece = [fence_line] if fence is not None else []
+                size = len(fence_line) if fence is not None else 0
+
+        match = _FENCE.match(line)
+        if fence is None and match:
+            fence, fence_line = match.group(1), line
+        elif fence is not None and match and stripped.startswith(fence) and not stripped.strip(fence[0]):
+            fence = None
+        piece.append(line)
+        size += len(line)
+        blank = not stripped
+
+    if piece:
+        yield "".join(piece)
+
+
+_renderer: Optional[MarkdownRenderer] = None
+
+
+def get_renderer() -> MarkdownRenderer:
+    """
+    Return the renderer configured from `config` (shared per process).
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = MarkdownRenderer()
+    return _renderer
+
+
 # ----------------------------------------------------------------------
 # Convert Markdown text to HTML
 # ----------------------------------------------------------------------
@@ -17,5 +334,5 @@ def render_markdown_to_html(markdown_text: str) -> str:
     str
         HTML string generated from the Markdown.
     """
-    # Use the markdown2 library to handle conversion
-    return markdown2.markdown(markdown_text)
+    # Shared markdown2 instance, cached by content hash
+    return get_renderer().render(markdown_text)
@@ -1,8 +1,14 @@
+import html
 from pathlib import Path
-from weasyprint import HTML
+from typing import List, Optional, Sequence, Tuple
 
 from ..config import DOWNLOADS_DIR
-from .markdown_renderer import render_markdown_to_html
+from ..storage.titles import filename_for
+from ..utils import profiling
+from ..utils.atomic import atomic_writer
+from ..utils.hashing import content_hash
+from .manifest import ExportManifest
+from .markdown_renderer import get_renderer, render_markdown_to_html
 
 # ----------------------------------------------------------------------
 # Minimal CSS for monospaced rendering in PDF
@@ -15,10 +21,74 @@ MONO_CSS = """
 </style>
 """
 
+# Identifies the output produced by this exporter. Bump the revision when
+# the generated PDF changes; the stylesheet and the Markdown renderer
+# configuration (markdown2 version, extras) are hashed in automatically.
+EXPORTER_VERSION = "pdf-1-" + content_hash(
+    (MONO_CSS + get_renderer().version).encode("utf-8")
+)[:12]
+
+
+# The same rules as a standalone stylesheet, parsed once per process and
+# shared by every PDF instead of being re-read from each document
+_CSS_TEXT = MONO_CSS.replace("<style>", "").replace("</style>", "")
+
+# Extra layout for the combined notebook: a table of contents with page
+# numbers, each note on a new page, one PDF bookmark per note
+COMBINED_CSS = """
+@page { @bottom-center { content: counter(page); } }
+.toc a { color: inherit; text-decoration: none; }
+.toc a::after { content: leader('.') target-counter(attr(href), page); }
+.note { break-before: page; }
+.note-title { bookmark-level: 1; }
+.note h1:not(.note-title), .note h2, .note h3, .note h4, .note h5, .note h6 {
+    bookmark-level: none;
+}
+"""
+
+# Output location and exporter version of the combined notebook. Exports of
+# single notes are files directly in Downloads (their names never contain a
+# slash), so a subdirectory keeps every note, including one titled "notes",
+# from exporting to the notebook's path.
+COMBINED_PDF_DIR = "notebook"
+COMBINED_PDF_NAME = "notes.pdf"
+COMBINED_VERSION = EXPORTER_VERSION + "-combined-1-" + content_hash(COMBINED_CSS.encode("utf-8"))[:12]
+
+_resources: Optional[tuple] = None
+
+
+def _pdf_resources() -> tuple:
+    """
+    Parsed stylesheets and font configuration, created on first use.
+
+    WeasyPrint loads Pango/Cairo, so it is only imported when needed.
+    """
+    global _resources
+    if _resources is None:
+        with profiling.span("pdf.setup"):
+            from weasyprint import CSS
+            from weasyprint.text.fonts import FontConfiguration
+
+            font_config = FontConfiguration()
+            _resources = (
+                font_config,
+                CSS(string=_CSS_TEXT, font_config=font_config),
+                CSS(string=COMBINED_CSS, font_config=font_config),
+            )
+    return _resources
+
+
+def pdf_output_path(title: str) -> Path:
+    """
+    Path of the PDF file exported for a note title.
+    """
+    return DOWNLOADS_DIR / filename_for(title, ".pdf")
+
+
 # ----------------------------------------------------------------------
 # Export a Markdown note as a PDF
 # ----------------------------------------------------------------------
-def export_pdf(title: str, markdown_text: str) -> Path:
+def export_pdf(title: str, markdown_text: str, force: bool = False) -> Path:
     """
     Convert Markdown content into a PDF file.
 
@@ -28,23 +98,124 @@ def export_pdf(title: str, markdown_text: str) -> Path:
         Title of the note (used to name the PDF file)
     markdown_text : str
         The Markdown content of the note
+    force : bool
+        Re-export even if the existing file is already up to date
 
     Returns
     -------
     Path
         Path to the generated PDF file in the DOWNLOADS_DIR
+        (unchanged if it was already up to date)
     """
+    out_path = pdf_output_path(title)
+    source_hash = content_hash(markdown_text.encode("utf-8"))
+
+    # Skip the export if this exact note was already exported
+    manifest = ExportManifest.load()
+    if not force and manifest.is_current(out_path, source_hash, EXPORTER_VERSION):
+        return out_path
+
     # Convert Markdown to HTML first
-    html_body = render_markdown_to_html(markdown_text)
+    write_pdf(title, render_markdown_to_html(markdown_text))
+
+    manifest.record(out_path, source_hash, EXPORTER_VERSION)
+    manifest.save()
+    return out_path
 
-    # Apply monospace CSS styling
-    full_html = MONO_CSS + html_body
 
+def write_pdf(title: str, html_body: str) -> Path:
+    """
+    Lay out already-rendered HTML as a PDF in the DOWNLOADS_DIR.
+
+    Parameters
+    ----------
+    title : str
+        Title of the note (used to name the PDF file)
+    html_body : str
+        HTML produced by `render_markdown_to_html`
+
+    Returns
+    -------
+    Path
+        Path to the generated PDF file in the DOWNLOADS_DIR
+    """
     # Generate filename from title
-    filename = f"{title.replace(' ', '_')}.pdf"
-    out_path = DOWNLOADS_DIR / filename
+    out_path = pdf_output_path(title)
+
+    # Write the HTML content to a PDF file, styled with the shared
+    # monospace stylesheet
+    from weasyprint import HTML
+    font_config, mono_css, _ = _pdf_resources()
+    with atomic_writer(out_path, fsync=False) as fh, profiling.span("pdf.layout"):
+        HTML(string=html_body).write_pdf(
+            fh, stylesheets=[mono_css], font_config=font_config
+        )
+
+    return out_path
+
+
+# ----------------------------------------------------------------------
+# Export many notes as one PDF
+# ----------------------------------------------------------------------
+def combined_pdf_output_path() -> Path:
+    """
+    Path of the combined PDF holding every note.
+    """
+    return DOWNLOADS_DIR / COMBINED_PDF_DIR / COMBINED_PDF_NAME
+
+
+def combined_html(sections: Sequence[Tuple[str, str]]) -> str:
+    """
+    Build one HTML document from (title, rendered HTML) pairs.
+
+    The document starts with a table of contents linking to every note;
+    each note follows in its own section.
+    """
+    toc: List[str] = []
+    body: List[str] = []
+    for number, (title, html_body) in enumerate(sections, start=1):
+        anchor = f"note-{number}"
+        escaped = html.escape(title)
+        toc.append(f'<li><a href="#{anchor}">{escaped}</a></li>')
+        body.append(
+            f'<section class="note" id="{anchor}">\n'
+            f'<h1 class="note-title">{escaped}</h1>\n{html_body}\n</section>'
+        )
+    return (
+        '<nav class="toc"><h1>Contents</h1>\n<ol>\n'
+        + "\n".join(toc)
+        + "\n</ol></nav>\n"
+        + "\n".join(body)
+    )
+
+
+def write_combined_pdf(sections: Sequence[Tuple[str, str]]) -> Path:
+    """
+    Lay out several notes as a single PDF in a subdirectory of the
+    DOWNLOADS_DIR.
+
+    The whole notebook is one WeasyPrint document, so the stylesheet is
+    parsed and fonts are set up once; the cost grows with the amount of
+    content, not with the number of notes.
+
+    Parameters
+    ----------
+    sections : sequence of (str, str)
+        Note titles with their HTML produced by `render_markdown_to_html`
+
+    Returns
+    -------
+    Path
+        Path to the generated PDF file (see `combined_pdf_output_path`)
+    """
+    out_path = combined_pdf_output_path()
+    out_path.parent.mkdir(exist_ok=True)
 
-    # Write the HTML content to a PDF file
-    HTML(string=full_html).write_pdf(str(out_path))
+    from weasyprint import HTML
+    font_config, mono_css, combined_css = _pdf_resources()
+    with atomic_writer(out_path, fsync=False) as fh, profiling.span("pdf.layout"):
+        HTML(string=combined_html(sections)).write_pdf(
+            fh, stylesheets=[mono_css, combined_css], font_config=font_config
+        )
 
     return out_path
@@ -0,0 +1,529 @@
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from ..config import STATUSES, STREAM_EXPORT_BYTES
+from ..storage.backends import NoteRecord, get_backend, reset_backend
+from ..storage.titles import TitleRegistry, filename_for
+from ..utils import profiling
+from ..utils.atomic import atomic_write, atomic_writer
+from ..utils.hashing import content_hash
+from .html_exporter import MONO_CSS
+from .markdown_renderer import _FENCE, get_renderer
+
+# ----------------------------------------------------------------------
+# Site layout
+# ----------------------------------------------------------------------
+# DIR/index.html            statuses and months, with their note counts
+# DIR/all.html              every note, A-Z
+# DIR/status/<status>.html  the notes with one status, A-Z
+# DIR/months/<YYYY-MM>.html the notes last modified in one month, newest first
+# DIR/notes/<file>.html     one page per note
+# DIR/style.css             the stylesheet every page shares
+SITE_CSS = MONO_CSS.replace("<style>", "").replace("</style>", "").strip() + """
+body { max-width: 52em; margin: 2em auto; padding: 0 1em; line-height: 1.5; }
+nav a { margin-right: 1.5em; }
+.meta, .date, .count { color: #666; }
+.date { margin-right: 1em; }
+.missing { color: #a00; text-decoration: underline dotted; }
+"""
+
+# Identifies the pages produced. Bump the revision when the page
+# templates below change; the stylesheet and the Markdown renderer
+# configuration are hashed in automatically.
+SITE_REVISION = 1
+SITE_VERSION = f"site-{SITE_REVISION}-" + content_hash(
+    (SITE_CSS + get_renderer().version).encode("utf-8")
+)[:12]
+
+# Record of what every page was built from, kept inside the site
+MANIFEST_NAME = ".site-manifest.json"
+
+# Cross-note links: [[Title]] or [[Title|label]]. Code spans are matched
+# too, so links inside them are left alone.
+_WIKI_LINK = re.compile(r"(`+).*?\1|\[\[([^\[\]|\n]+)(?:\|([^\[\]\n]+))?\]\]")
+
+
+def note_page(title: str) -> str:
+    """
+    Path of a note's page, relative to the site directory.
+    """
+    return "notes/" + filename_for(title, ".html")
+
+
+def _href(relpath: str, root: str) -> str:
+    # Page names are note filenames, which may contain "%" and, for
+    # undecodable titles, surrogates
+    return root + quote(relpath, errors="surrogateescape")
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "none"
+
+
+def _status_page(status: str) -> str:
+    return f"status/{_slug(status)}.html"
+
+
+def _modified(mtime: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime))
+
+
+def _month_page(modified: str) -> str:
+    return f"months/{modified[:7]}.html"
+
+
+# ----------------------------------------------------------------------
+# Cross-note links
+# ----------------------------------------------------------------------
+def link_notes(
+    markdown_text: str, resolve: Callable[[str], Optional[str]], found: List[str]
+) -> str:
+    """
+    Turn the [[Title]] and [[Title|label]] links of a note into Markdown
+    links to the pages of the notes they name.
+
+    `resolve` maps a linked title to the stored one (or None: the link
+    is shown as missing); every linked title is appended to `found`.
+    Links in fenced code blocks and code spans are kept as written.
+    """
+    if "[[" not in markdown_text:
+        return markdown_text
+
+    def replace(match: "re.Match") -> str:
+        if match.group(2) is None:
+            return match.group()
+        target = match.group(2).strip()
+        label = (match.group(3) or match.group(2)).strip()
+        found.append(target)
+        title = resolve(target)
+        if title is None:
+            return f'<span class="missing">{html.escape(label)}</span>'
+        return f"[{label}]({_href(note_page(title), '../')})"
+
+    lines = []
+    fence: Optional[str] = None
+    for line in markdown_text.splitlines(keepends=True):
+        match = _FENCE.match(line)
+        stripped = line.strip()
+        if fence is None and match:
+            fence = match.group(1)
+        elif fence is not None:
+            if match and stripped.startswith(fence) and not stripped.strip(fence[0]):
+                fence = None
+        elif "[[" in line:
+            line = _WIKI_LINK.sub(replace, line)
+        lines.append(line)
+    return "".join(lines)
+
+
+# ----------------------------------------------------------------------
+# Page templates
+# ----------------------------------------------------------------------
+def _page_head(title: str, root: str) -> str:
+    return (
+        '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+        f"<title>{html.escape(title)}</title>\n"
+        f'<link rel="stylesheet" href="{root}style.css">\n</head>\n<body>\n'
+        f'<nav><a href="{root}index.html">Index</a><a href="{root}all.html">All notes</a></nav>\n'
+    )
+
+
+_PAGE_FOOT = "\n</body>\n</html>\n"
+
+
+def _note_list(rows: Sequence[Tuple[str, str]], root: str) -> str:
+    # rows: (HTML prefix, title)
+    items = "\n".join(
+        f'<li>{prefix}<a href="{_href(note_page(title), root)}">{html.escape(title)}</a></li>'
+        for prefix, title in rows
+    )
+    return f"<ul>\n{items}\n</ul>"
+
+
+def _listing(heading: str, body: str, root: str) -> bytes:
+    page = _page_head(heading, root) + f"<h1>{html.escape(heading)}</h1>\n{body}" + _PAGE_FOOT
+    # Titles of undecodable filenames keep their surrogates; show them
+    # as replacement characters rather than fail the whole page
+    return page.encode("utf-8", "replace")
+
+
+def _index_pages(records: Sequence[NoteRecord], registry: TitleRegistry) -> Dict[str, bytes]:
+    """
+    Every page but the notes' own: the index, the A-Z list, one page per
+    status and one per month.
+    """
+    by_status: Dict[str, List[str]] = {}
+    by_month: Dict[str, List[Tuple[str, NoteRecord]]] = {}
+    for record in records:
+        by_status.setdefault(record.status, []).append(record.title)
+        modified = _modified(record.mtime)
+        by_month.setdefault(modified[:7], []).append((modified, record))
+
+    pages = {"all.html": _listing(
+        f"All notes ({len(records)})", _note_list([("", title) for title in registry], ""), ""
+    )}
+
+    statuses = []
+    # Statuses in workflow order, any unknown ones last
+    rank = {status: rank for rank, status in enumerate(STATUSES)}
+    for status in sorted(by_status, key=lambda status: (rank.get(status, len(rank)), status)):
+        titles = set(by_status[status])
+        relpath = _status_page(status)
+        pages[relpath] = _listing(
+            f"Status: {status}",
+            _note_list([("", title) for title in registry if title in titles], "../"),
+            "../",
+        )
+        statuses.append(
+            f'<li><a href="{relpath}">{html.escape(status)}</a> '
+            f'<span class="count">({len(titles)})</span></li>'
+        )
+
+    months = []
+    for month in sorted(by_month, reverse=True):
+        rows = sorted(by_month[month], key=lambda row: (-row[1].mtime, row[1].title))
+        relpath = _month_page(month)
+        pages[relpath] = _listing(
+            f"Modified in {month}",
+            _note_list(
+                [
+                    (
+                        f'<span class="date">{modified}</span>'
+                        f'<span class="meta">[{html.escape(record.status)}]</span> ',
+                        record.title,
+                    )
+                    for modified, record in rows
+                ],
+                "../",
+            ),
+            "../",
+        )
+        months.append(
+            f'<li><a href="{relpath}">{month}</a> <span class="count">({len(rows)})</span></li>'
+        )
+
+    pages["index.html"] = _listing(
+        "Notes",
+        f'<p><a href="all.html">All notes</a> <span class="count">({len(records)})</span></p>\n'
+        "<h2>By status</h2>\n<ul>\n" + "\n".join(statuses) + "\n</ul>\n"
+        "<h2>By modification date</h2>\n<ul>\n" + "\n".join(months) + "\n</ul>",
+        "",
+    )
+    pages["style.css"] = SITE_CSS.encode("utf-8")
+    return pages
+
+
+# ----------------------------------------------------------------------
+# Note pages (rendered in worker processes for --jobs N)
+# ----------------------------------------------------------------------
+# Titles links are resolved against, set before any page is built
+_registry: Optional[TitleRegistry] = None
+
+
+def _use_titles(titles: Sequence[str]) -> None:
+    global _registry
+    _registry = TitleRegistry((title, filename_for(title)) for title in titles)
+
+
+def _init_worker(titles: Sequence[str]) -> None:
+    reset_backend()
+    _use_titles(titles)
+
+
+class _NotePage(NamedTuple):
+    title: str
+    source_hash: Optional[str]
+    links: List[str]
+    error: Optional[str] = None
+
+
+def _build_note_page(site_dir: str, title: str, status: str, modified: str) -> _NotePage:
+    """
+    Render one note into its page; returns the hash of the text rendered
+    and the titles it links to. Exceptions are returned, not raised.
+    """
+    links: List[str] = []
+
+    def transform(markdown_text: str) -> str:
+        return link_notes(markdown_text, _registry.resolve, links)
+
+    root = "../"
+    head = _page_head(title, root) + (
+        f'<p class="meta"><a href="{root}{_status_page(status)}">{html.escape(status)}</a>'
+        f' · modified <a href="{root}{_month_page(modified)}">{modified}</a></p>\n<main>\n'
+    )
+    foot = "\n</main>" + _PAGE_FOOT
+    out_path = Path(site_dir, note_page(title))
+    try:
+        with profiling.span("site.note", title=title):
+            with get_backend().open_note(title) as fh:
+                fh.seek(0, os.SEEK_END)
+                size = fh.tell()
+                fh.seek(0)
+                if size >= STREAM_EXPORT_BYTES:
+                    # Large notes are rendered piece by piece, as in
+                    # `notes export --html`
+                    digest = hashlib.sha256()
+                    with atomic_writer(out_path, fsync=False) as out:
+                        out.write(head.encode("utf-8", "replace"))
+                        pieces = get_renderer().render_stream(fh, digest, transform)
+                        for number, piece in enumerate(pieces):
+                            if number:
+                                out.write(b"\n")
+                            out.write(piece.encode("utf-8"))
+                        out.write(foot.encode("utf-8"))
+                    source_hash = digest.hexdigest()
+                else:
+                    data = fh.read()
+                    source_hash = content_hash(data)
+                    body = get_renderer().render(transform(data.decode("utf-8")))
+                    atomic_write(
+                        out_path, (head + body + foot).encode("utf-8", "replace"), fsync=False
+                    )
+        return _NotePage(title, source_hash, list(dict.fromkeys(links)))
+    except Exception as exc:
+        return _NotePage(title, None, [], f"{type(exc).__name__}: {exc}")
+
+
+# ----------------------------------------------------------------------
+# Dependency manifest
+# ----------------------------------------------------------------------
+# Bump whenever the manifest layout changes; older files are ignored.
+SITE_MANIFEST_VERSION = 1
+
+
+class SiteManifest:
+    """
+    What every page of a site was built from.
+
+    Each page maps to a key (a hash of everything the page shows) and
+    its size and mtime when written; each note to the hash of the text
+    its page was rendered from and the titles it links to. A note page's
+    key covers the note's hash, status and date and whether each linked
+    note exists, so an unchanged note is rebuilt only when a note it
+    links to is created or deleted, and is never read otherwise.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.pages: Dict[str, dict] = {}
+        self.notes: Dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, site_dir: Path) -> "SiteManifest":
+        """
+        Read a site's manifest (empty if missing or incompatible).
+        """
+        manifest = cls(site_dir / MANIFEST_NAME)
+        try:
+            with profiling.span("site.manifest.load"):
+                data = json.loads(manifest.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return manifest
+        if (
+            isinstance(data, dict)
+            and data.get("version") == SITE_MANIFEST_VERSION
+            and data.get("site") == SITE_VERSION
+        ):
+            manifest.pages = data["pages"]
+            manifest.notes = data["notes"]
+        return manifest
+
+    def save(self) -> None:
+        with profiling.span("site.manifest.save"):
+            atomic_write(
+                self.path,
+                json.dumps({
+                    "version": SITE_MANIFEST_VERSION,
+                    "site": SITE_VERSION,
+                    "pages": self.pages,
+                    "notes": self.notes,
+                }),
+                fsync=False,
+            )
+
+    def is_current(self, site_dir: Path, relpath: str, key: str) -> bool:
+        """
+        True if the page was built with this key and not modified since.
+        """
+        entry = self.pages.get(relpath)
+        if entry is None or entry["key"] != key:
+            return False
+        try:
+            st = (site_dir / relpath).stat()
+        except FileNotFoundError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
+
+    def record(self, site_dir: Path, relpath: str, key: str) -> None:
+        st = (site_dir / relpath).stat()
+        self.pages[relpath] = {"key": key, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _note_key(source_hash: str, status: str, modified: str, links: Sequence[str]) -> str:
+    targets = [[target, _registry.resolve(target)] for target in links]
+    return content_hash(
+        json.dumps([source_hash, status, modified, targets]).encode("utf-8")
+    )
+
+
+# ----------------------------------------------------------------------
+# Build a site
+# ----------------------------------------------------------------------
+class SiteResult(NamedTuple):
+    """
+    Outcome of building a site: the pages written, those already up to
+    date and those removed, and the notes whose page failed.
+    """
+
+    written: List[str]
+    up_to_date: int
+    removed: List[str]
+    failed: List[Tuple[str, str]]
+
+
+def build_site(
+    site_dir: Path, records: Sequence[NoteRecord], jobs: int = 1, force: bool = False
+) -> SiteResult:
+    """
+    Build (or bring up to date) a static site of the given notes.
+
+    Only pages whose content would change are written: a note's page
+    when the note, its status or date, or the existence of a note it
+    links to changed, a listing when its rows changed. Pages of notes
+    that no longer exist are removed.
+
+    Parameters
+    ----------
+    site_dir : Path
+        Directory of the site, created if needed
+    records : sequence of NoteRecord
+        Notes to publish, as listed by the storage backend
+    jobs : int
+        Processes rendering note pages; 1 renders in-process, 0 or less
+        uses one per CPU. Listings are written by threads meanwhile.
+    force : bool
+        Rebuild every page regardless of the manifest
+    """
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+
+    titles = [record.title for record in records]
+    _use_titles(titles)
+    for directory in ("notes", "status", "months"):
+        (site_dir / directory).mkdir(parents=True, exist_ok=True)
+    manifest = SiteManifest.load(site_dir)
+
+    def current(relpath: str, key: str) -> bool:
+        return not force and manifest.is_current(site_dir, relpath, key)
+
+    written: List[str] = []
+    failed: List[Tuple[str, str]] = []
+    up_to_date = 0
+
+    # Note pages that can be skipped without reading the note
+    stale: List[Tuple[NoteRecord, str]] = []
+    for record in records:
+        modified = _modified(record.mtime)
+        known = manifest.notes.get(record.title)
+        if known is not None and known["hash"] == record.hash:
+            key = _note_key(record.hash, record.status, modified, known["links"])
+            if current(note_page(record.title), key):
+                up_to_date += 1
+                continue
+        stale.append((record, modified))
+    profiling.count("site_notes_stale", len(stale))
+
+    listings = _index_pages(records, _registry)
+    removed = _remove_obsolete(site_dir, manifest, set(listings) | set(map(note_page, titles)))
+    manifest.notes = {title: manifest.notes[title] for title in titles if title in manifest.notes}
+
+    try:
+        with ThreadPoolExecutor(4, thread_name_prefix="notes-site") as writers:
+            listing_futures = {}
+            for relpath, data in listings.items():
+                key = content_hash(data)
+                if current(relpath, key):
+                    up_to_date += 1
+                else:
+                    future = writers.submit(atomic_write, site_dir / relpath, data, fsync=False)
+                    listing_futures[future] = (relpath, key)
+
+            for record, modified, page in _build_note_pages(site_dir, stale, titles, jobs):
+                if page.error:
+                    failed.append((page.title, page.error))
+                    continue
+                relpath = note_page(record.title)
+                manifest.notes[record.title] = {"hash": page.source_hash, "links": page.links}
+                manifest.record(
+                    site_dir, relpath, _note_key(page.source_hash, record.status, modified, page.links)
+                )
+                written.append(relpath)
+
+            for future in as_completed(listing_futures):
+                future.result()
+                relpath, key = listing_futures[future]
+                manifest.record(site_dir, relpath, key)
+                written.append(relpath)
+    finally:
+        # Keep progress even if the build is interrupted
+        manifest.save()
+
+    return SiteResult(written, up_to_date, removed, failed)
+
+
+def _build_note_pages(
+    site_dir: Path, stale: List[Tuple[NoteRecord, str]], titles: List[str], jobs: int
+) -> Iterator[Tuple[NoteRecord, str, _NotePage]]:
+    """
+    Render the stale note pages, in worker processes if `jobs` > 1, and
+    yield them as they complete.
+    """
+    if jobs == 1 or len(stale) <= 1:
+        for record, modified in stale:
+            yield record, modified, _build_note_page(
+                str(site_dir), record.title, record.status, modified
+            )
+        return
+
+    # Workers are spawned so they never inherit a lock held by another
+    # thread, e.g. when the daemon builds the site
+    with ProcessPoolExecutor(
+        jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(titles,),
+    ) as pool:
+        futures = {
+            pool.submit(_build_note_page, str(site_dir), record.title, record.status, modified):
+                (record, modified)
+            for record, modified in stale
+        }
+        # Worker processes are not profiled: their time is the caller's
+        # own time in a profile
+        for future in as_completed(futures):
+            yield (*futures[future], future.result())
+
+
+def _remove_obsolete(site_dir: Path, manifest: SiteManifest, pages: set) -> List[str]:
+    """
+    Delete the pages the manifest knows that are no longer part of the site.
+    """
+    removed = []
+    for relpath in [relpath for relpath in manifest.pages if relpath not in pages]:
+        try:
+            (site_dir / relpath).unlink()
+        except FileNotFoundError:
+            pass
+        del manifest.pages[relpath]
+        removed.append(relpath)
+    return removed
@@ -1,6 +1,6 @@
 import datetime
 from pathlib import Path
-from ..config import NOTES_DIR, DEFAULT_STATUS, STATUS_COMMENT_TEMPLATE
+from ..config import NOTES_DIR, DEFAULT_STATUS, STATUS_COMMENT_TEMPLATE, STATUS_HEADER_BYTES
 
 
 class Note:
@@ -36,7 +36,9 @@ class Note:
         Example:
             "My Note" → "My_Note.md"
         """
-        return f"{title}.md".replace(" ", "_")
+        # Lazy import avoids circular dependency
+        from ..storage.titles import filename_for
+        return filename_for(title)
 
     @classmethod
     def _path_from_title(cls, title: str) -> Path:
@@ -61,6 +63,16 @@ class Note:
     def save(self) -> None:
         """
         Save the note back to disk.
+        """
+        # Lazy import avoids circular dependency
+        from ..storage.history import record_version
+        from ..utils.atomic import atomic_write
+        atomic_write(self.path, self.to_text())
+        record_version(self.title, "edit")
+
+    def to_text(self) -> str:
+        """
+        Serialize the note as stored on disk.
 
         - Ensures the status comment is always present as the first line.
         - Preserves the existing body (stripping leading whitespace).
@@ -68,7 +80,10 @@ class Note:
         header = STATUS_COMMENT_TEMPLATE.format(self.status)
         # Strip leading whitespace so status is guaranteed on top
         body = self.content.lstrip()
-        self.path.write_text(header + body, encoding="utf-8")
+        # Drop an existing status line; the header above replaces it
+        if body.startswith("<!-- status:"):
+            body = body.partition("\n")[2]
+        return header + body
 
     # ------------------------------------------------------------------
     # Status handling
@@ -80,9 +95,10 @@ class Note:
 
         Expected format:
             <!-- status: <value> -->
-        Falls back to DEFAULT_STATUS if not found.
+        Only the header (the first STATUS_HEADER_BYTES characters) is
+        searched. Falls back to DEFAULT_STATUS if not found.
         """
-        for line in text.splitlines():
+        for line in text[:STATUS_HEADER_BYTES].splitlines():
             if line.startswith("<!-- status:"):
                 return (
                     line.replace("<!-- status:", "")
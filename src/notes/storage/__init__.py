@@ -5,5 +5,11 @@ from .filesystem import (
     list_notes,
     set_status,
     get_note_path,
+    search_notes,
+    migrate_notes,
 )
-from .backup import backup_notes
+from .backends import ConflictError, NoteRecord, StorageBackend, get_backend
+from .backup import backup_notes, restore_notes, verify_backup
+from .bulk import BulkResult, bulk_delete, bulk_export, bulk_set_status, select_titles
+from .catalog import Catalog, CatalogEntry
+from .titles import TitleRegistry, filename_for, title_from_filename
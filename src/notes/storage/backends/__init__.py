@@ -0,0 +1,48 @@
+from typing import Optional
+
+from ...config import STORAGE_BACKEND
+from .base import SORT_ORDERS, ConflictError, NoteRecord, StorageBackend
+from .filesystem import FilesystemBackend
+
+# Backends selectable through NOTES_BACKEND
+BACKENDS = ("filesystem", "sqlite")
+
+_active: Optional[StorageBackend] = None
+
+
+def make_backend(name: str) -> StorageBackend:
+    """
+    Instantiate a backend by its configuration name.
+
+    The SQLite backend is imported only when selected, so the default
+    filesystem layout never pays for loading sqlite3.
+    """
+    if name == "filesystem":
+        return FilesystemBackend()
+    if name == "sqlite":
+        from .sqlite import SQLiteBackend
+        return SQLiteBackend()
+    raise ValueError(
+        f"Unknown storage backend {name!r} (choose from: {', '.join(BACKENDS)})"
+    )
+
+
+def get_backend() -> StorageBackend:
+    """
+    Return the configured backend (shared for the whole process).
+    """
+    global _active
+    if _active is None:
+        _active = make_backend(STORAGE_BACKEND)
+    return _active
+
+
+def reset_backend() -> None:
+    """
+    Forget the shared backend so the next `get_backend()` opens a fresh one.
+
+    Used in worker processes: connections inherited across fork()
+    must not be reused.
+    """
+    global _active
+    _active = None
@@ -0,0 +1,325 @@
+import heapq
+import itertools
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, ContextManager, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from ...config import CONFLICTS_DIR, LOCK_DIR, STATUSES
+from ...models.note import Note
+from ...utils.hashing import content_hash
+from ...utils.locking import file_lock
+from ..titles import check_title, filename_for
+
+# Orders accepted by StorageBackend.query()
+SORT_ORDERS = ("title", "mtime", "status")
+
+# Read-modify-write operations start over this often when another
+# program changes the note underneath them
+CONFLICT_RETRIES = 3
+
+
+class ConflictError(Exception):
+    """
+    A note changed between being read and being written back.
+    """
+
+
+class NoteRecord(NamedTuple):
+    """
+    Metadata of one stored note, available without reading its body.
+    """
+
+    title: str
+    status: str
+    mtime: float
+    size: int
+    hash: str
+
+
+_STATUS_RANK = {status: rank for rank, status in enumerate(STATUSES)}
+
+# records() is already sorted by title
+_SORT_KEYS = {
+    "mtime": lambda r: (-r.mtime, r.title),
+    "status": lambda r: (_STATUS_RANK.get(r.status, len(STATUSES)), r.title),
+}
+
+
+class StorageBackend(ABC):
+    """
+    Interface every note store implements.
+
+    Notes are addressed by title. Text is exchanged as `str` exactly as
+    stored (status comment included), and every write records the
+    metadata needed by `records()`.
+    """
+
+    # Short identifier used in configuration (NOTES_BACKEND)
+    name: str = ""
+
+    # ------------------------------------------------------------------
+    # Basic operations
+    # ------------------------------------------------------------------
+    @abstractmethod
+    def exists(self, title: str) -> bool:
+        """True if a note with this title is stored."""
+
+    @abstractmethod
+    def read(self, title: str) -> str:
+        """Return the full text of a note (raises FileNotFoundError)."""
+
+    @abstractmethod
+    def write(
+        self,
+        title: str,
+        text: str,
+        mtime: Optional[float] = None,
+        expected_hash: Optional[str] = None,
+    ) -> None:
+        """
+        Create or replace a note, atomically.
+
+        `mtime` preserves an existing modification time (e.g. when
+        migrating); by default the current time is used.
+
+        With `expected_hash`, the note is only replaced if its stored
+        content still has this hash (see `utils.hashing.content_hash`),
+        i.e. nobody changed it since the caller read it; otherwise
+        ConflictError is raised.
+        """
+
+    @abstractmethod
+    def delete(self, title: str) -> None:
+        """Remove a note (raises FileNotFoundError)."""
+
+    @abstractmethod
+    def records(self) -> List[NoteRecord]:
+        """Metadata for every note, sorted by title."""
+
+    # ------------------------------------------------------------------
+    # Concurrency control
+    # ------------------------------------------------------------------
+    def lock(self, title: str) -> ContextManager[None]:
+        """
+        Hold the advisory lock of one note.
+
+        Every write, delete and status change takes it, so concurrent
+        `notes` processes never interleave read-modify-write cycles on
+        the same note. Re-entrant within a thread.
+        """
+        key = content_hash(title.encode("utf-8"))[:32]
+        return file_lock(LOCK_DIR / f"{key}.lock")
+
+    def create(self, title: str, text: str) -> None:
+        """
+        Store a new note (raises FileExistsError if the title is taken,
+        ValueError if it cannot name a note, see `check_title`).
+        """
+        check_title(title)
+        with self.lock(title):
+            if self.exists(title):
+                raise FileExistsError(f"Note {title!r} already exists")
+            self.write(title, text)
+
+    # ------------------------------------------------------------------
+    # Operations with a generic default implementation
+    # ------------------------------------------------------------------
+    def write_many(self, notes: Iterable[Tuple[str, str, Optional[float]]]) -> None:
+        """
+        Store many (title, text, mtime) notes at once.
+
+        Backends override this to batch their bookkeeping (one index
+        update or one transaction instead of one per note).
+        """
+        for title, text, mtime in notes:
+            self.write(title, text, mtime)
+
+    def set_status_many(self, titles: Iterable[str], new_status: str) -> Dict[str, Exception]:
+        """
+        Change the status of several notes.
+
+        A failure affects only its own note. Returns the errors by
+        title (FileNotFoundError for notes that do not exist); backends
+        override this to batch their bookkeeping.
+        """
+        errors: Dict[str, Exception] = {}
+        for title in titles:
+            try:
+                self.set_status(title, new_status)
+            except (OSError, ConflictError) as exc:
+                errors[title] = exc
+        return errors
+
+    def delete_many(self, titles: Iterable[str]) -> Dict[str, Exception]:
+        """
+        Remove several notes; returns the errors by title, as
+        `set_status_many` does.
+        """
+        errors: Dict[str, Exception] = {}
+        for title in titles:
+            try:
+                self.delete(title)
+            except OSError as exc:
+                errors[title] = exc
+        return errors
+
+    def iter_records(self) -> Iterator[NoteRecord]:
+        """
+        Yield the metadata of every note, sorted by title, as `records()`
+        does but without building the list.
+
+        Backends that can stream their metadata override this.
+        """
+        return iter(self.records())
+
+    def drop_caches(self) -> None:
+        """
+        Free metadata cached in memory; it is rebuilt when next needed.
+        """
+
+    def change_stamp(self) -> Optional[str]:
+        """
+        A value that changes whenever a note is added, removed or
+        replaced, computed without looking at every note; None if the
+        backend has no such value.
+
+        Derived data compares it with the stamp of its last full sync
+        to skip syncing when nothing changed. Notes rewritten in place
+        (a status change, or another program editing the file without
+        replacing it) may leave it unchanged: the code making such a
+        change, or the watcher, updates the derived data itself.
+        """
+        return None
+
+    def open_note(self, title: str) -> BinaryIO:
+        """
+        Open a note's text (UTF-8) for reading in chunks, e.g. to
+        export a very large note (raises FileNotFoundError).
+
+        The returned object can be read, seeked and closed, also as a
+        context manager. This default reads the whole note into memory;
+        backends that can read their storage incrementally override it.
+        """
+        import io
+
+        return io.BytesIO(self.read(title).encode("utf-8"))
+
+    def record(self, title: str) -> Optional[NoteRecord]:
+        """
+        Metadata of a single note, or None if it does not exist.
+        """
+        for record in self.records():
+            if record.title == title:
+                return record
+        return None
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        modified_since: Optional[float] = None,
+        sort: str = "title",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[NoteRecord]:
+        """
+        Yield the metadata of matching notes, one page of a sorted list.
+
+        Parameters
+        ----------
+        status : str or None
+            Only notes with this status
+        modified_since : float or None
+            Only notes modified at or after this Unix timestamp
+        sort : str
+            "title" (A-Z), "mtime" (newest first) or "status"
+            (workflow order, then title)
+        limit, offset : int
+            Skip `offset` notes, then yield at most `limit`
+        """
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort order {sort!r}")
+
+        selected: Iterable[NoteRecord] = (
+            record
+            for record in self.records()
+            if (status is None or record.status == status)
+            and (modified_since is None or record.mtime >= modified_since)
+        )
+        if sort != "title":
+            key = _SORT_KEYS[sort]
+            if limit is not None:
+                # Only the requested page has to be fully ordered
+                selected = heapq.nsmallest(offset + limit, selected, key=key)
+            else:
+                selected = sorted(selected, key=key)
+        stop = None if limit is None else offset + limit
+        return itertools.islice(selected, offset, stop)
+
+    def set_status(self, title: str, new_status: str) -> None:
+        """
+        Rewrite the status comment of a note.
+
+        Runs under the note's lock, and the write is conditional on the
+        content read, so a concurrent change is never overwritten.
+        """
+        with self.lock(title):
+            for attempt in range(CONFLICT_RETRIES):
+                text = self.read(title)
+                note = Note(title)
+                note.content = text
+                note.set_status(new_status)
+                try:
+                    self.write(
+                        title,
+                        note.to_text(),
+                        expected_hash=content_hash(text.encode("utf-8")),
+                    )
+                    return
+                except ConflictError:
+                    if attempt == CONFLICT_RETRIES - 1:
+                        raise
+
+    @contextmanager
+    def editable(self, title: str) -> Iterator[Path]:
+        """
+        Provide a file the user's editor can open for this note.
+
+        Backends that do not store plain files copy the note to a
+        temporary file and store it back if it was changed.
+        """
+        import tempfile
+
+        text = self.read(title)
+        with tempfile.TemporaryDirectory(prefix="notes-") as tmp_dir:
+            tmp_path = Path(tmp_dir) / filename_for(title)
+            with open(tmp_path, "w", encoding="utf-8", newline="") as fh:
+                fh.write(text)
+
+            yield tmp_path
+
+            with open(tmp_path, encoding="utf-8", newline="") as fh:
+                edited = fh.read()
+            if edited != text:
+                try:
+                    self.write(
+                        title, edited, expected_hash=content_hash(text.encode("utf-8"))
+                    )
+                except ConflictError:
+                    raise ConflictError(
+                        f"Note {title!r} changed while it was being edited; "
+                        f"your version was saved as {_save_conflict(title, edited)}"
+                    ) from None
+
+
+def _save_conflict(title: str, text: str) -> Path:
+    """
+    Keep an edit that could not be stored, so it is not lost.
+    """
+    import time
+    from ...utils.atomic import atomic_write
+
+    CONFLICTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = CONFLICTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{filename_for(title)}"
+    atomic_write(path, text)
+    return path
@@ -0,0 +1,309 @@
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ...config import NOTES_DIR, STATUS_COMMENT_TEMPLATE, STATUS_HEADER_BYTES
+from ...utils import profiling
+from ...utils.atomic import atomic_write, atomic_writer, fsync_dir
+from ...utils.hashing import content_hash, stream_hash
+from ..index import (
+    _is_current,
+    drop_index_cache,
+    load_index,
+    refresh_index,
+    remove_index_entries,
+    remove_index_entry,
+    update_index_entries,
+    update_index_entry,
+)
+from ..layout import NotesLayout, get_layout
+from ..titles import filename_for
+from .base import CONFLICT_RETRIES, ConflictError, NoteRecord, StorageBackend
+
+_STATUS_PREFIX = b"<!-- status:"
+
+
+class FilesystemBackend(StorageBackend):
+    """
+    One Markdown file per note in NOTES_DIR, either directly (the
+    original layout) or in hashed shard directories for very large
+    collections (see `storage.layout`).
+
+    Listing is served from the persistent metadata index, which this
+    backend keeps current on every write and delete.
+
+    Notes are replaced atomically (temporary file, fsync, rename), so a
+    crash or a concurrent reader never sees a half-written note.
+    """
+
+    name = "filesystem"
+
+    def __init__(self, notes_dir: Path = NOTES_DIR):
+        self.notes_dir = notes_dir
+
+    # ------------------------------------------------------------------
+    # Path handling
+    # ------------------------------------------------------------------
+    @property
+    def layout(self) -> NotesLayout:
+        return get_layout(self.notes_dir)
+
+    def path_for(self, title: str) -> Path:
+        """
+        The title's filename (see `storage.titles.filename_for`), in the
+        directory the layout puts it.
+        """
+        return self.layout.path_for_name(filename_for(title))
+
+    # ------------------------------------------------------------------
+    # StorageBackend interface
+    # ------------------------------------------------------------------
+    def exists(self, title: str) -> bool:
+        return self.path_for(title).exists()
+
+    def read(self, title: str) -> str:
+        # Decoded as a whole: line endings stay exactly as stored
+        with self.open_note(title) as fh:
+            data = fh.read()
+        profiling.count("notes_read")
+        profiling.count("bytes_read", len(data))
+        return data.decode("utf-8")
+
+    def open_note(self, title: str) -> BinaryIO:
+        try:
+            return open(self.path_for(title), "rb")
+        except FileNotFoundError:
+            if self.layout.migrating_from is None:
+                raise
+            # Moved to its new place since its path was resolved
+            return open(self.path_for(title), "rb")
+
+    def write(
+        self,
+        title: str,
+        text: str,
+        mtime: Optional[float] = None,
+        expected_hash: Optional[str] = None,
+    ) -> None:
+        with profiling.span("note.write", title=title), self.lock(title):
+            if expected_hash is not None and self._stored_hash(title) != expected_hash:
+                raise ConflictError(f"Note {title!r} changed since it was read")
+            update_index_entry(self._write_file(title, text, mtime))
+
+    def write_many(self, notes: Iterable[Tuple[str, str, Optional[float]]]) -> None:
+        paths = []
+        with profiling.span("notes.write"):
+            for title, text, mtime in notes:
+                with self.lock(title):
+                    paths.append(self._write_file(title, text, mtime, sync_dir=False))
+            # One flush per directory makes all the renames durable
+            for directory in {path.parent for path in paths}:
+                fsync_dir(directory)
+        update_index_entries(paths)
+
+    def _write_file(
+        self, title: str, text: str, mtime: Optional[float], sync_dir: bool = True
+    ) -> Path:
+        path = self.path_for(title)
+        if self.layout.sharded and not path.parent.is_dir():
+            # First note of its shard: the new directories must be as
+            # durable as the note
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fsync_dir(path.parent.parent)
+            fsync_dir(self.notes_dir)
+        atomic_write(path, text, mtime=mtime, sync_dir=sync_dir)
+        return path
+
+    def _stored_hash(self, title: str) -> Optional[str]:
+        try:
+            with open(self.path_for(title), "rb") as fh:
+                return stream_hash(fh)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, title: str) -> None:
+        with self.lock(title):
+            path = self.path_for(title)
+            path.unlink()
+            remove_index_entry(path)
+
+    def delete_many(self, titles: Iterable[str]) -> Dict[str, Exception]:
+        errors: Dict[str, Exception] = {}
+        removed = []
+        with profiling.span("notes.delete"):
+            for title in titles:
+                path = self.path_for(title)
+                try:
+                    with self.lock(title):
+                        path.unlink()
+                    removed.append(path)
+                except OSError as exc:
+                    errors[title] = exc
+            profiling.count("files_deleted", len(removed))
+        remove_index_entries(removed)
+        return errors
+
+    def records(self) -> List[NoteRecord]:
+        return list(self.iter_records())
+
+    def iter_records(self) -> Iterator[NoteRecord]:
+        entries = refresh_index()
+        for entry in sorted(entries.values(), key=lambda e: e["title"]):
+            yield _to_record(entry)
+
+    def drop_caches(self) -> None:
+        drop_index_cache()
+
+    def change_stamp(self) -> Optional[str]:
+        # Creating, deleting or atomically replacing a note file changes
+        # the mtime of its directory; a few hundred shards at most
+        stamps = []
+        for directory in self.layout.directories():
+            try:
+                st = os.stat(directory)
+            except FileNotFoundError:
+                continue
+            stamps.append(f"{directory}:{st.st_ino}:{st.st_mtime_ns}")
+        return content_hash("\n".join(stamps).encode("utf-8", errors="surrogateescape"))
+
+    def record(self, title: str) -> Optional[NoteRecord]:
+        path = self.path_for(title)
+        entry = load_index()["notes"].get(path.name)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        if not _is_current(entry, st):
+            update_index_entry(path)
+            entry = load_index()["notes"].get(path.name)
+        return None if entry is None else _to_record(entry)
+
+    def set_status(self, title: str, new_status: str) -> None:
+        """
+        Replace the status comment without reading the whole note.
+
+        Only the header is read. A header of the same length is
+        overwritten in place; otherwise the note is streamed into a
+        temporary file behind the new header and renamed over the
+        original, so it is never half-written.
+
+        Other `notes` processes are excluded by the note's lock. Other
+        programs (editors, sync tools) are not, so the note is checked
+        to still be the file that was read before it is written, and
+        the update starts over if it was replaced in the meantime.
+        """
+        errors = self.set_status_many([title], new_status)
+        if errors:
+            raise errors[title]
+
+    def set_status_many(self, titles: Iterable[str], new_status: str) -> Dict[str, Exception]:
+        # Every header is rewritten first; the index is updated once
+        errors: Dict[str, Exception] = {}
+        paths = []
+        with profiling.span("status.rewrite"):
+            for title in titles:
+                try:
+                    with self.lock(title):
+                        if self._rewrite_status(title, new_status):
+                            paths.append(self.path_for(title))
+                except (OSError, ConflictError) as exc:
+                    errors[title] = exc
+        update_index_entries(paths)
+        return errors
+
+    def _rewrite_status(self, title: str, new_status: str) -> bool:
+        """
+        Rewrite one note's header; False if the generic implementation
+        (which also updates the index) had to be used instead.
+        """
+        for attempt in range(CONFLICT_RETRIES):
+            try:
+                return self._rewrite_header(title, new_status)
+            except ConflictError:
+                if attempt == CONFLICT_RETRIES - 1:
+                    raise
+
+    def _rewrite_header(self, title: str, new_status: str) -> bool:
+        path = self.path_for(title)
+        header = STATUS_COMMENT_TEMPLATE.format(new_status).encode("utf-8")
+
+        with open(path, "r+b") as fh:
+            opened = os.fstat(fh.fileno())
+            head = fh.read(STATUS_HEADER_BYTES)
+            profiling.count("bytes_read", len(head))
+            # Leading whitespace is dropped, as Note.to_text() does
+            start = len(head) - len(head.lstrip())
+            end = start
+            oversized = False
+            if head.startswith(_STATUS_PREFIX, start):
+                newline = head.find(b"\n", start)
+                # A status line longer than the header window is left to
+                # the generic (full read) implementation
+                oversized = newline < 0
+                end = newline + 1
+                if head[newline - 1:newline] == b"\r":
+                    header = header[:-1] + b"\r\n"
+
+            if not oversized and start == 0 and end == len(header):
+                # Same length: overwrite the header where it is
+                if head[:end] != header:
+                    _check_unchanged(path, opened)
+                    fh.seek(0)
+                    fh.write(header)
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                    profiling.count("bytes_written", len(header))
+            elif not oversized:
+                fh.seek(end)
+                _replace_streamed(path, header, fh, opened)
+
+        if oversized:
+            super().set_status(title, new_status)
+            return False
+        return True
+
+    @contextmanager
+    def editable(self, title: str) -> Iterator[Path]:
+        # The editor works on the note file directly (and itself notices
+        # if the file changes underneath it)
+        path = self.path_for(title)
+        yield path
+        update_index_entry(path)
+
+
+def _to_record(entry: dict) -> NoteRecord:
+    return NoteRecord(
+        entry["title"],
+        entry["status"],
+        entry["mtime_ns"] / 1e9,
+        entry["size"],
+        entry["hash"],
+    )
+
+
+def _check_unchanged(path: Path, opened: os.stat_result) -> None:
+    """
+    Raise ConflictError unless `path` is still the file that was opened,
+    unmodified.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise ConflictError(f"{path.name} was removed while being updated") from None
+    if (st.st_ino, st.st_mtime_ns, st.st_size) != (
+        opened.st_ino, opened.st_mtime_ns, opened.st_size
+    ):
+        raise ConflictError(f"{path.name} was changed while being updated")
+
+
+def _replace_streamed(path: Path, header: bytes, rest: BinaryIO, opened: os.stat_result) -> None:
+    """
+    Atomically replace `path` with `header` followed by the rest of `rest`,
+    unless `path` changed since it was opened (`opened`).
+    """
+    with atomic_writer(path) as out:
+        out.write(header)
+        shutil.copyfileobj(rest, out, 1 << 20)
+        _check_unchanged(path, opened)
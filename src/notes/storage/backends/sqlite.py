@@ -0,0 +1,240 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ...config import SQLITE_DB_PATH, STATUSES
+from ...models.note import Note
+from ...utils import profiling
+from ...utils.hashing import content_hash
+from .base import SORT_ORDERS, ConflictError, NoteRecord, StorageBackend
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    title   TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    status  TEXT NOT NULL,
+    mtime   REAL NOT NULL,
+    size    INTEGER NOT NULL,
+    hash    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_status ON notes (status);
+CREATE INDEX IF NOT EXISTS notes_mtime ON notes (mtime);
+"""
+
+_UPSERT = (
+    "INSERT OR REPLACE INTO notes (title, content, status, mtime, size, hash) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    All notes in a single SQLite database file.
+
+    Avoids huge directories of small files; metadata columns are
+    indexed so listing never touches note bodies.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: Path = SQLITE_DB_PATH):
+        self.db_path = db_path
+        # sqlite3 connections must stay in the thread that opened them
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # Connection handling
+    # ------------------------------------------------------------------
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        Open the database on first use in each thread (WAL mode lets
+        readers run alongside a writer).
+        """
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(str(self.db_path))
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+        return conn
+
+    # ------------------------------------------------------------------
+    # StorageBackend interface
+    # ------------------------------------------------------------------
+    def exists(self, title: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM notes WHERE title = ?", (title,)).fetchone()
+        return row is not None
+
+    def read(self, title: str) -> str:
+        row = self.conn.execute(
+            "SELECT content FROM notes WHERE title = ?", (title,)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No note titled {title!r}")
+        profiling.count("notes_read")
+        return row[0]
+
+    def open_note(self, title: str) -> BinaryIO:
+        # Incremental reads of the stored text (Python 3.11+); a write
+        # to the note makes further reads fail instead of mixing versions
+        if not hasattr(sqlite3.Connection, "blobopen"):
+            return super().open_note(title)
+        row = self.conn.execute("SELECT rowid FROM notes WHERE title = ?", (title,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No note titled {title!r}")
+        return self.conn.blobopen("notes", "content", row[0], readonly=True)
+
+    def write(
+        self,
+        title: str,
+        text: str,
+        mtime: Optional[float] = None,
+        expected_hash: Optional[str] = None,
+    ) -> None:
+        if expected_hash is None:
+            self.write_many([(title, text, mtime)])
+            return
+        # Check and write in one transaction; IMMEDIATE takes the write
+        # lock up front, so no other connection can commit in between
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT hash FROM notes WHERE title = ?", (title,)).fetchone()
+            if row is None or row[0] != expected_hash:
+                raise ConflictError(f"Note {title!r} changed since it was read")
+            conn.execute(_UPSERT, self._row(title, text, mtime))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def write_many(self, notes: Iterable[Tuple[str, str, Optional[float]]]) -> None:
+        # One transaction for the whole batch
+        with self.conn:
+            self.conn.executemany(
+                _UPSERT,
+                (self._row(title, text, mtime) for title, text, mtime in notes),
+            )
+
+    @staticmethod
+    def _row(title: str, text: str, mtime: Optional[float]) -> tuple:
+        data = text.encode("utf-8")
+        return (
+            title,
+            text,
+            Note._extract_status(text),
+            time.time() if mtime is None else mtime,
+            len(data),
+            content_hash(data),
+        )
+
+    def delete(self, title: str) -> None:
+        with self.conn:
+            cur = self.conn.execute("DELETE FROM notes WHERE title = ?", (title,))
+        if cur.rowcount == 0:
+            raise FileNotFoundError(f"No note titled {title!r}")
+
+    def delete_many(self, titles: Iterable[str]) -> Dict[str, Exception]:
+        errors: Dict[str, Exception] = {}
+        with self.conn:
+            for title in titles:
+                cur = self.conn.execute("DELETE FROM notes WHERE title = ?", (title,))
+                if cur.rowcount == 0:
+                    errors[title] = FileNotFoundError(f"No note titled {title!r}")
+        return errors
+
+    def set_status_many(self, titles: Iterable[str], new_status: str) -> Dict[str, Exception]:
+        # One IMMEDIATE transaction: no other writer can change a note
+        # between reading and rewriting it
+        errors: Dict[str, Exception] = {}
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for title in titles:
+                row = conn.execute(
+                    "SELECT content FROM notes WHERE title = ?", (title,)
+                ).fetchone()
+                if row is None:
+                    errors[title] = FileNotFoundError(f"No note titled {title!r}")
+                    continue
+                note = Note(title)
+                note.content = row[0]
+                note.set_status(new_status)
+                conn.execute(_UPSERT, self._row(title, note.to_text(), None))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        return errors
+
+    def records(self) -> List[NoteRecord]:
+        return list(self.iter_records())
+
+    def iter_records(self) -> Iterator[NoteRecord]:
+        # Rows are fetched as the caller consumes them
+        rows = self.conn.execute(
+            "SELECT title, status, mtime, size, hash FROM notes ORDER BY title"
+        )
+        for row in rows:
+            yield NoteRecord(*row)
+
+    def change_stamp(self) -> Optional[str]:
+        # Every commit writes to the write-ahead log or the database file
+        stamps = []
+        for path in (self.db_path, self.db_path.with_name(self.db_path.name + "-wal")):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            stamps.append(f"{st.st_ino}:{st.st_mtime_ns}:{st.st_size}")
+        return " ".join(stamps)
+
+    def record(self, title: str) -> Optional[NoteRecord]:
+        row = self.conn.execute(
+            "SELECT title, status, mtime, size, hash FROM notes WHERE title = ?", (title,)
+        ).fetchone()
+        return None if row is None else NoteRecord(*row)
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        modified_since: Optional[float] = None,
+        sort: str = "title",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[NoteRecord]:
+        # Filtering, ordering and paging happen in SQLite (status and mtime
+        # are indexed); rows are fetched as the caller consumes them
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort order {sort!r}")
+
+        where, params = [], []
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if modified_since is not None:
+            where.append("mtime >= ?")
+            params.append(modified_since)
+
+        order = {
+            "title": "title",
+            "mtime": "mtime DESC, title",
+            "status": (
+                "CASE status "
+                + " ".join(f"WHEN ? THEN {rank}" for rank in range(len(STATUSES)))
+                + f" ELSE {len(STATUSES)} END, title"
+            ),
+        }[sort]
+        if sort == "status":
+            params.extend(STATUSES)
+
+        sql = "SELECT title, status, mtime, size, hash FROM notes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset])
+
+        for row in self.conn.execute(sql, params):
+            yield NoteRecord(*row)
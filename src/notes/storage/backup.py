@@ -1,40 +1,605 @@
 import datetime
-import zipfile
+import json
+import os
+import sys
+import time
+from collections import deque
 from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
-from ..config import NOTES_DIR, DOWNLOADS_DIR
-from ..utils.editor import console
+from ..config import DOWNLOADS_DIR, BACKUP_STATE_PATH
+from ..utils import profiling
+from ..utils.atomic import atomic_write
+from ..utils.console import console
+from ..utils.hashing import content_hash
+from .backends import get_backend
+from .titles import filename_for
+
+# Bump whenever the archive layout changes
+BACKUP_FORMAT_VERSION = 1
+
+# Last member of every archive: what it contains and which backup it extends
+MANIFEST_NAME = "MANIFEST.json"
+
+# PAX header keys carrying each note's title and checksum, so an archive can
+# be verified and restored member by member while streaming. They use the
+# extended-attribute namespace, which GNU tar accepts without warnings.
+PAX_TITLE = "SCHILY.xattr.user.notes.title"
+PAX_SHA256 = "SCHILY.xattr.user.notes.sha256"
+
+# Uncompressed bytes per gzip member; each member is compressed on its own
+# thread, and concatenated members form one valid .tar.gz stream
+CHUNK_SIZE = 1 << 20
+COMPRESS_LEVEL = 6
 
 
 # ----------------------------------------------------------------------
-# Backup all notes into a ZIP archive
+# Backup state (what the previous backup contained)
 # ----------------------------------------------------------------------
-def backup_notes() -> None:
+def _load_state() -> Optional[dict]:
+    try:
+        state = json.loads(BACKUP_STATE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != BACKUP_FORMAT_VERSION:
+        return None
+    return state
+
+
+def _save_state(archive_name: str, snapshot: dict) -> None:
+    atomic_write(
+        BACKUP_STATE_PATH,
+        json.dumps({"version": BACKUP_FORMAT_VERSION, "last": archive_name, "notes": snapshot}),
+    )
+
+
+# ----------------------------------------------------------------------
+# Archive writing helpers
+# ----------------------------------------------------------------------
+def _tar_member(name: str, data: bytes, mtime: float, pax_headers: dict) -> bytes:
+    """
+    Serialize one tar member (header, data, padding to a full block).
+    """
+    import tarfile
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    info.pax_headers = pax_headers
+    header = info.tobuf(format=tarfile.PAX_FORMAT, encoding="utf-8", errors="surrogateescape")
+    return header + data + b"\0" * (-len(data) % tarfile.BLOCKSIZE)
+
+
+class _ParallelGzipWriter:
     """
-    Create a timestamped ZIP archive containing all Markdown notes.
+    Write a tar stream as concatenated gzip members compressed in parallel.
 
-    - Archive is stored in the user's Downloads directory.
-    - Only files ending with `.md` inside NOTES_DIR are included.
-    - A success message is printed with the number of notes backed up.
+    zlib releases the GIL, so threads compress chunks concurrently.
+    Output order is preserved and at most `2 * jobs` chunks are held in
+    memory, so the archive can be streamed to a pipe.
+    """
+
+    def __init__(self, out: BinaryIO, jobs: int):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.out = out
+        self.pool = ThreadPoolExecutor(max_workers=jobs)
+        self.pending: deque = deque()
+        self.max_pending = 2 * jobs
+        self.buffer = bytearray()
+        self.raw_size = 0
+        self.compressed_size = 0
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        self.raw_size += len(data)
+        if len(self.buffer) >= CHUNK_SIZE:
+            self._submit()
+
+    def _submit(self) -> None:
+        import gzip
+
+        if self.buffer:
+            chunk = bytes(self.buffer)
+            self.buffer = bytearray()
+            self.pending.append(
+                self.pool.submit(gzip.compress, chunk, COMPRESS_LEVEL, mtime=0)
+            )
+        while len(self.pending) > self.max_pending:
+            self._drain_one()
+
+    def _drain_one(self) -> None:
+        with profiling.span("backup.compress.wait"):
+            data = self.pending.popleft().result()
+        self.out.write(data)
+        self.compressed_size += len(data)
+
+    def close(self) -> None:
+        import tarfile
+
+        # End-of-archive marker, padded to a whole tar record
+        self.write(b"\0" * (2 * tarfile.BLOCKSIZE))
+        self.write(b"\0" * (-self.raw_size % tarfile.RECORDSIZE))
+        self._submit()
+        while self.pending:
+            self._drain_one()
+        self.pool.shutdown()
+        self.out.flush()
+
+
+# ----------------------------------------------------------------------
+# Archive naming
+# ----------------------------------------------------------------------
+def _create_archive(suffix: str, parent: Optional[str]) -> Tuple[str, BinaryIO]:
+    """
+    Create a new, uniquely named archive file in Downloads.
+
+    Names carry the time to the second; backups made within the same
+    second get a counter, so an existing archive is never overwritten
+    and never becomes its own parent.
+
+    Returns
+    -------
+    (str, file)
+        Archive name and the file opened for writing
     """
-    # Generate a unique name based on current timestamp
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_name = f"notes_backup_{timestamp}.zip"
-    backup_path = DOWNLOADS_DIR / backup_name
+    counter = 1
+    while True:
+        extra = f"_{counter}" if counter > 1 else ""
+        name = f"notes_backup_{timestamp}{extra}{suffix}.tar.gz"
+        counter += 1
+        if name == parent:
+            continue
+        try:
+            return name, open(DOWNLOADS_DIR / name, "xb")
+        except FileExistsError:
+            continue
+
+
+# ----------------------------------------------------------------------
+# Backup all notes into a compressed archive
+# ----------------------------------------------------------------------
+def backup_notes(full: bool = False, to_stdout: bool = False, jobs: int = 0) -> Optional[Path]:
+    """
+    Create a timestamped, gzip-compressed tar archive of the notes.
 
-    # Counter for number of notes included
-    count = 0
+    - By default the backup is incremental: only notes changed since the
+      previous backup are included, and the manifest names that backup
+      as its parent. The first backup (or `full=True`) includes all notes.
+    - Every note carries its SHA-256 checksum; the manifest lists the
+      checksum of every note that existed at backup time, so deletions
+      are recorded too.
+    - Compression runs on `jobs` threads (0 = one per CPU).
+    - With `to_stdout` the archive is streamed to standard output
+      (messages go to stderr) and is not recorded as the previous
+      backup; otherwise it is stored in Downloads.
+
+    Returns
+    -------
+    Path or None
+        Path of the archive written to Downloads, if any
+    """
+    # Messages must not end up inside a streamed archive
+    out_console = console
+    if to_stdout:
+        from rich.console import Console
+        out_console = Console(stderr=True)
 
-    # Create a new ZIP file (overwrite if exists)
-    with zipfile.ZipFile(backup_path, "w") as zipf:
-        for file in NOTES_DIR.iterdir():
-            # Only include Markdown notes
-            if file.suffix == ".md":
-                # Write file with just its filename inside the archive
-                zipf.write(file, arcname=file.name)
-                count += 1
+    backend = get_backend()
+    with profiling.span("backup.plan"):
+        records = backend.records()
+        state = None if full else _load_state()
+        previous = state["notes"] if state else None
+        changed = [r for r in records if previous is None or previous.get(r.title) != r.hash]
+        snapshot = {r.title: r.hash for r in records}
+
+    if previous is not None and not changed and snapshot.keys() == previous.keys():
+        out_console.print("[yellow]No changes since the last backup.[/yellow]")
+        return None
+
+    kind = "incremental" if previous is not None else "full"
+    suffix = "_incr" if previous is not None else ""
+    parent = state["last"] if state else None
+    if to_stdout:
+        backup_name, out = None, sys.stdout.buffer
+    else:
+        backup_name, out = _create_archive(suffix, parent)
+        backup_path = DOWNLOADS_DIR / backup_name
+
+    writer = _ParallelGzipWriter(out, jobs if jobs > 0 else (os.cpu_count() or 1))
+    included = []
+    with profiling.span("backup.archive", kind=kind) as archiving:
+        try:
+            for record in changed:
+                try:
+                    data = backend.read(record.title).encode("utf-8")
+                except FileNotFoundError:
+                    # Deleted while the backup was running
+                    snapshot.pop(record.title, None)
+                    continue
+
+                checksum = content_hash(data)
+                snapshot[record.title] = checksum
+                writer.write(_tar_member(
+                    filename_for(record.title),
+                    data,
+                    record.mtime,
+                    {PAX_TITLE: record.title, PAX_SHA256: checksum},
+                ))
+                included.append(record.title)
+
+            manifest = {
+                "version": BACKUP_FORMAT_VERSION,
+                "created": time.time(),
+                "kind": kind,
+                "parent": parent,
+                "included": included,
+                "notes": snapshot,
+            }
+            writer.write(_tar_member(
+                MANIFEST_NAME, json.dumps(manifest, indent=1).encode("utf-8"), time.time(), {}
+            ))
+            writer.close()
+            archiving.add("bytes_written", writer.compressed_size)
+        except BaseException:
+            # Never leave a truncated archive behind
+            if not to_stdout:
+                out.close()
+                backup_path.unlink()
+            raise
+
+    if not to_stdout:
+        out.close()
+        # A streamed archive is not in Downloads, so it must not become
+        # the parent of the next incremental backup
+        _save_state(backup_name, snapshot)
 
     # Print a styled success message
+    where = "stdout" if to_stdout else str(backup_path)
+    out_console.print(
+        f"[green]Backup created:[/green] {where} "
+        f"({kind}, {len(included)} of {len(snapshot)} notes, "
+        f"{writer.compressed_size / 1024:.1f} KiB)"
+    )
+    return None if to_stdout else backup_path
+
+
+# ----------------------------------------------------------------------
+# Reading archives back (verify and restore)
+# ----------------------------------------------------------------------
+# Notes handed to backend.write_many() at a time while restoring
+RESTORE_BATCH = 500
+
+
+def _read_errors() -> tuple:
+    """
+    Exceptions raised by tarfile, gzip and zlib on damaged archives.
+    """
+    import tarfile
+    import zlib
+    return (tarfile.TarError, zlib.error, EOFError, OSError, ValueError)
+
+
+class ArchiveReport(NamedTuple):
+    """
+    Outcome of streaming through one backup archive.
+    """
+
+    path: Path
+    manifest: Optional[dict]
+    notes: List[str]
+    corrupt: List[str]
+    restored: List[str]
+
+
+def _archive_members(path: Path) -> Iterator[tuple]:
+    """
+    Yield (member, data) for every regular file in an archive.
+
+    The archive is read strictly sequentially: nothing is extracted to
+    disk and nothing is seeked, so "-" (standard input) works too.
+    """
+    import gzip
+    import tarfile
+
+    raw = sys.stdin.buffer if str(path) == "-" else open(path, "rb")
+    try:
+        # tarfile's own "r|gz" stops after the first gzip member, but
+        # archives are written as many concatenated members
+        with gzip.GzipFile(fileobj=raw, mode="rb") as gz:
+            with tarfile.open(fileobj=gz, mode="r|") as tar:
+                for member in tar:
+                    if member.isfile():
+                        yield member, tar.extractfile(member).read()
+    finally:
+        if raw is not sys.stdin.buffer:
+            raw.close()
+
+
+def _scan_archive(
+    path: Path,
+    current: Optional[Dict[str, str]] = None,
+    wanted: Optional[Dict[str, str]] = None,
+    missing_only: bool = False,
+) -> ArchiveReport:
+    """
+    Stream one archive, checking every note against its checksum.
+
+    Only notes that are missing or differ are written, in batches.
+
+    Parameters
+    ----------
+    path : Path
+        Archive to read ("-" reads standard input)
+    current : dict or None
+        Title -> hash of the stored notes. When given, notes that are
+        missing or differ are restored (and `current` is updated);
+        otherwise the archive is only verified.
+    wanted : dict or None
+        Restore only these titles in exactly these versions
+    missing_only : bool
+        Never overwrite a note that already exists
+    """
+    from .titles import title_from_filename
+
+    backend = get_backend()
+    manifest = None
+    notes: List[str] = []
+    corrupt: List[str] = []
+    restored: List[str] = []
+    batch: List[Tuple[str, str, Optional[float]]] = []
+
+    def flush() -> None:
+        from .history import record_versions
+
+        titles = [title for title, _, _ in batch]
+        # Notes overwritten by the restore keep their text in the history
+        record_versions(titles, "untracked")
+        with profiling.span("restore.write"):
+            backend.write_many(batch)
+        record_versions(titles, "restore")
+        restored.extend(titles)
+        batch.clear()
+
+    with profiling.span("backup.scan", archive=str(path)) as scanning:
+        for member, data in _archive_members(path):
+            scanning.add("bytes_unpacked", len(data))
+            if member.name == MANIFEST_NAME:
+                manifest = json.loads(data.decode("utf-8"))
+                continue
+
+            title = member.pax_headers.get(PAX_TITLE) or title_from_filename(member.name)
+            checksum = content_hash(data)
+            notes.append(title)
+            if checksum != member.pax_headers.get(PAX_SHA256, checksum):
+                corrupt.append(title)
+                continue
+
+            if current is None or (wanted is not None and wanted.get(title) != checksum):
+                continue
+            if current.get(title) == checksum or (missing_only and title in current):
+                continue
+
+            batch.append((title, data.decode("utf-8"), float(member.mtime)))
+            current[title] = checksum
+            if len(batch) >= RESTORE_BATCH:
+                flush()
+
+        if batch:
+            flush()
+        scanning.add("notes", len(notes))
+    return ArchiveReport(path, manifest, notes, corrupt, restored)
+
+
+def _parent_path(archive: Path, manifest: Optional[dict]) -> Optional[Path]:
+    """
+    Locate the archive an incremental backup extends.
+
+    Parents are looked up next to the child archive, then in Downloads.
+    """
+    name = manifest.get("parent") if manifest else None
+    if not name:
+        return None
+    if str(archive) != "-" and (archive.parent / name).exists():
+        return archive.parent / name
+    return DOWNLOADS_DIR / name
+
+
+def _chain_limit(archive: Path) -> int:
+    """
+    Most archives a backup chain can hold: those where parents are looked up.
+    """
+    folders = {DOWNLOADS_DIR.resolve()}
+    if str(archive) != "-":
+        folders.add(archive.parent.resolve())
+    found = {path for folder in folders for path in folder.glob("notes_backup_*.tar.gz")}
+    # The starting archive may be named anything, or be standard input
+    return len(found) + 1
+
+
+def _follow_parent(
+    archive: Path, manifest: Optional[dict], seen: set, limit: int
+) -> Optional[Path]:
+    """
+    Step from an archive to its parent, refusing to walk in circles.
+
+    `seen` collects the archives visited so far.
+
+    Raises
+    ------
+    ValueError
+        If the parent was already visited, or the chain grows longer
+        than the `limit` archives that exist
+    """
+    seen.add(archive if str(archive) == "-" else archive.resolve())
+    parent = _parent_path(archive, manifest)
+    if parent is None:
+        return None
+    if parent.resolve() in seen:
+        raise ValueError(f"backup chain is circular ({parent.name} is its own ancestor)")
+    if len(seen) >= limit:
+        raise ValueError(f"backup chain is longer than the {limit} archives available")
+    return parent
+
+
+def _manifest_problems(report: ArchiveReport) -> List[str]:
+    manifest = report.manifest
+    if manifest is None:
+        return ["manifest missing (archive truncated?)"]
+    if manifest.get("version") != BACKUP_FORMAT_VERSION:
+        return [f"unsupported backup format {manifest.get('version')!r}"]
+    problems = []
+    if sorted(manifest.get("included", [])) != sorted(report.notes):
+        problems.append("notes in the archive do not match its manifest")
+    if report.corrupt:
+        problems.append(f"checksum mismatch: {', '.join(report.corrupt)}")
+    return problems
+
+
+def verify_backup(archive: Optional[Path] = None) -> bool:
+    """
+    Check an archive and every incremental parent it depends on.
+
+    Every note is re-hashed and compared with the checksum recorded at
+    backup time, and the member list is compared with the manifest.
+    Defaults to the most recent backup.
+
+    Returns
+    -------
+    bool
+        True if the whole chain is intact
+    """
+    if archive is None:
+        state = _load_state()
+        if state is None or not state.get("last"):
+            console.print("[red]Error:[/red] No previous backup found.")
+            return False
+        archive = DOWNLOADS_DIR / state["last"]
+
+    ok = True
+    seen: set = set()
+    limit = _chain_limit(archive)
+    path: Optional[Path] = archive
+    while path is not None:
+        name = "stdin" if str(path) == "-" else path.name
+        if str(path) != "-" and not path.exists():
+            console.print(f"[red]Missing:[/red] {path}")
+            return False
+        try:
+            report = _scan_archive(path)
+        except _read_errors() as exc:
+            console.print(f"[red]Unreadable:[/red] {name} ({exc})")
+            return False
+
+        problems = _manifest_problems(report)
+        if problems:
+            ok = False
+            for problem in problems:
+                console.print(f"[red]Failed:[/red] {name}: {problem}")
+        else:
+            console.print(
+                f"[green]OK:[/green] {name} ({report.manifest['kind']}, "
+                f"{len(report.notes)} notes verified)"
+            )
+        try:
+            path = _follow_parent(path, report.manifest, seen, limit)
+        except ValueError as exc:
+            console.print(f"[red]Failed:[/red] {exc}")
+            return False
+    return ok
+
+
+def restore_notes(archive: Path, missing_only: bool = False) -> Optional[List[str]]:
+    """
+    Bring the notes back to the state recorded in a backup archive.
+
+    Only notes that are missing or differ from the archived version are
+    written, in batches. For an incremental archive the parent chain is
+    streamed newest first, taking each note from the newest archive
+    that holds the wanted version; the chain is followed only as far as
+    needed. Notes created after the backup are left alone.
+
+    Parameters
+    ----------
+    archive : Path
+        Archive to restore ("-" reads standard input)
+    missing_only : bool
+        Keep notes that already exist, even if they changed
+
+    Returns
+    -------
+    list of str or None
+        Titles restored, or None if the archive could not be read
+    """
+    backend = get_backend()
+    current = {r.title: r.hash for r in backend.records()}
+    before = dict(current)
+
+    try:
+        report = _scan_archive(archive, current, missing_only=missing_only)
+    except _read_errors() as exc:
+        console.print(f"[red]Error:[/red] Cannot read {archive} ({exc})")
+        return None
+    if report.manifest is None:
+        console.print(f"[red]Error:[/red] {archive} has no manifest (truncated?)")
+        return None
+
+    restored = list(report.restored)
+    corrupt = list(report.corrupt)
+
+    # Versions still to be found further up the incremental chain
+    snapshot = report.manifest.get("notes", {})
+    wanted = {
+        title: checksum
+        for title, checksum in snapshot.items()
+        if current.get(title) != checksum and not (missing_only and title in current)
+    }
+
+    seen: set = set()
+    limit = _chain_limit(archive)
+    try:
+        path = _follow_parent(archive, report.manifest, seen, limit)
+    except ValueError as exc:
+        console.print(f"[red]Error:[/red] {exc}")
+        path = None
+    while wanted and path is not None:
+        if not path.exists():
+            console.print(f"[yellow]Warning:[/yellow] Parent backup {path} not found")
+            break
+        try:
+            parent = _scan_archive(path, current, wanted=wanted, missing_only=missing_only)
+        except _read_errors() as exc:
+            console.print(f"[yellow]Warning:[/yellow] Cannot read {path} ({exc})")
+            break
+        restored.extend(parent.restored)
+        corrupt.extend(parent.corrupt)
+        for title in parent.restored:
+            wanted.pop(title, None)
+        try:
+            path = _follow_parent(path, parent.manifest, seen, limit)
+        except ValueError as exc:
+            console.print(f"[red]Error:[/red] {exc}")
+            break
+
+    if restored:
+        # Keep the search index in step with the restored notes
+        from .search import sync_search_index
+        sync_search_index()
+
+    for title in corrupt:
+        console.print(f"[red]Checksum mismatch, skipped:[/red] {title}")
+    if wanted:
+        console.print(
+            f"[yellow]Warning:[/yellow] {len(wanted)} notes could not be found "
+            f"in the backup chain: {', '.join(sorted(wanted))}"
+        )
+    unchanged = sum(
+        1 for title, checksum in snapshot.items()
+        if before.get(title) == checksum or (missing_only and title in before)
+    )
     console.print(
-        f"[green]Backup created:[/green] {backup_path} ({count} notes)"
+        f"[green]Restored {len(restored)} notes[/green] "
+        f"({unchanged} already up to date)"
     )
+    return restored
@@ -0,0 +1,197 @@
+import fnmatch
+from typing import IO, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..utils.console import console
+from .backends import get_backend
+
+
+class BulkResult(NamedTuple):
+    """
+    Outcome of applying one operation to many notes.
+
+    `done` lists the notes that were changed, `unchanged` those that
+    already were as requested (same status, exports up to date),
+    `missing` the titles no note exists for, and `failed` pairs of
+    title and error message.
+    """
+
+    action: str
+    done: List[str]
+    unchanged: List[str]
+    missing: List[str]
+    failed: List[Tuple[str, str]]
+
+
+# ----------------------------------------------------------------------
+# Choosing notes
+# ----------------------------------------------------------------------
+def read_titles(stream: IO[str]) -> List[str]:
+    """
+    Read titles one per line (blank lines are skipped).
+    """
+    return [line.strip() for line in stream if line.strip()]
+
+
+def select_titles(
+    titles: Optional[Sequence[str]] = None,
+    status: Optional[str] = None,
+    modified_since: Optional[float] = None,
+    match: Optional[str] = None,
+) -> List[str]:
+    """
+    Resolve a selection of notes to a list of titles.
+
+    Parameters
+    ----------
+    titles : sequence of str or None
+        Explicit titles. Kept as given (duplicates dropped), including
+        titles of notes that do not exist, which the bulk operations
+        report as missing.
+    status, modified_since : see `StorageBackend.query`
+    match : str or None
+        Shell-style pattern the title must match (e.g. "Sprint 12*")
+
+    Filters select from every note, with a single listing of the
+    backend's metadata; combined with explicit titles they narrow
+    that list instead.
+    """
+    filtered = status is not None or modified_since is not None or match is not None
+    if titles is not None:
+        titles = list(dict.fromkeys(titles))
+        if not filtered:
+            return titles
+
+    selected = [
+        record.title
+        for record in get_backend().query(status=status, modified_since=modified_since)
+        if match is None or fnmatch.fnmatchcase(record.title, match)
+    ]
+    if titles is None:
+        return selected
+    wanted = set(selected)
+    return [title for title in titles if title in wanted]
+
+
+def _failure(title: str, exc: Exception) -> Tuple[str, str]:
+    return title, f"{type(exc).__name__}: {exc}"
+
+
+# ----------------------------------------------------------------------
+# Operations
+# ----------------------------------------------------------------------
+def bulk_set_status(titles: Iterable[str], new_status: str) -> BulkResult:
+    """
+    Change the status of many notes in one go.
+
+    Notes that already have the status are not rewritten. All headers
+    are rewritten before the metadata index and the search index are
+    updated, once each.
+    """
+    from .history import recording_status_change
+    from .search import update_search_statuses
+
+    backend = get_backend()
+    result = BulkResult("Updated", [], [], [], [])
+    previous = {}
+    for title in titles:
+        record = backend.record(title)
+        if record is None:
+            result.missing.append(title)
+        elif record.status == new_status:
+            result.unchanged.append(title)
+        else:
+            previous[title] = record.hash
+
+    with recording_status_change(previous):
+        errors = backend.set_status_many(list(previous), new_status)
+    for title in previous:
+        exc = errors.get(title)
+        if exc is None:
+            result.done.append(title)
+        elif isinstance(exc, FileNotFoundError):
+            result.missing.append(title)
+        else:
+            result.failed.append(_failure(title, exc))
+
+    update_search_statuses((title, previous[title]) for title in result.done)
+    return result
+
+
+def bulk_delete(titles: Iterable[str]) -> BulkResult:
+    """
+    Delete many notes, updating the derived indexes once.
+    """
+    from .history import record_versions
+    from .search import remove_search_entries
+
+    titles = list(titles)
+    # The deleted texts stay in the history (see `notes revert`)
+    record_versions(titles, "untracked")
+    errors = get_backend().delete_many(titles)
+    result = BulkResult("Deleted", [], [], [], [])
+    for title in titles:
+        exc = errors.get(title)
+        if exc is None:
+            result.done.append(title)
+        elif isinstance(exc, FileNotFoundError):
+            result.missing.append(title)
+        else:
+            result.failed.append(_failure(title, exc))
+
+    remove_search_entries(result.done)
+    record_versions(result.done, "delete")
+    return result
+
+
+def bulk_export(
+    titles: Iterable[str],
+    pdf: bool,
+    html: bool,
+    jobs: int = 1,
+    force: bool = False,
+) -> BulkResult:
+    """
+    Export many notes, skipping those whose exports are up to date.
+
+    See `exporters.export_notes` for `jobs` and `force`.
+    """
+    from ..exporters import export_notes
+
+    backend = get_backend()
+    result = BulkResult("Exported", [], [], [], [])
+    records = []
+    for title in titles:
+        record = backend.record(title)
+        if record is None:
+            result.missing.append(title)
+        else:
+            records.append(record)
+
+    for export in export_notes(records, pdf, html, jobs, force):
+        if export.error:
+            result.failed.append((export.title, export.error))
+        elif export.outputs:
+            result.done.append(export.title)
+        else:
+            result.unchanged.append(export.title)
+    return result
+
+
+# ----------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------
+def print_report(result: BulkResult) -> None:
+    """
+    Summarize a bulk operation on the console, listing what went wrong.
+    """
+    total = len(result.done) + len(result.unchanged) + len(result.missing) + len(result.failed)
+    console.print(
+        f"[bold]{result.action} {len(result.done)} of {total} notes[/bold]"
+        + (f", {len(result.unchanged)} unchanged" if result.unchanged else "")
+        + (f", [yellow]{len(result.missing)} not found[/yellow]" if result.missing else "")
+        + (f", [red]{len(result.failed)} failed[/red]" if result.failed else "")
+    )
+    for title in result.missing:
+        console.print(f"[yellow]Not found:[/yellow] {title}")
+    for title, error in result.failed:
+        console.print(f"[red]Error:[/red] {title}: {error}")
@@ -0,0 +1,297 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .backends import NoteRecord, StorageBackend, get_backend
+
+# Titles are stored as UTF-8; surrogates (from undecodable filenames)
+# round-trip, and byte order equals the code point order of str
+_ENCODING = "utf-8"
+_ERRORS = "surrogatepass"
+
+# Bytes of a SHA-256 digest (NoteRecord.hash is its hex form)
+_HASH_BYTES = 32
+
+
+# ----------------------------------------------------------------------
+# One note of a catalog
+# ----------------------------------------------------------------------
+class CatalogEntry:
+    """
+    View of one row of a `Catalog`.
+
+    Entries are created on access and hold nothing but their position,
+    so iterating a catalog allocates one small object at a time. The
+    note's text is only read by `read()`.
+    """
+
+    __slots__ = ("_catalog", "_row")
+
+    def __init__(self, catalog: "Catalog", row: int):
+        self._catalog = catalog
+        self._row = row
+
+    @property
+    def title(self) -> str:
+        return self._catalog._title(self._row)
+
+    @property
+    def status(self) -> str:
+        catalog = self._catalog
+        return catalog._statuses[catalog._status_codes[self._row]]
+
+    @property
+    def mtime(self) -> float:
+        return self._catalog._mtimes[self._row]
+
+    @property
+    def size(self) -> int:
+        return self._catalog._sizes[self._row]
+
+    @property
+    def hash(self) -> str:
+        start = self._row * _HASH_BYTES
+        return self._catalog._hashes[start:start + _HASH_BYTES].hex()
+
+    def read(self) -> str:
+        """
+        Load the note's full text from the storage backend.
+        """
+        return self._catalog.backend.read(self.title)
+
+    def record(self) -> NoteRecord:
+        return NoteRecord(self.title, self.status, self.mtime, self.size, self.hash)
+
+    def __repr__(self) -> str:
+        return f"CatalogEntry(title={self.title!r}, status={self.status!r})"
+
+
+# ----------------------------------------------------------------------
+# Metadata of every note, column by column
+# ----------------------------------------------------------------------
+class Catalog:
+    """
+    Read-only metadata of every note, stored in compact columns.
+
+    Titles are one UTF-8 buffer with offsets, statuses are one-byte
+    codes, modification times and sizes are typed arrays, and content
+    hashes are packed binary digests: about 60 bytes plus the title's
+    length per note, instead of several hundred for a list of
+    NoteRecord tuples. Rows are sorted by title; looking a title up is
+    a binary search. Note bodies are never loaded, except through
+    `CatalogEntry.read()` and `Catalog.read()`.
+
+    A catalog is a snapshot: it does not follow later changes to the
+    notes. Load a new one to see them.
+
+    Parameters
+    ----------
+    records : iterable of NoteRecord
+        Metadata to store, preferably sorted by title (as
+        `StorageBackend.iter_records()` yields it). It is consumed
+        one record at a time.
+    backend : StorageBackend or None
+        Where `read()` loads note bodies from (default: the configured
+        backend)
+
+    Examples
+    --------
+    >>> catalog = Catalog.load()
+    >>> for entry in catalog.select(status="open"):
+    ...     print(entry.title, entry.size)
+    >>> catalog.get("Shopping list").read()
+    """
+
+    __slots__ = (
+        "backend",
+        "_titles",
+        "_offsets",
+        "_statuses",
+        "_status_codes",
+        "_mtimes",
+        "_sizes",
+        "_hashes",
+    )
+
+    def __init__(self, records: Iterable[NoteRecord], backend: Optional[StorageBackend] = None):
+        self.backend = backend if backend is not None else get_backend()
+
+        titles = bytearray()
+        offsets = array("I", [0])
+        codes: Dict[str, int] = {}
+        status_codes = array("B")
+        mtimes = array("d")
+        sizes = array("q")
+        hashes = bytearray()
+        in_order = True
+        previous = b""
+
+        for record in records:
+            title = record.title.encode(_ENCODING, _ERRORS)
+            if title < previous:
+                in_order = False
+            previous = title
+            titles += title
+            offsets.append(len(titles))
+            code = codes.get(record.status)
+            if code is None:
+                code = codes[record.status] = len(codes)
+            status_codes.append(code)
+            mtimes.append(record.mtime)
+            sizes.append(record.size)
+            digest = bytes.fromhex(record.hash)
+            if len(digest) != _HASH_BYTES:
+                raise ValueError(f"Note {record.title!r} has no SHA-256 hash: {record.hash!r}")
+            hashes += digest
+
+        self._titles = bytes(titles)
+        self._offsets = offsets
+        self._statuses: List[str] = list(codes)
+        self._status_codes = status_codes
+        self._mtimes = mtimes
+        self._sizes = sizes
+        self._hashes = bytes(hashes)
+        if not in_order:
+            self._sort()
+
+    @classmethod
+    def load(cls, backend: Optional[StorageBackend] = None) -> "Catalog":
+        """
+        Build a catalog of every stored note.
+
+        Metadata is streamed from the backend, and the backend's own
+        metadata cache is released afterwards, so the catalog is the
+        only copy kept in memory.
+        """
+        backend = backend if backend is not None else get_backend()
+        catalog = cls(backend.iter_records(), backend)
+        backend.drop_caches()
+        return catalog
+
+    def _sort(self) -> None:
+        # Rebuild every column in title order
+        order = sorted(range(len(self)), key=self._title_bytes)
+        titles = bytearray()
+        offsets = array("I", [0])
+        for row in order:
+            titles += self._title_bytes(row)
+            offsets.append(len(titles))
+        self._titles = bytes(titles)
+        self._offsets = offsets
+        self._status_codes = array("B", (self._status_codes[row] for row in order))
+        self._mtimes = array("d", (self._mtimes[row] for row in order))
+        self._sizes = array("q", (self._sizes[row] for row in order))
+        self._hashes = b"".join(
+            self._hashes[row * _HASH_BYTES:(row + 1) * _HASH_BYTES] for row in order
+        )
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+    def _title_bytes(self, row: int) -> bytes:
+        return self._titles[self._offsets[row]:self._offsets[row + 1]]
+
+    def _title(self, row: int) -> str:
+        return self._title_bytes(row).decode(_ENCODING, _ERRORS)
+
+    def _find(self, title: str) -> Optional[int]:
+        key = title.encode(_ENCODING, _ERRORS)
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._title_bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._title_bytes(low) == key:
+            return low
+        return None
+
+    def __len__(self) -> int:
+        return len(self._status_codes)
+
+    def __getitem__(self, row: int) -> CatalogEntry:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("catalog index out of range")
+        return CatalogEntry(self, row)
+
+    def __iter__(self) -> Iterator[CatalogEntry]:
+        for row in range(len(self)):
+            yield CatalogEntry(self, row)
+
+    def __contains__(self, title: object) -> bool:
+        return isinstance(title, str) and self._find(title) is not None
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def get(self, title: str) -> Optional[CatalogEntry]:
+        """
+        The entry of a note, or None if the catalog has no such title.
+        """
+        row = self._find(title)
+        return None if row is None else CatalogEntry(self, row)
+
+    def read(self, title: str) -> str:
+        """
+        Load a note's full text (raises FileNotFoundError).
+        """
+        return self.backend.read(title)
+
+    def titles(self) -> Iterator[str]:
+        for row in range(len(self)):
+            yield self._title(row)
+
+    def select(
+        self,
+        status: Optional[str] = None,
+        modified_since: Optional[float] = None,
+    ) -> Iterator[CatalogEntry]:
+        """
+        Entries matching every given filter, in title order.
+
+        Filters are evaluated on the columns, so rows that do not
+        match cost no object at all.
+        """
+        rows: Iterable[int] = range(len(self))
+        if status is not None:
+            if status not in self._statuses:
+                return
+            code = self._statuses.index(status)
+            codes = self._status_codes
+            rows = (row for row in rows if codes[row] == code)
+        if modified_since is not None:
+            mtimes = self._mtimes
+            rows = (row for row in rows if mtimes[row] >= modified_since)
+        for row in rows:
+            yield CatalogEntry(self, row)
+
+    def count_by_status(self) -> Dict[str, int]:
+        counts = [0] * len(self._statuses)
+        for code in self._status_codes:
+            counts[code] += 1
+        return dict(zip(self._statuses, counts))
+
+    def total_size(self) -> int:
+        """
+        Sum of the sizes of all notes, in bytes.
+        """
+        return sum(self._sizes)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the columns, in bytes.
+        """
+        return (
+            len(self._titles)
+            + self._offsets.itemsize * len(self._offsets)
+            + self._status_codes.itemsize * len(self._status_codes)
+            + self._mtimes.itemsize * len(self._mtimes)
+            + self._sizes.itemsize * len(self._sizes)
+            + len(self._hashes)
+        )
+
+    def __repr__(self) -> str:
+        return f"<Catalog of {len(self)} notes, {self.nbytes / (1 << 20):.1f} MiB>"
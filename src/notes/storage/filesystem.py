@@ -1,15 +1,35 @@
 import datetime
+import itertools
 from pathlib import Path
-from typing import List
+from typing import Optional
 
-from rich.console import Console
-from rich.table import Table
+from ..config import DEFAULT_STATUS, STATUS_COMMENT_TEMPLATE
+from ..utils import profiling
+from ..utils.console import console
+from .backends import ConflictError, FilesystemBackend, NoteRecord, get_backend, make_backend
 
-from ..config import NOTES_DIR, DOWNLOADS_DIR, DEFAULT_STATUS, STATUS_COMMENT_TEMPLATE
-from ..models.note import Note
 
-# Console instance for styled terminal output
-console = Console()
+# ----------------------------------------------------------------------
+# Keeping derived data (search index) current
+# ----------------------------------------------------------------------
+def _note_changed(title: str) -> None:
+    from .search import update_search_entry
+    update_search_entry(title)
+
+
+def _status_changed(title: str, previous_hash: Optional[str]) -> None:
+    from .search import update_search_status
+    update_search_status(title, previous_hash)
+
+
+def _note_removed(title: str) -> None:
+    from .search import remove_search_entry
+    remove_search_entry(title)
+
+
+def _record_version(title: str, event: str) -> None:
+    from .history import record_versions
+    record_versions([title], event)
 
 
 # ----------------------------------------------------------------------
@@ -17,10 +37,34 @@ console = Console()
 # ----------------------------------------------------------------------
 def get_note_path(title: str) -> Path:
     """
-    Compute the filesystem path for a note based on its title.
-    Spaces are replaced with underscores and `.md` is appended.
+    Compute the filesystem path for a note based on its title
+    (used by the "filesystem" storage backend).
+    Spaces are replaced with underscores, characters that would make
+    titles collide are escaped, and `.md` is appended.
     """
-    return NOTES_DIR / f"{title}.md".replace(" ", "_")
+    return FilesystemBackend().path_for(title)
+
+
+def find_note(backend, title: str) -> Optional[str]:
+    """
+    The stored title a title given by the user refers to: itself, or an
+    equivalent Unicode spelling of it. Otherwise report that there is
+    no such note, suggesting similar titles, and return None.
+    """
+    if backend.exists(title):
+        return title
+
+    from .titles import TitleRegistry
+
+    registry = TitleRegistry.load(backend)
+    stored = registry.resolve(title)
+    if stored is not None:
+        return stored
+    console.print(f"[red]Error:[/red] Note '{title}' not found.")
+    similar = registry.fuzzy(title, limit=3)
+    if similar:
+        console.print("Did you mean: " + ", ".join(f"'{t}'" for t in similar) + "?")
+    return None
 
 
 # ----------------------------------------------------------------------
@@ -34,22 +78,24 @@ def create_note(title: str) -> None:
       and a Markdown level-1 heading.
     - Opens the note immediately in the configured editor.
     """
-    note_path = get_note_path(title)
+    backend = get_backend()
 
-    if note_path.exists():
+    # Initialize the new note with status + heading (checked and written
+    # under the note's lock, so two processes cannot both create it)
+    try:
+        backend.create(title, f"{STATUS_COMMENT_TEMPLATE.format(DEFAULT_STATUS)}# {title}\n\n")
+    except FileExistsError:
         console.print(f"[red]Error:[/red] Note '{title}' already exists.")
         return
-
-    # Initialize the new note with status + heading
-    note_path.write_text(
-        f"{STATUS_COMMENT_TEMPLATE.format(DEFAULT_STATUS)}# {title}\n\n",
-        encoding="utf-8",
-    )
+    except ValueError as exc:
+        console.print(f"[red]Error:[/red] {exc}.")
+        return
     console.print(f"[green]Created note:[/green] {title}")
+    _record_version(title, "create")
 
-    # Open in the editor (lazy import avoids circular dependency)
-    from ..utils.editor import launch_editor
-    launch_editor(note_path)
+    # Open in the editor, then pick up whatever the user wrote
+    _edit(backend, title)
+    _note_changed(title)
 
 
 # ----------------------------------------------------------------------
@@ -59,14 +105,29 @@ def edit_note(title: str) -> None:
     """
     Open an existing note in the user’s editor.
     """
-    note_path = get_note_path(title)
+    backend = get_backend()
 
-    if not note_path.exists():
-        console.print(f"[red]Error:[/red] Note '{title}' not found.")
+    title = find_note(backend, title)
+    if title is None:
         return
 
+    _edit(backend, title)
+    _note_changed(title)
+
+
+def _edit(backend, title: str) -> None:
+    """
+    Run the editor on a note, reporting an edit that could not be stored.
+    """
+    # Lazy import avoids circular dependency
     from ..utils.editor import launch_editor
-    launch_editor(note_path)
+    _record_version(title, "untracked")
+    try:
+        with backend.editable(title) as note_path, profiling.span("editor"):
+            launch_editor(note_path)
+    except ConflictError as exc:
+        console.print(f"[red]Error:[/red] {exc}")
+    _record_version(title, "edit")
 
 
 # ----------------------------------------------------------------------
@@ -76,55 +137,197 @@ def delete_note(title: str) -> None:
     """
     Delete a note permanently.
     """
-    note_path = get_note_path(title)
+    backend = get_backend()
 
-    if not note_path.exists():
-        console.print(f"[red]Error:[/red] Note '{title}' not found.")
+    title = find_note(backend, title)
+    if title is None:
         return
 
-    note_path.unlink()
+    # The deleted text stays in the history (see `notes revert`)
+    _record_version(title, "untracked")
+    backend.delete(title)
+    _note_removed(title)
+    _record_version(title, "delete")
     console.print(f"[green]Deleted:[/green] {title}")
 
 
 # ----------------------------------------------------------------------
 # Listing notes
 # ----------------------------------------------------------------------
-def list_notes() -> None:
+def list_notes(
+    status: Optional[str] = None,
+    modified_since: Optional[float] = None,
+    sort: str = "title",
+    limit: Optional[int] = None,
+    offset: int = 0,
+    fmt: str = "table",
+) -> None:
     """
-    Display all notes in a formatted table, showing:
+    Display notes, showing:
     - Title
     - Current status
     - Last modification time
+
+    Metadata comes from the storage backend's index, so note bodies
+    are not read. Rows are written as they are produced, so the first
+    ones appear at once and `| head` stops the work early.
+
+    Parameters
+    ----------
+    status, modified_since, sort, limit, offset
+        Filtering, ordering and paging, see `StorageBackend.query`
+    fmt : str
+        "table" (Rich table), "json" (array of objects) or "tsv"
+        (title, status, ISO modification time; no header)
     """
-    md_files: List[Path] = sorted(
-        p for p in NOTES_DIR.iterdir() if p.suffix == ".md"
-    )
+    with profiling.span("query"):
+        records = get_backend().query(status, modified_since, sort, limit, offset)
+
+    with profiling.span("output", format=fmt):
+        if fmt == "json":
+            _write_rows(records, _json_row, "[\n", "\n]\n", ",\n")
+        elif fmt == "tsv":
+            _write_rows(records, _tsv_row, "", "", "")
+        else:
+            _print_table(records)
+
+
+# Rows formatted and written per batch (machine-readable formats) or per
+# rendered table (the Rich table, which needs column widths up front)
+_ROW_BATCH = 512
+_TABLE_PAGE = 256
+
+
+def _modified(record: NoteRecord, fmt: str = "%Y-%m-%d %H:%M") -> str:
+    return datetime.datetime.fromtimestamp(record.mtime).strftime(fmt)
 
-    if not md_files:
+
+def _json_row(record: NoteRecord) -> str:
+    import json
+    return json.dumps({
+        "title": record.title,
+        "status": record.status,
+        "modified": _modified(record, "%Y-%m-%dT%H:%M:%S"),
+        "size": record.size,
+    }, ensure_ascii=False)
+
+
+def _tsv_row(record: NoteRecord) -> str:
+    # Titles never contain tabs or newlines in a valid row
+    title = record.title.replace("\t", " ").replace("\n", " ")
+    return f"{title}\t{record.status}\t{_modified(record, '%Y-%m-%dT%H:%M:%S')}\n"
+
+
+def _write_rows(records, format_row, head: str, tail: str, separator: str) -> None:
+    """
+    Write plain-text rows in batches, bypassing Rich markup and wrapping.
+    """
+    out = console.file
+    out.write(head)
+    batch = []
+    first = True
+    rows = 0
+    for record in records:
+        if separator and not first:
+            batch.append(separator)
+        batch.append(format_row(record))
+        first = False
+        rows += 1
+        if len(batch) >= _ROW_BATCH:
+            out.write("".join(batch))
+            batch = []
+    out.write("".join(batch) + tail)
+    out.flush()
+    profiling.count("rows", rows)
+
+
+def _print_table(records) -> None:
+    """
+    Print a Rich table page by page.
+
+    Small listings are one table, exactly as before. Longer ones are
+    printed as consecutive tables without outer edges and with fixed
+    column widths, which line up as one continuous table.
+    """
+    from rich.table import Table
+
+    def page_table(rows, first: bool, fixed: bool) -> "Table":
+        table = Table(
+            title="Your Notes" if first else None,
+            show_header=first,
+            show_edge=not fixed,
+        )
+        title_width = max(10, console.width - 38) if fixed else None
+        table.add_column("Title", style="cyan", width=title_width)
+        table.add_column("Status", style="magenta", width=11 if fixed else None)
+        table.add_column("Last Modified", style="green", width=16 if fixed else None)
+        for record in rows:
+            table.add_row(record.title, record.status, _modified(record))
+        return table
+
+    records = iter(records)
+    page = list(itertools.islice(records, _TABLE_PAGE + 1))
+    if not page:
         console.print("[yellow]No notes found.[/yellow]")
         return
+    if len(page) <= _TABLE_PAGE:
+        console.print(page_table(page, first=True, fixed=False))
+        return
+
+    first = True
+    while page:
+        console.print(page_table(page, first=first, fixed=True))
+        first = False
+        page = list(itertools.islice(records, _TABLE_PAGE))
+
+
+# ----------------------------------------------------------------------
+# Searching notes
+# ----------------------------------------------------------------------
+def search_notes(query: str, status: Optional[str] = None, limit: int = 20) -> None:
+    """
+    Display the notes matching a full-text query, best match first.
+    """
+    from .search import search
+    hits = search(query, status=status, limit=limit)
+
+    if not hits:
+        console.print("[yellow]No matching notes.[/yellow]")
+        return
 
-    # Create a Rich table for pretty display
-    table = Table(title="Your Notes")
-    table.add_column("Title", style="cyan")
-    table.add_column("Status", style="magenta")
-    table.add_column("Last Modified", style="green")
+    with profiling.span("output"):
+        from rich.table import Table
+        table = Table(title=f"Search results for {query!r}")
+        table.add_column("Title", style="cyan")
+        table.add_column("Status", style="magenta")
+        table.add_column("Score", style="green", justify="right")
 
-    for path in md_files:
-        # Load note metadata (status etc.)
-        note = Note(title=path.stem.replace("_", " "))
-        note.path = path
-        note.load()
+        for hit in hits:
+            table.add_row(hit.title, hit.status, f"{hit.score:.2f}")
 
-        # Format last modified timestamp
-        mtime = datetime.datetime.fromtimestamp(
-            path.stat().st_mtime
-        ).strftime("%Y-%m-%d %H:%M")
+        console.print(table)
 
-        # Add a row with note details
-        table.add_row(note.title, note.status, mtime)
 
-    console.print(table)
+# ----------------------------------------------------------------------
+# Title completion
+# ----------------------------------------------------------------------
+def complete_titles(text: str, fuzzy: bool = False, limit: Optional[int] = None) -> None:
+    """
+    Print the titles starting with `text` (ignoring case), or with
+    `fuzzy` those containing its characters in order, best first.
+
+    One title per line and nothing else, for shell completion scripts.
+    """
+    import sys
+    from .titles import TitleRegistry
+
+    registry = TitleRegistry.load()
+    if fuzzy:
+        titles = registry.fuzzy(text, limit=20 if limit is None else limit)
+    else:
+        titles = registry.complete(text, limit)
+    sys.stdout.write("".join(f"{title}\n" for title in titles))
+    sys.stdout.flush()
 
 
 # ----------------------------------------------------------------------
@@ -134,17 +337,87 @@ def set_status(title: str, new_status: str) -> None:
     """
     Change the status of a given note (e.g., open → in progress).
     """
-    note_path = get_note_path(title)
+    backend = get_backend()
 
-    if not note_path.exists():
+    title = find_note(backend, title)
+    if title is None:
+        return
+    before = backend.record(title)
+    if before is None:
+        # Deleted in the meantime
         console.print(f"[red]Error:[/red] Note '{title}' not found.")
         return
 
-    # Load the note, update its status, and save
-    note = Note(title)
-    note.path = note_path
-    note.load()
-    note.set_status(new_status)
-    note.save()
+    # Rewrite the status comment and save
+    from .history import recording_status_change
+    try:
+        with recording_status_change([title]):
+            backend.set_status(title, new_status)
+    except ConflictError as exc:
+        console.print(f"[red]Error:[/red] {exc}")
+        return
+    _status_changed(title, before.hash)
 
     console.print(f"[green]Updated status:[/green] {title} → {new_status}")
+
+
+# ----------------------------------------------------------------------
+# Switching storage backends
+# ----------------------------------------------------------------------
+def migrate_notes(target: str) -> None:
+    """
+    Copy every note from the configured backend into another one.
+
+    - Modification times are preserved.
+    - The source is left untouched; set NOTES_BACKEND to start using
+      the target.
+    """
+    source = get_backend()
+    if target == source.name:
+        console.print(f"[yellow]Notes are already stored in the {target} backend.[/yellow]")
+        return
+
+    destination = make_backend(target)
+    records = source.records()
+    with profiling.span("migrate.copy", target=target):
+        for record in records:
+            destination.write(record.title, source.read(record.title), mtime=record.mtime)
+
+    console.print(
+        f"[green]Migrated:[/green] {len(records)} notes from {source.name} to {target}"
+    )
+    console.print(f"Set [bold]NOTES_BACKEND={target}[/bold] to use the migrated notes.")
+
+
+def migrate_layout(target: str) -> None:
+    """
+    Move the note files into the flat or the sharded directory layout.
+
+    Notes stay usable while they are moved (see
+    `storage.layout.convert_layout`); an interrupted run is completed
+    by running it again.
+    """
+    from .titles import title_from_filename
+    from .layout import convert_layout
+
+    backend = get_backend()
+    if not isinstance(backend, FilesystemBackend):
+        console.print(
+            f"[red]Error:[/red] The {backend.name} backend does not store notes as files."
+        )
+        return
+    layout = backend.layout
+    if layout.name == target and layout.migrating_from is None:
+        console.print(f"[yellow]Notes are already in the {target} layout.[/yellow]")
+        return
+
+    from ..daemon.client import daemon_running
+    if daemon_running():
+        # It would keep resolving paths in the old layout
+        console.print("[red]Error:[/red] Stop the daemon first (notes daemon --stop).")
+        return
+
+    moved = convert_layout(
+        target, lambda name: backend.lock(title_from_filename(name)), backend.notes_dir
+    )
+    console.print(f"[green]Migrated:[/green] {moved} notes to the {target} layout")
@@ -0,0 +1,675 @@
+import hashlib
+import json
+import sqlite3
+from contextlib import contextmanager
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from ..config import (
+    HISTORY_DB_PATH,
+    HISTORY_DELTAS,
+    HISTORY_DIFF_LINES,
+    KEEP_HISTORY,
+    STATUS_HEADER_BYTES,
+)
+from ..utils import profiling
+from ..utils.console import console
+from ..utils.hashing import content_hash
+from .backends import get_backend
+
+# ----------------------------------------------------------------------
+# Version history
+# ----------------------------------------------------------------------
+# Every distinct text is one row of `objects`, keyed by its content
+# hash, so a version saved twice (or by two notes) is stored once. Its
+# data is zlib-compressed: the full text (`base` is NULL) or the lines
+# changed from the blob `base`, an earlier version of the same note.
+#
+# Version i of a note (counting from 0) is a delta against version
+# i & (i - 1), i.e. i with its lowest set bit cleared ("skip deltas"):
+# no version is more than log2(i) deltas away from the full copy of
+# version 0, and storage grows with the size of the changes (times that
+# logarithm), not with the size of the note times the number of saves.
+#
+# A status change rewrites only the first line of a note. It is stored as
+# that line plus "the rest of the previous version", after comparing the
+# hashes of the rest before and after the change: the note is streamed
+# through the hash, never read into memory or diffed.
+
+# Bump when the schema changes. The history cannot be rebuilt, so older
+# databases must be migrated, never dropped.
+_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    base TEXT,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    title  TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    time   REAL NOT NULL,
+    event  TEXT NOT NULL,
+    hash   TEXT,
+    size   INTEGER NOT NULL,
+    PRIMARY KEY (title, number)
+) WITHOUT ROWID;
+"""
+
+
+class Version(NamedTuple):
+    """
+    One entry of a note's history; `hash` is None for a deletion.
+    """
+
+    number: int
+    time: float
+    event: str
+    hash: Optional[str]
+    size: int
+
+
+# ----------------------------------------------------------------------
+# Database helpers
+# ----------------------------------------------------------------------
+def _connect() -> sqlite3.Connection:
+    # Waits for other `notes` processes recording versions at the same time
+    conn = sqlite3.connect(str(HISTORY_DB_PATH), timeout=30)
+    # Committed versions survive a crash of the program; a power loss
+    # may lose the newest ones, never corrupt older ones
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    return conn
+
+
+@contextmanager
+def _database() -> Iterator[sqlite3.Connection]:
+    """
+    A connection for one operation, closed at the end (the last one to
+    close folds the write-ahead log back into the database).
+    """
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+# ----------------------------------------------------------------------
+# Blobs
+# ----------------------------------------------------------------------
+def _store_blob(
+    conn: sqlite3.Connection, data: bytes, digest: str, base: Optional[str]
+) -> None:
+    """
+    Store a version's text unless a blob of it exists already, as a
+    delta against the blob `base` when that is smaller than a full copy.
+    """
+    if conn.execute("SELECT 1 FROM objects WHERE hash = ?", (digest,)).fetchone():
+        profiling.count("history_deduplicated")
+        return
+
+    stored, stored_base = zlib.compress(data), None
+    if base is not None:
+        try:
+            base_text = _load_blob(conn, base)
+        except (LookupError, ValueError, zlib.error):
+            # A damaged base is never built upon
+            base_text = None
+        if base_text is not None:
+            ops = _delta(base_text.decode("utf-8"), data.decode("utf-8"))
+            delta = zlib.compress(json.dumps(ops, ensure_ascii=False).encode("utf-8"))
+            if len(delta) < len(stored):
+                stored, stored_base = delta, base
+
+    conn.execute(
+        "INSERT OR IGNORE INTO objects (hash, base, data) VALUES (?, ?, ?)",
+        (digest, stored_base, stored),
+    )
+    profiling.count("history_bytes_written", len(stored))
+
+
+def load_blob(digest: str) -> bytes:
+    """
+    The text stored under a content hash, rebuilt from its deltas.
+
+    Raises LookupError if it was never stored and ValueError if the
+    result does not match the hash.
+    """
+    with _database() as conn:
+        return _load_blob(conn, digest)
+
+
+def _load_blob(conn: sqlite3.Connection, digest: str) -> bytes:
+    # Follow the chain down to the full copy, then apply the deltas
+    chain = []
+    seen = set()
+    current: Optional[str] = digest
+    while current is not None:
+        if current in seen:
+            raise ValueError(f"History blob {digest[:12]} has a broken delta chain")
+        seen.add(current)
+        row = conn.execute("SELECT base, data FROM objects WHERE hash = ?", (current,)).fetchone()
+        if row is None:
+            raise LookupError(f"History blob {current[:12]} is missing")
+        current, payload = row
+        chain.append(zlib.decompress(payload))
+
+    text = chain.pop().decode("utf-8")
+    for delta in reversed(chain):
+        text = _apply_delta(text, json.loads(delta))
+    data = text.encode("utf-8")
+    if content_hash(data) != digest:
+        raise ValueError(f"History blob {digest[:12]} is damaged")
+    return data
+
+
+def _delta(base: str, text: str) -> list:
+    """
+    `text` as line ranges [start, end] copied from `base` and strings
+    inserted between them.
+
+    Lines shared at the start and the end are found in one pass. The
+    region between them is diffed with difflib when it is shorter than
+    HISTORY_DIFF_LINES, and matched in linear time otherwise (see
+    `_anchored_delta`), so a large note never makes a save quadratic.
+    """
+    from difflib import SequenceMatcher
+
+    old = base.splitlines(keepends=True)
+    new = text.splitlines(keepends=True)
+    ops: list = []
+    with profiling.span("history.delta"):
+        limit = min(len(old), len(new))
+        prefix = 0
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+            suffix += 1
+        old_middle = old[prefix:len(old) - suffix]
+        new_middle = new[prefix:len(new) - suffix]
+
+        if prefix:
+            ops.append([0, prefix])
+        if len(old_middle) + len(new_middle) <= HISTORY_DIFF_LINES:
+            matcher = SequenceMatcher(None, old_middle, new_middle)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag == "equal":
+                    ops.append([prefix + i1, prefix + i2])
+                elif j2 > j1:
+                    ops.append("".join(new_middle[j1:j2]))
+        else:
+            profiling.count("history_anchored_deltas")
+            for op in _anchored_delta(old_middle, new_middle):
+                ops.append([prefix + op[0], prefix + op[1]] if isinstance(op, list) else op)
+        if suffix:
+            ops.append([len(old) - suffix, len(old)])
+    return ops
+
+
+def _anchored_delta(old: List[str], new: List[str]) -> list:
+    """
+    Delta of `new` against `old` in linear time: every line of `new`
+    that occurs exactly once in `old` anchors a run of equal lines
+    copied from there; other lines are inserted.
+    """
+    from collections import Counter
+
+    counts = Counter(old)
+    unique = {line: i for i, line in enumerate(old) if counts[line] == 1}
+    ops: list = []
+    inserted: List[str] = []
+    j = 0
+    while j < len(new):
+        i = unique.get(new[j])
+        if i is None:
+            inserted.append(new[j])
+            j += 1
+            continue
+        run = 1
+        while i + run < len(old) and j + run < len(new) and old[i + run] == new[j + run]:
+            run += 1
+        if inserted:
+            ops.append("".join(inserted))
+            inserted = []
+        ops.append([i, i + run])
+        j += run
+    if inserted:
+        ops.append("".join(inserted))
+    return ops
+
+
+def _apply_delta(base: str, ops: list) -> str:
+    # An open range [start, null] copies everything from `start` on
+    old = base.splitlines(keepends=True)
+    return "".join(
+        "".join(old[op[0]:op[1]]) if isinstance(op, list) else op for op in ops
+    )
+
+
+# ----------------------------------------------------------------------
+# Versions
+# ----------------------------------------------------------------------
+def versions(title: str) -> List[Version]:
+    """
+    Every recorded version of a note, oldest first (empty if none).
+    """
+    with _database() as conn:
+        return [
+            Version(*row)
+            for row in conn.execute(
+                "SELECT number, time, event, hash, size FROM versions "
+                "WHERE title = ? ORDER BY number",
+                (title,),
+            )
+        ]
+
+
+def _record(conn: sqlite3.Connection, title: str, event: str) -> Optional[str]:
+    backend = get_backend()
+    with profiling.span("history.record", title=title), backend.lock(title), conn:
+        # BEGIN IMMEDIATE: numbers versions without racing other processes
+        conn.execute("BEGIN IMMEDIATE")
+        number, last = conn.execute(
+            "SELECT number, hash FROM versions WHERE title = ? ORDER BY number DESC LIMIT 1",
+            (title,),
+        ).fetchone() or (0, None)
+
+        record = backend.record(title)
+        if record is None:
+            if last is not None:
+                _append(conn, title, number + 1, "delete", None, 0)
+            return None
+        if record.hash == last:
+            return None
+
+        data = backend.read(title).encode("utf-8")
+        digest = content_hash(data)
+        if digest == last:
+            return None
+        _store_blob(conn, data, digest, _delta_base(conn, title) if HISTORY_DELTAS else None)
+        _append(conn, title, number + 1, event, digest, len(data))
+        return digest
+
+
+def _append(
+    conn: sqlite3.Connection,
+    title: str,
+    number: int,
+    event: str,
+    digest: Optional[str],
+    size: int,
+) -> None:
+    conn.execute(
+        "INSERT INTO versions (title, number, time, event, hash, size) VALUES (?, ?, ?, ?, ?, ?)",
+        (title, number, time.time(), event, digest, size),
+    )
+
+
+def _delta_base(conn: sqlite3.Connection, title: str) -> Optional[str]:
+    """
+    Blob the next version of a note is stored as a delta against.
+    """
+    stored = [
+        digest
+        for (digest,) in conn.execute(
+            "SELECT hash FROM versions WHERE title = ? AND hash IS NOT NULL ORDER BY number",
+            (title,),
+        )
+    ]
+    index = len(stored)
+    return stored[index & (index - 1)] if index else None
+
+
+# ----------------------------------------------------------------------
+# Recording versions
+# ----------------------------------------------------------------------
+# Failures recording one note's version, reported without stopping others
+_ERRORS = (OSError, ValueError, sqlite3.Error)
+
+
+def _warn(title: str, exc: Exception) -> None:
+    console.print(f"[yellow]Warning:[/yellow] No history kept for '{title}': {exc}")
+
+
+def record_version(title: str, event: str) -> Optional[str]:
+    """
+    Add a note's current text to its history, unless it is already the
+    newest version; returns the hash recorded, if any.
+
+    Called after every change made through `notes` with the event that
+    made it ("create", "edit", "status", "revert", "restore"), and with
+    "untracked" right before one, so a version written by another
+    program, or from before history was kept, is not lost. A note that
+    no longer exists is recorded as deleted. Set NOTES_NO_HISTORY=1 to
+    record nothing.
+    """
+    if not KEEP_HISTORY:
+        return None
+    with _database() as conn:
+        return _record(conn, title, event)
+
+
+def record_versions(titles: Iterable[str], event: str) -> None:
+    """
+    `record_version` for many notes, over one database connection; a
+    failure never stops the others (nor the operation that changed them).
+    """
+    if not KEEP_HISTORY:
+        return
+    with _database() as conn:
+        for title in titles:
+            try:
+                _record(conn, title, event)
+            except _ERRORS as exc:
+                _warn(title, exc)
+
+
+# ----------------------------------------------------------------------
+# Recording status changes
+# ----------------------------------------------------------------------
+class _Split(NamedTuple):
+    """
+    A note as its first line and hashes, taken without holding it in memory.
+    """
+
+    head: str
+    rest: str
+    hash: str
+    size: int
+
+
+def _split_note(title: str) -> Optional[_Split]:
+    """
+    Stream a note through the hashes of its whole text and of everything
+    after its first line (as `str.splitlines` splits it).
+
+    None if the note is missing or its first line is not within the
+    first STATUS_HEADER_BYTES.
+    """
+    try:
+        fh = get_backend().open_note(title)
+    except FileNotFoundError:
+        return None
+    with fh, profiling.span("history.hash"):
+        start = fh.read(STATUS_HEADER_BYTES)
+        lines = start.decode("utf-8", errors="replace").splitlines(keepends=True)
+        # Only a line followed by more text is known to be complete
+        if len(lines) < 2:
+            return None
+        head = lines[0]
+        cut = len(head.encode("utf-8"))
+        if start[:cut] != head.encode("utf-8"):
+            return None
+        whole, rest = hashlib.sha256(start), hashlib.sha256(start[cut:])
+        size = len(start)
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            whole.update(chunk)
+            rest.update(chunk)
+            size += len(chunk)
+    return _Split(head, rest.hexdigest(), whole.hexdigest(), size)
+
+
+def _record_status(conn: sqlite3.Connection, title: str, before: Optional[_Split]) -> bool:
+    """
+    Record a status change as a new first line on the previous version.
+
+    False if that does not describe the change (the note changed
+    elsewhere too, or its history does not end with `before`); it
+    must then be recorded in full.
+    """
+    if before is None:
+        return False
+    backend = get_backend()
+    with profiling.span("history.record", title=title), backend.lock(title), conn:
+        conn.execute("BEGIN IMMEDIATE")
+        number, last = conn.execute(
+            "SELECT number, hash FROM versions WHERE title = ? ORDER BY number DESC LIMIT 1",
+            (title,),
+        ).fetchone() or (0, None)
+        if last is None or last != before.hash:
+            return False
+        after = _split_note(title)
+        if after is None or after.rest != before.rest:
+            return False
+        if after.hash == last:
+            return True
+
+        if conn.execute("SELECT 1 FROM objects WHERE hash = ?", (after.hash,)).fetchone():
+            profiling.count("history_deduplicated")
+        else:
+            ops = [after.head, [1, None]]
+            stored = zlib.compress(json.dumps(ops, ensure_ascii=False).encode("utf-8"))
+            conn.execute(
+                "INSERT INTO objects (hash, base, data) VALUES (?, ?, ?)",
+                (after.hash, last, stored),
+            )
+            profiling.count("history_bytes_written", len(stored))
+        _append(conn, title, number + 1, "status", after.hash, after.size)
+        return True
+
+
+@contextmanager
+def recording_status_change(titles: Iterable[str]) -> Iterator[None]:
+    """
+    Record the versions around a status change of `titles`: the text
+    before it ("untracked", if not recorded yet) and after it ("status").
+
+    Large notes cost two streamed hashes each, not a full read and a
+    diff (see `_record_status`).
+
+    Examples
+    --------
+    >>> with recording_status_change([title]):
+    ...     backend.set_status(title, "done")
+    """
+    titles = list(titles)
+    if not KEEP_HISTORY:
+        yield
+        return
+
+    before: Dict[str, Optional[_Split]] = {}
+    with _database() as conn:
+        for title in titles:
+            try:
+                _record(conn, title, "untracked")
+                before[title] = _split_note(title)
+            except _ERRORS as exc:
+                _warn(title, exc)
+    yield
+    with _database() as conn:
+        for title in titles:
+            try:
+                if not _record_status(conn, title, before.get(title)):
+                    _record(conn, title, "status")
+            except _ERRORS as exc:
+                _warn(title, exc)
+
+
+# ----------------------------------------------------------------------
+# Commands
+# ----------------------------------------------------------------------
+def _known_title(title: str) -> Optional[str]:
+    """
+    The title whose history to use: a title with a history (also of a
+    deleted note) as given, or else the stored note it refers to.
+    """
+    with _database() as conn:
+        if conn.execute("SELECT 1 FROM versions WHERE title = ? LIMIT 1", (title,)).fetchone():
+            return title
+    from .filesystem import find_note
+
+    return find_note(get_backend(), title)
+
+
+def _find_version(history: List[Version], rev: str) -> Optional[Version]:
+    """
+    A version by number (as listed by `notes history`) or hash prefix.
+    """
+    if rev.isdigit():
+        number = int(rev)
+        return history[number - 1] if 1 <= number <= len(history) else None
+    matches = {v.hash for v in history if v.hash is not None and v.hash.startswith(rev.lower())}
+    if len(rev) < 4 or len(matches) != 1:
+        return None
+    digest = matches.pop()
+    # The newest version with this text
+    return next(v for v in reversed(history) if v.hash == digest)
+
+
+def _describe(version: Version) -> str:
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(version.time))
+    return f"version {version.number}, {when}"
+
+
+def show_history(title: str, limit: Optional[int] = None) -> None:
+    """
+    Print the versions of a note, newest first.
+    """
+    from rich.table import Table
+
+    title = _known_title(title)
+    if title is None:
+        return
+    history = versions(title)
+    if not history:
+        console.print(f"[yellow]No history recorded for '{title}'.[/yellow]")
+        return
+
+    record = get_backend().record(title)
+    current = record.hash if record is not None else None
+    table = Table(title=f"History of {title}")
+    table.add_column("#", justify="right")
+    table.add_column("Saved", style="green")
+    table.add_column("Event", style="magenta")
+    table.add_column("Size", justify="right")
+    table.add_column("Hash", style="cyan")
+    shown = history[::-1] if limit is None else history[:-limit - 1:-1]
+    for version in shown:
+        table.add_row(
+            str(version.number),
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(version.time)),
+            "deleted" if version.hash is None else version.event,
+            "" if version.hash is None else f"{version.size:,}",
+            "" if version.hash is None else version.hash[:12]
+            + (" (current)" if version.hash == current else ""),
+        )
+    console.print(table)
+
+
+def show_diff(title: str, old: Optional[str] = None, new: Optional[str] = None) -> None:
+    """
+    Print a unified diff between two versions of a note.
+
+    `new` defaults to the note as it is now, `old` to the newest version
+    that differs from it.
+    """
+    import difflib
+
+    title = _known_title(title)
+    if title is None:
+        return
+    history = versions(title)
+
+    texts = []
+    for rev in (old, new):
+        if rev is None:
+            texts.append(None)
+            continue
+        version = _find_version(history, rev)
+        if version is None or version.hash is None:
+            console.print(f"[red]Error:[/red] '{title}' has no version {rev} (see notes history).")
+            return
+        texts.append((_describe(version), version.hash))
+
+    backend = get_backend()
+    if texts[1] is None:
+        record = backend.record(title)
+        if record is None:
+            console.print(f"[red]Error:[/red] Note '{title}' was deleted; pass --to.")
+            return
+        texts[1] = ("current", record.hash)
+    if texts[0] is None:
+        earlier = [v for v in history if v.hash is not None and v.hash != texts[1][1]]
+        if not earlier:
+            console.print(f"[yellow]No earlier version of '{title}'.[/yellow]")
+            return
+        texts[0] = (_describe(earlier[-1]), earlier[-1].hash)
+
+    try:
+        contents = [
+            backend.read(title) if label == "current" else load_blob(digest).decode("utf-8")
+            for label, digest in texts
+        ]
+    except (LookupError, OSError, ValueError, sqlite3.Error, zlib.error) as exc:
+        console.print(f"[red]Error:[/red] Cannot read the history of '{title}': {exc}")
+        return
+
+    lines = list(difflib.unified_diff(
+        contents[0].splitlines(keepends=True),
+        contents[1].splitlines(keepends=True),
+        f"{title} ({texts[0][0]})",
+        f"{title} ({texts[1][0]})",
+    ))
+    if not lines:
+        console.print("[dim]No differences.[/dim]")
+    for line in lines:
+        line = line.rstrip("\r\n")
+        style = None
+        if line.startswith(("+++", "---")):
+            style = "bold"
+        elif line.startswith("+"):
+            style = "green"
+        elif line.startswith("-"):
+            style = "red"
+        elif line.startswith("@@"):
+            style = "cyan"
+        console.print(line, style=style, markup=False, highlight=False, soft_wrap=True)
+
+
+def revert_note(title: str, rev: str) -> None:
+    """
+    Make a recorded version the note's current text (also bringing
+    back a deleted note). The text replaced stays in the history.
+    """
+    from .backends import ConflictError
+    from .search import update_search_entry
+
+    title = _known_title(title)
+    if title is None:
+        return
+    version = _find_version(versions(title), rev)
+    if version is None or version.hash is None:
+        console.print(f"[red]Error:[/red] '{title}' has no version {rev} (see notes history).")
+        return
+    try:
+        data = load_blob(version.hash)
+    except (LookupError, OSError, ValueError, sqlite3.Error, zlib.error) as exc:
+        console.print(f"[red]Error:[/red] Cannot read {_describe(version)} of '{title}': {exc}")
+        return
+
+    backend = get_backend()
+    with backend.lock(title):
+        record_version(title, "untracked")
+        record = backend.record(title)
+        if record is not None and record.hash == version.hash:
+            console.print(f"[dim]'{title}' is already at {_describe(version)}.[/dim]")
+            return
+        try:
+            backend.write(
+                title,
+                data.decode("utf-8"),
+                expected_hash=record.hash if record is not None else None,
+            )
+        except ConflictError as exc:
+            console.print(f"[red]Error:[/red] {exc}")
+            return
+        record_version(title, "revert")
+    update_search_entry(title)
+    console.print(f"[green]Reverted:[/green] {title} → {_describe(version)}")
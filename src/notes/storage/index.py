@@ -0,0 +1,287 @@
+import json
+import os
+from pathlib import Path
+from typing import ContextManager, Dict, Iterable, Optional, Tuple
+
+from ..config import NOTES_DIR, INDEX_PATH, LOCK_DIR, STATUS_HEADER_BYTES
+from ..models.note import Note
+from ..utils import profiling
+from ..utils.atomic import atomic_write
+from ..utils.hashing import stream_hash
+from ..utils.locking import file_lock
+from .layout import NoteFiles, get_layout
+from .titles import title_from_filename
+
+# Bump whenever the on-disk layout of the index changes; older files are
+# discarded and rebuilt from the notes themselves.
+INDEX_VERSION = 1
+
+
+# ----------------------------------------------------------------------
+# Reading / writing the index file
+# ----------------------------------------------------------------------
+def _empty_index() -> dict:
+    return {"version": INDEX_VERSION, "dir_mtime_ns": None, "notes": {}}
+
+
+# Parsed index kept for long-running processes (the daemon), reused as long
+# as the file on disk is the one it was read from: (inode, mtime, size, index)
+_cached: Optional[Tuple[int, int, int, dict]] = None
+
+
+def _file_key(st: os.stat_result) -> Tuple[int, int, int]:
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def load_index() -> dict:
+    """
+    Load the metadata index from disk.
+
+    Returns an empty index if the file is missing, unreadable,
+    or was written by an incompatible version. The parsed index is
+    reused while the file is unchanged.
+    """
+    global _cached
+    try:
+        st = INDEX_PATH.stat()
+        if _cached is not None and _cached[:3] == _file_key(st):
+            profiling.count("index_cache_hits")
+            return _cached[3]
+        with profiling.span("index.load"):
+            profiling.count("bytes_read", st.st_size)
+            data = json.loads(INDEX_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return _empty_index()
+
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return _empty_index()
+    _cached = _file_key(st) + (data,)
+    return data
+
+
+def drop_index_cache() -> None:
+    """
+    Forget the parsed index; the next `load_index()` reads the file again.
+    """
+    global _cached
+    _cached = None
+
+
+def save_index(index: dict) -> None:
+    """
+    Write the index atomically (temp file + rename) so a crash never
+    leaves a half-written index behind.
+    """
+    global _cached
+    # Derived data: rebuilt from the notes if lost, so no fsync
+    with profiling.span("index.save"):
+        atomic_write(INDEX_PATH, json.dumps(index, ensure_ascii=False), fsync=False)
+    _cached = _file_key(INDEX_PATH.stat()) + (index,)
+
+
+def _index_lock() -> ContextManager[None]:
+    """
+    Serialize load-modify-save cycles of concurrent processes, which
+    would otherwise drop each other's entries.
+    """
+    return file_lock(LOCK_DIR / "index.lock")
+
+
+# ----------------------------------------------------------------------
+# Building individual entries
+# ----------------------------------------------------------------------
+def _read_entry(path: Path, st: os.stat_result) -> dict:
+    """
+    Read a note once and derive its metadata entry.
+
+    The status comes from the header alone; the rest of the file is
+    only streamed through the hash.
+    """
+    with open(path, "rb") as fh:
+        head = fh.read(STATUS_HEADER_BYTES)
+        digest = stream_hash(fh, head)
+    profiling.count("notes_read")
+    profiling.count("bytes_read", st.st_size)
+    return {
+        "title": title_from_filename(path.name),
+        "status": Note._extract_status(head.decode("utf-8", errors="replace")),
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "hash": digest,
+    }
+
+
+def _is_current(entry: Optional[dict], st: os.stat_result) -> bool:
+    """
+    An entry is trusted as long as the file's mtime and size are unchanged.
+    """
+    return (
+        entry is not None
+        and entry.get("mtime_ns") == st.st_mtime_ns
+        and entry.get("size") == st.st_size
+    )
+
+
+# ----------------------------------------------------------------------
+# Bringing the index up to date
+# ----------------------------------------------------------------------
+# Set while a watcher applies every change to the index as it happens
+# (see storage.watcher); refreshes then trust the index without stat()ing
+_watched = False
+
+
+def set_watched(watched: bool) -> None:
+    """
+    Declare whether a running watcher keeps the index current.
+    """
+    global _watched
+    _watched = watched
+
+
+def is_watched() -> bool:
+    """
+    True while a watcher keeps the derived data current.
+    """
+    return _watched
+
+
+def refresh_index(full: bool = False) -> Dict[str, dict]:
+    """
+    Return up-to-date metadata for every note, keyed by filename.
+
+    - If NOTES_DIR's mtime is unchanged, no note was added, removed or
+      renamed, so only the known files are stat()ed (not even that
+      while a watcher keeps the index current).
+    - Otherwise (or with `full=True`, or for a sharded notes directory,
+      whose mtime does not change with its notes) the directory is
+      rescanned with os.scandir().
+    - Only notes whose mtime or size changed are read again.
+    - The index is written back only if something changed.
+    """
+    with profiling.span("index.refresh"):
+        if _watched and not full:
+            index = load_index()
+            if index["dir_mtime_ns"] == NOTES_DIR.stat().st_mtime_ns:
+                return index["notes"]
+
+        with _index_lock():
+            return _refresh(full)
+
+
+def _refresh(full: bool) -> Dict[str, dict]:
+    layout = get_layout()
+    index = load_index()
+    old_notes: Dict[str, dict] = index["notes"]
+    dir_mtime_ns = NOTES_DIR.stat().st_mtime_ns
+    unchanged_dir = layout.flat and index["dir_mtime_ns"] == dir_mtime_ns and not full
+
+    # Collect the path and stat of every note currently on disk
+    files: NoteFiles = {}
+    if unchanged_dir:
+        with profiling.span("index.stat"):
+            for name in old_notes:
+                path = os.path.join(NOTES_DIR, name)
+                try:
+                    files[name] = (path, os.stat(path))
+                except FileNotFoundError:
+                    pass
+            profiling.count("files", len(old_notes))
+    else:
+        with profiling.span("index.scan"):
+            files = layout.scan()
+            profiling.count("files", len(files))
+
+    changed = index["dir_mtime_ns"] != dir_mtime_ns or len(files) != len(old_notes)
+    notes: Dict[str, dict] = {}
+    for name, (path, st) in files.items():
+        cached = old_notes.get(name)
+        if _is_current(cached, st):
+            notes[name] = cached
+            continue
+        try:
+            notes[name] = _read_entry(Path(path), st)
+        except FileNotFoundError:
+            # Deleted between the scan and the read
+            continue
+        changed = True
+
+    if changed:
+        index["notes"] = notes
+        index["dir_mtime_ns"] = dir_mtime_ns
+        save_index(index)
+
+    return notes
+
+
+# ----------------------------------------------------------------------
+# Incremental updates (called by create/delete/set_status)
+# ----------------------------------------------------------------------
+def update_index_entry(path: Path) -> None:
+    """
+    Re-read a single note and store its metadata in the index.
+
+    The recorded directory mtime is left untouched so the next
+    refresh still rescans for changes made outside this process.
+    """
+    update_index_entries([path])
+
+
+def apply_changes(changed: Iterable[Path], removed: Iterable[Path]) -> None:
+    """
+    Apply a batch of changes reported by the watcher.
+
+    The directory mtime is taken before the notes are read: anything
+    that changes afterwards moves it on, so a later refresh (or the
+    watcher's next batch) still picks it up.
+    """
+    with _index_lock():
+        index = load_index()
+        dir_mtime_ns = NOTES_DIR.stat().st_mtime_ns
+        for path in changed:
+            try:
+                index["notes"][path.name] = _read_entry(path, path.stat())
+            except FileNotFoundError:
+                index["notes"].pop(path.name, None)
+        for path in removed:
+            index["notes"].pop(path.name, None)
+        if index["dir_mtime_ns"] is not None:
+            index["dir_mtime_ns"] = dir_mtime_ns
+        save_index(index)
+
+
+def update_index_entries(paths: Iterable[Path]) -> None:
+    """
+    Re-read several notes with a single index load and save.
+    """
+    paths = list(paths)
+    if not paths:
+        return
+    with profiling.span("index.update"), _index_lock():
+        index = load_index()
+        for path in paths:
+            try:
+                index["notes"][path.name] = _read_entry(path, path.stat())
+            except FileNotFoundError:
+                index["notes"].pop(path.name, None)
+        save_index(index)
+
+
+def remove_index_entry(path: Path) -> None:
+    """
+    Drop a deleted note from the index.
+    """
+    remove_index_entries([path])
+
+
+def remove_index_entries(paths: Iterable[Path]) -> None:
+    """
+    Drop several deleted notes with a single index load and save.
+    """
+    paths = list(paths)
+    if not paths:
+        return
+    with _index_lock():
+        index = load_index()
+        removed = [index["notes"].pop(path.name, None) for path in paths]
+        if any(entry is not None for entry in removed):
+            save_index(index)
@@ -0,0 +1,322 @@
+import json
+import os
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, List, Optional, Set, Tuple
+
+from ..config import NOTES_DIR
+from ..utils import profiling
+from ..utils.atomic import atomic_write, fsync_dir
+from ..utils.hashing import content_hash
+
+# Every note file in one directory (the original layout), or spread over
+# two levels of hashed subdirectories: NOTES_DIR/3/f/My_Note.md. With 256
+# leaf directories, a million notes are ~4,000 files per directory, which
+# every filesystem lists quickly, while a scan opens few directories.
+FLAT = "flat"
+SHARDED = "sharded"
+LAYOUTS = (FLAT, SHARDED)
+
+# Records the layout of a notes directory; absent means flat. Hidden, so
+# scans, backups and the watcher never take it for a note.
+LAYOUT_FILE = ".layout"
+
+# Levels of shard directories, and the hex digits of the filename's
+# hash naming the directory at each level
+SHARD_LEVELS = 2
+_SHARD_WIDTH = 1
+
+# Threads listing the top-level shards of a sharded directory at once
+SCAN_THREADS = 8
+
+# (path, stat) of a note file, by filename
+NoteFiles = Dict[str, Tuple[str, os.stat_result]]
+
+
+def shard_of(name: str) -> str:
+    """
+    Relative directory of a note file in the sharded layout ("3/f").
+    """
+    digest = content_hash(os.fsencode(name))
+    return "/".join(
+        digest[level * _SHARD_WIDTH:(level + 1) * _SHARD_WIDTH] for level in range(SHARD_LEVELS)
+    )
+
+
+def is_shard_name(name: str) -> bool:
+    """
+    True if `name` can be a shard directory (hex digits of a hash).
+    """
+    return len(name) == _SHARD_WIDTH and all(c in "0123456789abcdef" for c in name)
+
+
+# ----------------------------------------------------------------------
+# Layout of one notes directory
+# ----------------------------------------------------------------------
+class NotesLayout:
+    """
+    Where the note files of a notes directory are.
+
+    Resolving a filename to its path is a computation (a hash for the
+    sharded layout), never a directory search. While `notes migrate
+    --layout` runs, `migrating_from` names the previous layout: notes
+    not moved yet are found at their old location, and scans cover
+    both.
+    """
+
+    def __init__(self, notes_dir: Path, name: str = FLAT, migrating_from: Optional[str] = None):
+        if name not in LAYOUTS:
+            raise ValueError(f"Unknown notes directory layout {name!r} in {notes_dir}")
+        self.notes_dir = notes_dir
+        self.name = name
+        self.migrating_from = migrating_from
+
+    @property
+    def flat(self) -> bool:
+        """
+        True if every note is directly in the notes directory, whose
+        mtime then changes whenever a note is added or removed.
+        """
+        return self.name == FLAT and self.migrating_from is None
+
+    @property
+    def sharded(self) -> bool:
+        return self.name == SHARDED
+
+    def location(self, name: str, layout: Optional[str] = None) -> Path:
+        """
+        Path of a note file in this (or the given) layout.
+        """
+        return Path(self._place(name, layout))
+
+    def _place(self, name: str, layout: Optional[str] = None) -> str:
+        # As a string: conversions resolve every note twice
+        if (layout or self.name) == SHARDED:
+            return os.path.join(self.notes_dir, shard_of(name), name)
+        return os.path.join(self.notes_dir, name)
+
+    def path_for_name(self, name: str) -> Path:
+        """
+        Path of the note file called `name` ("My_Note.md").
+        """
+        path = self.location(name)
+        if self.migrating_from is not None and not path.exists():
+            previous = self.location(name, self.migrating_from)
+            if previous.exists():
+                return previous
+        return path
+
+    # ------------------------------------------------------------------
+    # Scanning
+    # ------------------------------------------------------------------
+    def scan(self) -> NoteFiles:
+        """
+        Stat every note file, with one os.scandir() per directory.
+
+        Shards are listed by several threads, which overlap the
+        latency of directory reads (large on network filesystems).
+        """
+        files: NoteFiles = {}
+        # The current layout last: its copy wins if a note is in both
+        for layout in (self.migrating_from, self.name):
+            if layout == FLAT:
+                files.update(_scan_dir(str(self.notes_dir)))
+            elif layout == SHARDED:
+                files.update(_scan_shards(str(self.notes_dir)))
+        return files
+
+    def directories(self) -> List[str]:
+        """
+        Every directory that can hold note files (all leaf shards of
+        the sharded layout).
+        """
+        directories = []
+        for layout in (self.migrating_from, self.name):
+            if layout == FLAT:
+                directories.append(str(self.notes_dir))
+            elif layout == SHARDED:
+                level = [str(self.notes_dir)]
+                for _ in range(SHARD_LEVELS):
+                    level = [shard for parent in level for shard in shard_directories(parent)]
+                directories.extend(level)
+        return directories
+
+
+def _scan_dir(directory: str) -> NoteFiles:
+    files: NoteFiles = {}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                name = entry.name
+                if name.endswith(".md") and not name.startswith(".") and entry.is_file():
+                    try:
+                        files[name] = (entry.path, entry.stat())
+                    except FileNotFoundError:
+                        # Removed since the directory was read
+                        pass
+    except FileNotFoundError:
+        pass
+    return files
+
+
+def shard_directories(directory: str) -> List[str]:
+    """
+    Paths of the shard directories directly inside `directory`.
+    """
+    try:
+        with os.scandir(directory) as it:
+            return [
+                entry.path
+                for entry in it
+                if is_shard_name(entry.name) and entry.is_dir(follow_symlinks=False)
+            ]
+    except FileNotFoundError:
+        return []
+
+
+def _scan_shard(directory: str, levels: int = SHARD_LEVELS - 1) -> NoteFiles:
+    if levels == 0:
+        return _scan_dir(directory)
+    files: NoteFiles = {}
+    for shard in shard_directories(directory):
+        files.update(_scan_shard(shard, levels - 1))
+    return files
+
+
+def _scan_shards(notes_dir: str) -> NoteFiles:
+    files: NoteFiles = {}
+    tops = shard_directories(notes_dir)
+    profiling.count("shards", len(tops))
+    if len(tops) <= 1:
+        for top in tops:
+            files.update(_scan_shard(top))
+        return files
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(min(SCAN_THREADS, len(tops))) as pool:
+        for part in pool.map(_scan_shard, tops):
+            files.update(part)
+    return files
+
+
+# ----------------------------------------------------------------------
+# Reading and recording the layout
+# ----------------------------------------------------------------------
+_layouts: Dict[Path, NotesLayout] = {}
+
+
+def load_layout(notes_dir: Path = NOTES_DIR) -> NotesLayout:
+    """
+    Read the layout recorded in a notes directory.
+    """
+    try:
+        with open(notes_dir / LAYOUT_FILE, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except FileNotFoundError:
+        return NotesLayout(notes_dir)
+    return NotesLayout(notes_dir, data.get("layout", FLAT), data.get("migrating_from"))
+
+
+def get_layout(notes_dir: Path = NOTES_DIR) -> NotesLayout:
+    """
+    The layout of a notes directory, read once per process.
+    """
+    layout = _layouts.get(notes_dir)
+    if layout is None:
+        layout = _layouts[notes_dir] = load_layout(notes_dir)
+    return layout
+
+
+def _record_layout(layout: NotesLayout) -> None:
+    path = layout.notes_dir / LAYOUT_FILE
+    if layout.flat:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        fsync_dir(layout.notes_dir)
+    else:
+        atomic_write(
+            path, json.dumps({"layout": layout.name, "migrating_from": layout.migrating_from})
+        )
+    _layouts[layout.notes_dir] = layout
+
+
+# ----------------------------------------------------------------------
+# Converting a notes directory
+# ----------------------------------------------------------------------
+def convert_layout(
+    target: str,
+    lock: Callable[[str], ContextManager[None]],
+    notes_dir: Path = NOTES_DIR,
+) -> int:
+    """
+    Move every note file of `notes_dir` to its place in the `target` layout.
+
+    Safe while other `notes` processes use the directory: the layout is
+    first recorded as being migrated, so notes are looked for in both
+    places, and each note is moved (renamed, with its mtime) while
+    holding the lock `lock(filename)` returns. Commands already running
+    when the conversion starts still use the old layout; notes they
+    write there are moved by further passes. An interrupted conversion
+    is completed by running it again, or undone by converting back.
+
+    Returns the number of notes moved.
+    """
+    source = SHARDED if target == FLAT else FLAT
+    layout = NotesLayout(notes_dir, target, source)
+    _record_layout(layout)
+
+    moved = 0
+    created: Set[str] = set()
+    touched: Set[str] = set()
+    with profiling.span("layout.convert", target=target):
+        # Commands that started before the layout was recorded may still
+        # write notes at their old place: repeat until nothing is left
+        while True:
+            pending = []
+            for name, (found, _) in layout.scan().items():
+                destination = layout._place(name)
+                if found != destination:
+                    pending.append((name, found, destination))
+            moved_now = 0
+            for name, found, destination in pending:
+                parent = os.path.dirname(destination)
+                with lock(name):
+                    # Moved meanwhile, or a stray copy that must not
+                    # overwrite the note already in place
+                    if not os.path.exists(found) or os.path.exists(destination):
+                        continue
+                    if parent not in created:
+                        os.makedirs(parent, exist_ok=True)
+                        created.add(parent)
+                    os.rename(found, destination)
+                touched.update((os.path.dirname(found), parent))
+                moved_now += 1
+            moved += moved_now
+            # Files that cannot be moved would be found again forever
+            if not moved_now:
+                break
+
+        # The renames must be on disk before the layout says they
+        # happened; one sync beats an fsync of thousands of shards
+        if hasattr(os, "sync"):
+            os.sync()
+        else:
+            for directory in touched:
+                fsync_dir(Path(directory))
+        if target == FLAT:
+            _remove_empty_shards(str(notes_dir))
+        _record_layout(NotesLayout(notes_dir, target))
+    return moved
+
+
+def _remove_empty_shards(directory: str, levels: int = SHARD_LEVELS) -> None:
+    for shard in shard_directories(directory):
+        if levels > 1:
+            _remove_empty_shards(shard, levels - 1)
+        try:
+            os.rmdir(shard)
+        except OSError:
+            # Not empty
+            pass
@@ -0,0 +1,375 @@
+import math
+import re
+import sqlite3
+from contextlib import closing
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..config import SEARCH_DB_PATH
+from ..models.note import Note
+from ..utils import profiling
+from ..utils.hashing import content_hash
+from .backends import get_backend
+
+# Words are runs of Unicode letters/digits, matched case-insensitively
+_TOKEN_RE = re.compile(r"\w+")
+
+# A query is a mix of "quoted phrases" and bare words
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# BM25 tuning constants (the usual defaults)
+_K1 = 1.2
+_B = 0.75
+
+# Bump when the schema changes; older databases are rebuilt from scratch
+_SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id     INTEGER PRIMARY KEY,
+    title  TEXT UNIQUE NOT NULL,
+    status TEXT NOT NULL,
+    hash   TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    tokens TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    token     TEXT NOT NULL,
+    doc       INTEGER NOT NULL,
+    tf        INTEGER NOT NULL,
+    positions TEXT NOT NULL,
+    PRIMARY KEY (token, doc)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SearchHit(NamedTuple):
+    """
+    One ranked search result.
+    """
+
+    title: str
+    status: str
+    score: float
+
+
+# ----------------------------------------------------------------------
+# Database helpers
+# ----------------------------------------------------------------------
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(str(SEARCH_DB_PATH))
+    # The index can always be rebuilt from the notes, so trade
+    # durability of the last transaction for much faster writes.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+        conn.executescript(
+            "DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS meta;"
+        )
+        conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lower-cased word tokens.
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _positions(text: str) -> Dict[str, List[int]]:
+    """
+    Map each token of a note body to the word positions it occurs at.
+
+    The status comment is skipped so every note does not match
+    "status" and "open".
+    """
+    body = "\n".join(
+        line for line in text.splitlines() if not line.startswith("<!-- status:")
+    )
+    positions: Dict[str, List[int]] = {}
+    for pos, token in enumerate(tokenize(body)):
+        positions.setdefault(token, []).append(pos)
+    return positions
+
+
+# ----------------------------------------------------------------------
+# Indexing
+# ----------------------------------------------------------------------
+def _drop_document(conn: sqlite3.Connection, title: str) -> None:
+    """
+    Remove a note and its postings.
+
+    Each document row lists its own tokens, so postings are deleted by
+    primary key instead of needing a second index on `doc`.
+    """
+    row = conn.execute("SELECT id, tokens FROM docs WHERE title = ?", (title,)).fetchone()
+    if row is not None:
+        doc, tokens = row
+        conn.executemany(
+            "DELETE FROM postings WHERE token = ? AND doc = ?",
+            ((token, doc) for token in tokens.split()),
+        )
+        conn.execute("DELETE FROM docs WHERE id = ?", (doc,))
+
+
+def _index_document(conn: sqlite3.Connection, title: str, text: str) -> None:
+    """
+    (Re)index one note: replace its document row and all its postings.
+    """
+    positions = _positions(text)
+    profiling.count("notes_indexed")
+
+    _drop_document(conn, title)
+    cur = conn.execute(
+        "INSERT INTO docs (title, status, hash, length, tokens) VALUES (?, ?, ?, ?, ?)",
+        (
+            title,
+            Note._extract_status(text),
+            content_hash(text.encode("utf-8")),
+            sum(len(p) for p in positions.values()),
+            " ".join(positions),
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO postings (token, doc, tf, positions) VALUES (?, ?, ?, ?)",
+        (
+            (token, cur.lastrowid, len(pos), " ".join(map(str, pos)))
+            for token, pos in positions.items()
+        ),
+    )
+
+
+def update_search_entry(title: str) -> None:
+    """
+    Index a created or modified note.
+    """
+    with profiling.span("search.update"), closing(_connect()) as conn, conn:
+        try:
+            _index_document(conn, title, get_backend().read(title))
+        except FileNotFoundError:
+            _drop_document(conn, title)
+
+
+def update_search_status(title: str, previous_hash: Optional[str]) -> None:
+    """
+    Record a note's new status without re-indexing its text.
+
+    Status comments are not indexed as words, so only the document
+    row's status and hash change, provided the row was indexed from
+    the note as it was before (`previous_hash`); otherwise the note is
+    re-indexed.
+    """
+    update_search_statuses([(title, previous_hash)])
+
+
+def update_search_statuses(changes: Iterable[Tuple[str, Optional[str]]]) -> None:
+    """
+    `update_search_status` for many (title, previous_hash) pairs, in a
+    single transaction.
+    """
+    backend = get_backend()
+    with profiling.span("search.update"), closing(_connect()) as conn, conn:
+        for title, previous_hash in changes:
+            record = backend.record(title)
+            if record is None:
+                _drop_document(conn, title)
+                continue
+            cur = conn.execute(
+                "UPDATE docs SET status = ?, hash = ? WHERE title = ? AND hash = ?",
+                (record.status, record.hash, title, previous_hash),
+            )
+            if cur.rowcount == 0:
+                try:
+                    _index_document(conn, title, backend.read(title))
+                except FileNotFoundError:
+                    _drop_document(conn, title)
+
+
+def remove_search_entry(title: str) -> None:
+    """
+    Remove a deleted note from the search index.
+    """
+    remove_search_entries([title])
+
+
+def remove_search_entries(titles: Iterable[str]) -> None:
+    """
+    Remove several deleted notes in a single transaction.
+    """
+    with profiling.span("search.remove"), closing(_connect()) as conn, conn:
+        for title in titles:
+            _drop_document(conn, title)
+
+
+def _backend_stamp(backend) -> Optional[str]:
+    stamp = backend.change_stamp()
+    return None if stamp is None else f"{backend.name}:{stamp}"
+
+
+def sync_search_index() -> None:
+    """
+    Reconcile the search index with the stored notes.
+
+    Compares the content hashes reported by the storage backend with
+    the indexed ones, so notes added, changed or removed outside of
+    `notes` (e.g. edited directly) are picked up; unchanged notes are
+    not read. The backend's change stamp is recorded, so searches can
+    tell whether another sync is needed.
+    """
+    backend = get_backend()
+    with profiling.span("search.sync"):
+        # Taken first: anything changing during the sync moves it on
+        stamp = _backend_stamp(backend)
+        hashes = {record.title: record.hash for record in backend.records()}
+        with closing(_connect()) as conn, conn:
+            conn.execute("DELETE FROM meta WHERE key = 'synced'")
+            if stamp is not None:
+                conn.execute("INSERT INTO meta (key, value) VALUES ('synced', ?)", (stamp,))
+            indexed = dict(conn.execute("SELECT title, hash FROM docs"))
+
+            for title in indexed.keys() - hashes.keys():
+                _drop_document(conn, title)
+
+            for title, note_hash in hashes.items():
+                if indexed.get(title) != note_hash:
+                    try:
+                        _index_document(conn, title, backend.read(title))
+                    except FileNotFoundError:
+                        _drop_document(conn, title)
+
+
+def _sync_if_stale() -> None:
+    """
+    Sync the index unless no note was added, removed or replaced since
+    the last sync, or a watcher keeps the index current.
+
+    Checking costs a stat() of the notes directory (or its shards)
+    instead of the metadata of every note.
+    """
+    from .index import is_watched
+
+    if is_watched():
+        return
+    stamp = _backend_stamp(get_backend())
+    if stamp is not None:
+        with closing(_connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'synced'").fetchone()
+        if row is not None and row[0] == stamp:
+            profiling.count("search_sync_skipped")
+            return
+    sync_search_index()
+
+
+# ----------------------------------------------------------------------
+# Querying
+# ----------------------------------------------------------------------
+def _parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """
+    Split a query into bare word tokens and phrases (lists of tokens).
+    """
+    words: List[str] = []
+    phrases: List[List[str]] = []
+    for phrase, word in _QUERY_RE.findall(query):
+        tokens = tokenize(phrase or word)
+        if phrase and len(tokens) > 1:
+            phrases.append(tokens)
+        else:
+            words.extend(tokens)
+    return words, phrases
+
+
+def _has_phrase(postings: Dict[str, Dict[int, Tuple[int, str]]], doc: int, phrase: List[str]) -> bool:
+    """
+    True if the tokens of `phrase` occur consecutively in `doc`.
+    """
+    starts = {int(p) for p in postings[phrase[0]][doc][1].split()}
+    for offset, token in enumerate(phrase[1:], start=1):
+        following = {int(p) - offset for p in postings[token][doc][1].split()}
+        starts &= following
+        if not starts:
+            return False
+    return True
+
+
+def search(query: str, status: Optional[str] = None, limit: int = 20) -> List[SearchHit]:
+    """
+    Find notes matching every word and phrase in `query`.
+
+    Parameters
+    ----------
+    query : str
+        Words and "quoted phrases"; all of them must match
+    status : str, optional
+        Only return notes with this status
+    limit : int
+        Maximum number of results
+
+    Returns
+    -------
+    list of SearchHit
+        Matching notes, best BM25 score first
+    """
+    words, phrases = _parse_query(query)
+    tokens = sorted(set(words).union(*phrases))
+    if not tokens:
+        return []
+
+    _sync_if_stale()
+    with profiling.span("search.query"), closing(_connect()) as conn:
+        # token -> {doc: (tf, positions)}
+        postings: Dict[str, Dict[int, Tuple[int, str]]] = {}
+        candidates = None
+        for token in tokens:
+            rows = conn.execute(
+                "SELECT doc, tf, positions FROM postings WHERE token = ?", (token,)
+            )
+            postings[token] = {doc: (tf, pos) for doc, tf, pos in rows}
+            docs = postings[token].keys()
+            candidates = set(docs) if candidates is None else candidates & docs
+            if not candidates:
+                return []
+
+        candidates = {
+            doc for doc in candidates
+            if all(_has_phrase(postings, doc, phrase) for phrase in phrases)
+        }
+        if not candidates:
+            return []
+
+        total_docs, avg_length = conn.execute(
+            "SELECT COUNT(*), AVG(length) FROM docs"
+        ).fetchone()
+        avg_length = avg_length or 1
+
+        hits = []
+        ids = sorted(candidates)
+        # Stay below SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            sql = (
+                "SELECT id, title, status, length FROM docs "
+                f"WHERE id IN ({','.join('?' * len(chunk))})"
+            )
+            params: list = list(chunk)
+            if status is not None:
+                sql += " AND status = ?"
+                params.append(status)
+
+            for doc, title, doc_status, length in conn.execute(sql, params):
+                score = 0.0
+                for token in tokens:
+                    df = len(postings[token])
+                    tf = postings[token][doc][0]
+                    idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                    score += idf * tf * (_K1 + 1) / (
+                        tf + _K1 * (1 - _B + _B * length / avg_length)
+                    )
+                hits.append(SearchHit(title, doc_status, score))
+
+    hits.sort(key=lambda hit: (-hit.score, hit.title))
+    return hits[:limit]
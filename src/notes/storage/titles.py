@@ -0,0 +1,284 @@
+import json
+import re
+import unicodedata
+from bisect import bisect_left
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..config import NOTES_DIR, TITLES_PATH
+from ..utils import profiling
+
+if TYPE_CHECKING:
+    from .backends import StorageBackend
+
+# ----------------------------------------------------------------------
+# Titles ↔ filenames
+# ----------------------------------------------------------------------
+# Spaces become underscores, as they always did, so existing note files
+# keep their titles. Everything that would make the mapping ambiguous or
+# unsafe is escaped as %XX (UTF-8 bytes): underscores ("a_b" must not
+# become the file of "a b"), slashes, a leading dot (hidden files are no
+# notes), and a percent sign that is followed by two hex digits.
+_UNSAFE = re.compile(r"[_/]|^\.|%(?=[0-9A-F]{2})")
+_ESCAPED = re.compile(r"(?:%[0-9A-F]{2})+")
+
+# Longest filename a title may have, in bytes: NAME_MAX (255) minus room
+# for the temporary files of atomic writes and the suffixes of exports
+MAX_FILENAME_BYTES = 200
+
+
+def _escape(match: "re.Match") -> str:
+    return "".join(f"%{byte:02X}" for byte in match.group().encode("utf-8"))
+
+
+def _unescape(match: "re.Match") -> str:
+    # Undecodable bytes come back as surrogates, like undecodable filenames
+    return bytes.fromhex(match.group().replace("%", "")).decode("utf-8", "surrogateescape")
+
+
+def file_stem(title: str) -> str:
+    """
+    Filename of a note title without its suffix ("My Note" → "My_Note").
+
+    The mapping is reversible (see `title_from_filename`), so distinct
+    titles never share a file, and any title, including slashes and
+    arbitrary Unicode, gives a single valid filename.
+    """
+    return _UNSAFE.sub(_escape, title).replace(" ", "_")
+
+
+def filename_for(title: str, suffix: str = ".md") -> str:
+    """
+    Filename of a note title ("a_b/c" → "a%5Fb%2Fc.md").
+    """
+    return file_stem(title) + suffix
+
+
+def title_from_filename(name: str) -> str:
+    """
+    Recover a note's title from its filename ("My_Note.md" → "My Note").
+    """
+    return _ESCAPED.sub(_unescape, Path(name).stem.replace("_", " "))
+
+
+def check_title(title: str) -> None:
+    """
+    Raise ValueError unless `title` can name a new note.
+
+    A title must be a single line, not blank, and short enough for a
+    filename in every storage backend (so notes can be migrated).
+    """
+    if not title.strip():
+        raise ValueError("A note title cannot be empty")
+    if any(unicodedata.category(char) == "Cc" for char in title):
+        raise ValueError(f"Note title {title!r} contains control characters")
+    size = len(filename_for(title).encode("utf-8", "surrogateescape"))
+    if size > MAX_FILENAME_BYTES:
+        raise ValueError(
+            f"Note title is too long ({size} bytes as a filename, at most {MAX_FILENAME_BYTES})"
+        )
+
+
+def normalize_title(title: str) -> str:
+    """
+    Form of a title that equivalent spellings share: Unicode NFC, so a
+    title typed composed ("é") finds a note named decomposed ("e" + "◌́"),
+    as some filesystems and input methods store it.
+    """
+    return unicodedata.normalize("NFC", title)
+
+
+# ----------------------------------------------------------------------
+# Registry of every title
+# ----------------------------------------------------------------------
+class TitleRegistry:
+    """
+    Every note title, with its filename, in memory.
+
+    Looking a title up is a dict access instead of a file system call,
+    and titles can be completed from a prefix (binary search over the
+    case-folded titles) or from a fuzzy query, e.g. for shell
+    completion. Titles are matched in Unicode NFC.
+
+    A registry is a snapshot of the titles when it was loaded. For the
+    filesystem backend it is kept in TITLES_PATH, which stays valid as
+    long as the notes directory's mtime is unchanged (no note added,
+    removed or renamed), so loading it needs neither the metadata index
+    nor a stat() of every note.
+
+    Parameters
+    ----------
+    entries : iterable of (title, filename)
+        Every note, e.g. `TitleRegistry.load()` reads them from a backend
+
+    Examples
+    --------
+    >>> registry = TitleRegistry.load()
+    >>> "Shopping list" in registry
+    >>> registry.complete("meet")
+    ['Meeting 2024-05-01', 'Meeting 2024-05-08']
+    >>> registry.fuzzy("mtg0508")
+    ['Meeting 2024-05-08']
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        self._filenames: Dict[str, str] = {}
+        self._titles: Dict[str, str] = {}
+        order = []
+        for title, filename in entries:
+            if title in self._filenames:
+                continue
+            self._filenames[title] = filename
+            normal = normalize_title(title)
+            self._titles.setdefault(normal, title)
+            order.append((normal.casefold(), title))
+        # Completion keys, sorted, with the titles in the same order
+        # (a saved registry is already in this order)
+        if any(order[row] > order[row + 1] for row in range(len(order) - 1)):
+            order.sort()
+        self._keys = [key for key, _ in order]
+        self._ordered = [title for _, title in order]
+
+    @classmethod
+    def load(cls, backend: Optional["StorageBackend"] = None) -> "TitleRegistry":
+        """
+        Registry of every note stored in `backend` (default: the configured one).
+        """
+        # Lazy import: the backends map filenames back with this module
+        from .backends import FilesystemBackend, get_backend
+        from .index import refresh_index
+
+        backend = backend if backend is not None else get_backend()
+        with profiling.span("titles.load"):
+            if not isinstance(backend, FilesystemBackend):
+                return cls(
+                    (record.title, filename_for(record.title))
+                    for record in backend.iter_records()
+                )
+
+            dir_mtime_ns = NOTES_DIR.stat().st_mtime_ns
+            flat = backend.layout.flat
+            if flat:
+                saved = _load_saved(dir_mtime_ns)
+                if saved is not None:
+                    return cls(saved)
+            # The index knows each file's actual name
+            registry = cls((entry["title"], name) for name, entry in refresh_index().items())
+            if flat:
+                registry._save(dir_mtime_ns)
+            return registry
+
+    def _save(self, dir_mtime_ns: int) -> None:
+        from ..utils.atomic import atomic_write
+
+        data = {
+            "dir_mtime_ns": dir_mtime_ns,
+            "notes": [[title, self._filenames[title]] for title in self._ordered],
+        }
+        # Derived data: rebuilt if lost, so no fsync
+        try:
+            atomic_write(TITLES_PATH, json.dumps(data), fsync=False)
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._filenames)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ordered)
+
+    def __contains__(self, title: object) -> bool:
+        return isinstance(title, str) and self.resolve(title) is not None
+
+    def resolve(self, title: str) -> Optional[str]:
+        """
+        The stored title `title` refers to (itself, or an equivalent
+        Unicode spelling), or None if there is no such note.
+        """
+        if title in self._filenames:
+            return title
+        return self._titles.get(normalize_title(title))
+
+    def filename(self, title: str) -> Optional[str]:
+        """
+        Filename of a note, or None if there is no such note.
+        """
+        title = self.resolve(title)
+        return None if title is None else self._filenames[title]
+
+    def complete(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Titles starting with `prefix` (ignoring case), in order.
+        """
+        key = normalize_title(prefix).casefold()
+        matches = []
+        for row in range(bisect_left(self._keys, key), len(self._keys)):
+            if not self._keys[row].startswith(key) or len(matches) == limit:
+                break
+            matches.append(self._ordered[row])
+        return matches
+
+    def fuzzy(self, query: str, limit: int = 10) -> List[str]:
+        """
+        Titles containing the characters of `query` in order (ignoring
+        case), best first: those matching at word starts and with the
+        fewest characters skipped rank highest.
+        """
+        query = normalize_title(query).casefold().replace(" ", "")
+        if not query:
+            return []
+        # The regular expression finds candidates at C speed; only those
+        # are scored
+        pattern = re.compile(".*?".join(map(re.escape, query)))
+        scored = []
+        for key, title in zip(self._keys, self._ordered):
+            if pattern.search(key):
+                scored.append((_fuzzy_cost(query, key), len(title), title))
+        scored.sort()
+        return [title for _, _, title in scored[:limit]]
+
+
+def _load_saved(dir_mtime_ns: int) -> Optional[List[Tuple[str, str]]]:
+    """
+    The saved (title, filename) pairs, if saved for this directory mtime.
+    """
+    try:
+        with open(TITLES_PATH, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("dir_mtime_ns") != dir_mtime_ns:
+        return None
+    profiling.count("titles", len(data["notes"]))
+    return data["notes"]
+
+
+def _fuzzy_cost(query: str, key: str) -> int:
+    """
+    How loosely `query` matches `key`: the characters skipped, where a
+    jump to the start of a word costs 1 however far it is.
+    """
+    cost = 0
+    position = -1
+    for index, char in enumerate(query):
+        found = key.find(char, position + 1)
+        # A later occurrence at a word start is a better match, as long
+        # as the rest of the query still fits after it
+        start = found
+        while start > 0 and key[start - 1].isalnum():
+            start = key.find(char, start + 1)
+        if start > found and _is_subsequence(query[index + 1:], key, start + 1):
+            found = start
+        skipped = found - position - 1
+        if skipped:
+            cost += 1 if found == 0 or not key[found - 1].isalnum() else skipped
+        position = found
+    return cost
+
+
+def _is_subsequence(chars: str, key: str, position: int) -> bool:
+    for char in chars:
+        position = key.find(char, position) + 1
+        if position == 0:
+            return False
+    return True
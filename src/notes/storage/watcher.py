@@ -0,0 +1,352 @@
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from ..config import NOTES_DIR
+from ..utils.console import console
+from .titles import title_from_filename
+from .layout import SHARD_LEVELS, NotesLayout, get_layout, is_shard_name, shard_directories
+
+# Quiet time that ends a burst of raw events (editor swap files, atomic
+# saves), and the longest a change may wait while events keep coming
+DEBOUNCE_SECONDS = 0.2
+MAX_DELAY_SECONDS = 1.0
+
+# How often the polling fallback rescans the directory
+POLL_INTERVAL_SECONDS = 1.0
+
+# inotify(7) constants
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Raw "name" meaning the directory listing can no longer be trusted
+_RESCAN = ""
+
+
+class ChangeEvent(NamedTuple):
+    """
+    One coalesced change to the notes directory.
+
+    `kind` is "changed" (created or modified), "removed", or "rescan"
+    when individual events were lost and everything must be re-checked
+    (`title` and `path` are then None).
+    """
+
+    kind: str
+    title: Optional[str]
+    path: Optional[Path]
+
+
+Subscriber = Callable[[List[ChangeEvent]], None]
+
+
+# ----------------------------------------------------------------------
+# Raw event sources
+# ----------------------------------------------------------------------
+class _InotifySource:
+    """
+    Changed filenames from the kernel (Linux), read through libc.
+
+    With `depth`, the shard directories below `directory` are watched
+    too (one watch each), including shards created later.
+    """
+
+    def __init__(self, directory: Path, depth: int = 0):
+        import ctypes
+        import ctypes.util
+
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Watch descriptor -> (directory, levels of shards below it)
+        self._watches: Dict[int, Tuple[str, int]] = {}
+        try:
+            self._root = self._watch(str(directory), depth)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _watch(self, directory: str, depth: int, found: Optional[Set[str]] = None) -> int:
+        """
+        Watch a directory and the shards below it. With `found`, collect
+        the names of the files already there (created before the watch).
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(self._ctypes.get_errno(), f"cannot watch {directory}")
+        self._watches[wd] = (directory, depth)
+        if depth > 0:
+            for shard in shard_directories(directory):
+                self._watch(shard, depth - 1, found)
+        elif found is not None:
+            found.update(os.listdir(directory))
+        return wd
+
+    def read(self, timeout: float) -> Set[str]:
+        names: Set[str] = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return names
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & _IN_Q_OVERFLOW or (
+                mask & (_IN_DELETE_SELF | _IN_MOVE_SELF) and wd == self._root
+            ):
+                names.add(_RESCAN)
+            elif mask & _IN_ISDIR:
+                directory, depth = self._watches.get(wd, ("", 0))
+                if depth > 0 and mask & (_IN_CREATE | _IN_MOVED_TO) and is_shard_name(name):
+                    # A new shard: watch it and report what is already in it
+                    try:
+                        self._watch(os.path.join(directory, name), depth - 1, names)
+                    except OSError:
+                        names.add(_RESCAN)
+            elif name:
+                names.add(name)
+        return names
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _PollingSource:
+    """
+    Fallback for platforms without inotify: rescan and compare stat data.
+    """
+
+    def __init__(self, layout: NotesLayout, interval: float = POLL_INTERVAL_SECONDS):
+        self.layout = layout
+        self.interval = interval
+        self.snapshot = self._scan()
+        self.next_scan = time.monotonic() + interval
+
+    def _scan(self) -> Dict[str, Tuple[int, int, int]]:
+        return {
+            name: (st.st_ino, st.st_mtime_ns, st.st_size)
+            for name, (_, st) in self.layout.scan().items()
+        }
+
+    def read(self, timeout: float) -> Set[str]:
+        time.sleep(max(0.0, min(timeout, self.next_scan - time.monotonic())))
+        if time.monotonic() < self.next_scan:
+            return set()
+        self.next_scan = time.monotonic() + self.interval
+
+        old, new = self.snapshot, self._scan()
+        self.snapshot = new
+        return {name for name in old.keys() | new.keys() if old.get(name) != new.get(name)}
+
+    def close(self) -> None:
+        pass
+
+
+# ----------------------------------------------------------------------
+# Watcher with coalescing and subscriptions
+# ----------------------------------------------------------------------
+class NotesWatcher:
+    """
+    Watch the notes directory and report coalesced changes to subscribers.
+
+    Editors save through swap files, backups and atomic renames, so one
+    save produces a burst of raw events. Raw events are collected until
+    the directory has been quiet for `debounce` seconds (or `max_delay`
+    has passed), then each affected note is reported once, as
+    "changed" if it exists at that point and "removed" otherwise.
+    Only `*.md` files are reported; hidden and temporary files are not.
+
+    inotify is used on Linux, with one watch per shard directory for a
+    sharded notes directory; elsewhere (or with `polling=True`, or when
+    the kernel's watch limit is reached) the directory is rescanned
+    every `poll_interval` seconds.
+
+    Subscribers are called on the watcher thread with a list of events.
+
+    Examples
+    --------
+    >>> with NotesWatcher() as watcher:
+    ...     watcher.subscribe(print)
+    ...     time.sleep(60)
+    """
+
+    def __init__(
+        self,
+        directory: Path = NOTES_DIR,
+        debounce: float = DEBOUNCE_SECONDS,
+        max_delay: float = MAX_DELAY_SECONDS,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+        polling: bool = False,
+    ):
+        self.directory = directory
+        self.layout = get_layout(directory)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.polling = polling
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._source = None
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """
+        Call `callback(events)` for every batch of changes.
+
+        Returns a function that cancels the subscription.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    @property
+    def mode(self) -> str:
+        """"inotify" or "polling", once started."""
+        return "inotify" if isinstance(self._source, _InotifySource) else "polling"
+
+    def start(self) -> "NotesWatcher":
+        if self._thread is not None:
+            return self
+        self._source = None
+        if not self.polling and sys.platform.startswith("linux"):
+            try:
+                depth = SHARD_LEVELS if self.layout.sharded else 0
+                self._source = _InotifySource(self.directory, depth)
+            except (OSError, AttributeError):
+                # No inotify (or out of watches): fall back to polling
+                self._source = None
+        if self._source is None:
+            self._source = _PollingSource(self.layout, self.poll_interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notes-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._source.close()
+
+    def __enter__(self) -> "NotesWatcher":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Event loop
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        pending: Set[str] = set()
+        first = last = 0.0
+        while not self._stop.is_set():
+            timeout = self.debounce if pending else 0.5
+            names = self._source.read(timeout)
+            now = time.monotonic()
+            if names:
+                if not pending:
+                    first = now
+                pending |= names
+                last = now
+
+            if pending and (now - last >= self.debounce or now - first >= self.max_delay):
+                events = self._coalesce(pending)
+                pending = set()
+                if events:
+                    self._publish(events)
+
+    def _coalesce(self, names: Set[str]) -> List[ChangeEvent]:
+        if _RESCAN in names:
+            return [ChangeEvent("rescan", None, None)]
+
+        events = []
+        for name in sorted(names):
+            if not name.endswith(".md") or name.startswith("."):
+                continue
+            path = self.layout.path_for_name(name)
+            kind = "changed" if path.is_file() else "removed"
+            events.append(ChangeEvent(kind, title_from_filename(name), path))
+        return events
+
+    def _publish(self, events: List[ChangeEvent]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(events)
+            except Exception as exc:
+                # One failing subscriber must not stop the others
+                console.print(f"[red]Watcher subscriber failed:[/red] {exc}")
+
+
+# ----------------------------------------------------------------------
+# Subscriber keeping the metadata and search indexes current
+# ----------------------------------------------------------------------
+def update_derived_data(events: List[ChangeEvent]) -> None:
+    """
+    Apply a batch of changes to the metadata index and the search index.
+    """
+    from .index import apply_changes, refresh_index
+    from .search import remove_search_entry, sync_search_index, update_search_entry
+
+    if any(event.kind == "rescan" for event in events):
+        refresh_index(full=True)
+        sync_search_index()
+        return
+
+    apply_changes(
+        changed=[e.path for e in events if e.kind == "changed"],
+        removed=[e.path for e in events if e.kind == "removed"],
+    )
+    for event in events:
+        if event.kind == "changed":
+            update_search_entry(event.title)
+        else:
+            remove_search_entry(event.title)
@@ -0,0 +1,111 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+
+from . import profiling
+
+
+# ----------------------------------------------------------------------
+# Crash-safe file replacement
+# ----------------------------------------------------------------------
+def _temp_path(path: Path) -> Path:
+    # Hidden and without the target's suffix, so note scans, the watcher
+    # and the index never mistake it for a note
+    return path.with_name(f".{path.name}.{os.getpid()}.{os.urandom(4).hex()}.tmp")
+
+
+def fsync_dir(directory: Path) -> None:
+    """
+    Make a rename durable (POSIX); a no-op where directories cannot be opened.
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_writer(
+    path: Path,
+    mtime: Optional[float] = None,
+    fsync: bool = True,
+    sync_dir: bool = True,
+) -> Iterator[BinaryIO]:
+    """
+    Write a file through a temporary file that replaces `path` at the end.
+
+    Readers see either the old or the new content, never a partial file,
+    and an exception inside the block leaves `path` untouched. The file
+    keeps the permissions of the one it replaces.
+
+    Parameters
+    ----------
+    path : Path
+        File to create or replace
+    mtime : float or None
+        Modification time to give the new file
+    fsync : bool
+        Flush data and the rename to disk (off for caches that can be
+        rebuilt)
+    sync_dir : bool
+        With `fsync`, also flush the directory entry. Batch writers turn
+        this off and call `fsync_dir` once at the end.
+
+    Examples
+    --------
+    >>> with atomic_writer(path) as fh:
+    ...     fh.write(b"...")
+    """
+    path = Path(path)
+    tmp_path = _temp_path(path)
+    # O_EXCL: never follow or reuse someone else's file; 0o666 is
+    # reduced by the umask exactly like a plain open()
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            yield fh
+            fh.flush()
+            profiling.count("files_written")
+            profiling.count("bytes_written", fh.tell())
+            try:
+                os.chmod(fh.fileno(), os.stat(path).st_mode & 0o7777)
+            except (FileNotFoundError, AttributeError, NotImplementedError):
+                pass
+            if fsync:
+                os.fsync(fh.fileno())
+        if mtime is not None:
+            os.utime(tmp_path, (mtime, mtime))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+    if fsync and sync_dir:
+        fsync_dir(path.parent)
+
+
+def atomic_write(
+    path: Path,
+    data: Union[str, bytes],
+    mtime: Optional[float] = None,
+    fsync: bool = True,
+    sync_dir: bool = True,
+) -> None:
+    """
+    Replace `path` with `data` (text is stored as UTF-8, newlines as given).
+
+    See `atomic_writer`.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with atomic_writer(path, mtime=mtime, fsync=fsync, sync_dir=sync_dir) as fh:
+        fh.write(data)
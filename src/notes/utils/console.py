@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+# ----------------------------------------------------------------------
+# Shared Rich console, created on first use
+# ----------------------------------------------------------------------
+class _LazyConsole:
+    """
+    Stand-in for a `rich.console.Console` that imports Rich only when
+    something is actually printed.
+
+    Commands that succeed silently (e.g. `notes edit`) never pay for
+    loading Rich.
+    """
+
+    def __init__(self):
+        self._console = None
+        self._redirected = None
+
+    def __getattr__(self, name):
+        if self._redirected is not None:
+            return getattr(self._redirected, name)
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return getattr(self._console, name)
+
+    @contextmanager
+    def redirect(self, target) -> Iterator[None]:
+        """
+        Send all output to another console for the duration of the block.
+
+        Used by the daemon to stream a command's output to its client.
+        """
+        previous, self._redirected = self._redirected, target
+        try:
+            yield
+        finally:
+            self._redirected = previous
+
+
+# Console instance for styled terminal output
+console = _LazyConsole()
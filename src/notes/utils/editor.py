@@ -1,9 +1,8 @@
 import os
 import subprocess
-from rich.console import Console
 
 # Rich console instance for styled error messages
-console = Console()
+from .console import console
 
 
 # ----------------------------------------------------------------------
@@ -0,0 +1,29 @@
+import hashlib
+from typing import BinaryIO
+
+# Bytes read at a time when hashing files
+CHUNK_SIZE = 1 << 20
+
+
+# ----------------------------------------------------------------------
+# Content hashing
+# ----------------------------------------------------------------------
+def content_hash(data: bytes) -> str:
+    """
+    Return a stable hex digest identifying the given bytes.
+
+    Used to detect whether a note's content changed between runs.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def stream_hash(fh: BinaryIO, head: bytes = b"") -> str:
+    """
+    Like `content_hash`, for `head` followed by the rest of an open file.
+
+    The file is read in chunks, so large notes are never held in memory.
+    """
+    digest = hashlib.sha256(head)
+    for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
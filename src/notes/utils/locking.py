@@ -0,0 +1,105 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only exclude threads of one process
+    fcntl = None
+
+
+# ----------------------------------------------------------------------
+# Advisory file locks
+# ----------------------------------------------------------------------
+class _Holder:
+    """
+    This process's claim on one lock file, shared by its threads.
+    """
+
+    def __init__(self):
+        self.rlock = threading.RLock()
+        self.users = 0
+        self.depth = 0
+        self.fd: Optional[int] = None
+
+
+_registry_lock = threading.Lock()
+_holders: Dict[str, _Holder] = {}
+
+
+def _acquire(path: Path) -> int:
+    """
+    Open and flock() the lock file, retrying if it was unlinked meanwhile.
+    """
+    while True:
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_CLOEXEC", 0), 0o600)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            continue
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # The previous holder unlinks the file before unlocking it;
+            # a lock on the unlinked file excludes nobody, so start over
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+
+
+def _release(path: Path, fd: int) -> None:
+    # Unlinking while still holding the lock keeps the lock directory
+    # from filling up with one file per note ever touched
+    try:
+        if fcntl is not None:
+            path.unlink()
+    except FileNotFoundError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive advisory lock named by `path`.
+
+    The lock excludes other processes (flock) and other threads of this
+    process, and is re-entrant: a thread already holding it may take it
+    again. The lock file exists only while the lock is held.
+
+    Advisory means only code that takes the same lock is excluded;
+    editors and other programs are not. On platforms without fcntl,
+    only threads of the same process are excluded.
+    """
+    key = os.fspath(path)
+    with _registry_lock:
+        holder = _holders.setdefault(key, _Holder())
+        holder.users += 1
+
+    holder.rlock.acquire()
+    try:
+        if holder.depth == 0:
+            holder.fd = _acquire(Path(path))
+        holder.depth += 1
+        try:
+            yield
+        finally:
+            holder.depth -= 1
+            if holder.depth == 0:
+                _release(Path(path), holder.fd)
+                holder.fd = None
+    finally:
+        holder.rlock.release()
+        with _registry_lock:
+            holder.users -= 1
+            if holder.users == 0:
+                del _holders[key]
@@ -0,0 +1,388 @@
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Deliberately light: imported by the storage layer on every command, so
+# everything needed only while profiling (threading, json, cProfile,
+# Rich) is imported by start() and stop().
+
+
+# ----------------------------------------------------------------------
+# Timing spans
+# ----------------------------------------------------------------------
+class Span:
+    """
+    One timed region of a profiled command.
+
+    Spans nest: a span opened while another one is open on the same
+    thread becomes its child. Counters (files read, bytes written,
+    cache hits, ...) are added to the innermost open span with `count()`.
+    """
+
+    __slots__ = ("name", "args", "counters", "parent", "start", "end", "thread")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.counters: Dict[str, int] = {}
+        self.parent: Optional[Span] = None
+        self.start = 0.0
+        self.end = 0.0
+        self.thread = 0
+
+    def __enter__(self) -> "Span":
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        self.thread = _threading.get_ident()
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.end = time.perf_counter()
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        elif self in stack:
+            stack.remove(self)
+        _finished.append(self)
+        return False
+
+    def add(self, counter: str, value: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class _NullSpan:
+    """
+    What `span()` returns while profiling is off: does nothing, cheaply.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def add(self, counter: str, value: int = 1) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+# Set by start(); while False, span() and count() return immediately
+_enabled = False
+_finished: List[Span] = []
+_threading = None
+_local = None
+_origin = 0.0
+_output: Optional[str] = None
+_profiler = None
+_import_timer = None
+
+
+def _stack() -> List[Span]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def span(name: str, **args):
+    """
+    Time a block as a named span while profiling is on.
+
+    Keyword arguments (e.g. the note title) are shown in Chrome traces.
+
+    Examples
+    --------
+    >>> with span("index.refresh"):
+    ...     refresh()
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, args)
+
+
+def count(counter: str, value: int = 1) -> None:
+    """
+    Add to a counter of the innermost open span, e.g. count("bytes_read", n).
+    """
+    if not _enabled:
+        return
+    stack = _stack()
+    if stack:
+        stack[-1].add(counter, value)
+
+
+# ----------------------------------------------------------------------
+# Import timing: every module imported while profiling gets a span, so
+# lazily imported dependencies show up where they are first needed
+# ----------------------------------------------------------------------
+class _TimedLoader:
+    def __init__(self, loader):
+        self._loader = loader
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        with span("import", module=module.__name__):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer:
+    """
+    Meta path finder that wraps the loader found by the other finders.
+    """
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader)
+        return spec
+
+
+# ----------------------------------------------------------------------
+# Starting and stopping
+# ----------------------------------------------------------------------
+def start(output: Optional[str] = None) -> None:
+    """
+    Start profiling this process.
+
+    Parameters
+    ----------
+    output : str or None
+        Also write the profile to this file when stopping: cProfile
+        statistics if it ends in ".prof" (spans are not recorded then),
+        otherwise a Chrome trace (JSON, for chrome://tracing or
+        https://ui.perfetto.dev). Without it only the summary is printed.
+    """
+    global _enabled, _threading, _local, _origin, _output, _profiler, _import_timer
+    import threading
+
+    _threading = threading
+    _local = threading.local()
+    _finished.clear()
+    _output = output
+    _origin = time.perf_counter()
+
+    if output is not None and output.endswith(".prof"):
+        # Function-level profile: spans and import timing would only
+        # add overhead to what cProfile measures
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        return
+
+    _import_timer = _ImportTimer()
+    sys.meta_path.insert(0, _import_timer)
+    _enabled = True
+
+
+def stop() -> None:
+    """
+    Stop profiling and report: a summary on stderr, and the output file.
+    """
+    global _enabled, _profiler, _import_timer
+    end = time.perf_counter()
+    _enabled = False
+    if _import_timer is not None:
+        sys.meta_path.remove(_import_timer)
+        _import_timer = None
+
+    from rich.console import Console
+    err = Console(stderr=True)
+
+    if _profiler is not None:
+        _profiler.disable()
+        _report_cprofile(_profiler, err)
+        _profiler = None
+        return
+
+    spans = sorted(_finished, key=lambda s: s.start)
+    _finished.clear()
+    _print_summary(spans, end - _origin, err)
+    if _output is not None:
+        _write_chrome_trace(spans, _output)
+        err.print(
+            f"[dim]Trace written to {_output} "
+            "(open in chrome://tracing or https://ui.perfetto.dev)[/dim]"
+        )
+
+
+# ----------------------------------------------------------------------
+# Reports
+# ----------------------------------------------------------------------
+class _Row:
+    __slots__ = ("calls", "total", "self_time", "counters", "first", "modules")
+
+    def __init__(self, first: float):
+        self.calls = 0
+        self.total = 0.0
+        self.self_time = 0.0
+        self.counters: Dict[str, int] = {}
+        self.first = first
+        # (seconds, name) of the modules imported, for import rows
+        self.modules: List[Tuple[float, str]] = []
+
+
+def _summarize(spans: List[Span]) -> Dict[Tuple[str, ...], _Row]:
+    """
+    Aggregate spans by their path of names from the root.
+
+    A span directly inside one of the same name (an import triggering
+    more imports) is folded into its parent's row, so time is never
+    counted twice.
+    """
+    paths: Dict[int, Tuple[str, ...]] = {}
+    child_time: Dict[int, float] = {}
+    for s in spans:
+        if s.parent is not None:
+            child_time[id(s.parent)] = child_time.get(id(s.parent), 0.0) + s.duration
+
+    rows: Dict[Tuple[str, ...], _Row] = {}
+    for s in spans:
+        parent_path = paths.get(id(s.parent), ()) if s.parent is not None else ()
+        nested = bool(parent_path) and parent_path[-1] == s.name
+        path = parent_path if nested else parent_path + (s.name,)
+        paths[id(s)] = path
+
+        row = rows.get(path)
+        if row is None:
+            row = rows[path] = _Row(s.start)
+        row.calls += 1
+        if not nested:
+            row.total += s.duration
+            if "module" in s.args:
+                row.modules.append((s.duration, s.args["module"]))
+        row.self_time += s.duration - child_time.get(id(s), 0.0)
+        for name, value in s.counters.items():
+            row.counters[name] = row.counters.get(name, 0) + value
+    return rows
+
+
+def _format_details(row: _Row) -> str:
+    parts = []
+    for name, value in sorted(row.counters.items()):
+        if "bytes" in name:
+            parts.append(f"{name}={_format_size(value)}")
+        else:
+            parts.append(f"{name}={value:,}")
+    slowest = sorted(row.modules, reverse=True)[:3]
+    if slowest:
+        parts.append(", ".join(f"{name} {seconds * 1000:.1f}" for seconds, name in slowest))
+    return " ".join(parts)
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _process_age() -> Optional[float]:
+    """
+    Seconds since this process started (Linux only), to show how long
+    the interpreter ran before profiling began.
+    """
+    try:
+        with open("/proc/self/stat", "rb") as fh:
+            fields = fh.read().rsplit(b")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - started
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _print_summary(spans: List[Span], wall: float, err) -> None:
+    from rich.table import Table
+
+    rows = _summarize(spans)
+
+    def order(path: Tuple[str, ...]) -> tuple:
+        # Children under their parent, in the order they first ran
+        return tuple(rows[path[:i]].first for i in range(1, len(path) + 1))
+
+    table = Table(title="Profile", title_justify="left")
+    table.add_column("Span", no_wrap=True)
+    table.add_column("Calls", justify="right")
+    table.add_column("Total ms", justify="right")
+    table.add_column("Self ms", justify="right")
+    table.add_column("%", justify="right")
+    # Counters, or the slowest modules (ms) of an import row
+    table.add_column("Details", style="dim", overflow="fold")
+    for path in sorted(rows, key=order):
+        row = rows[path]
+        table.add_row(
+            "  " * (len(path) - 1) + path[-1],
+            f"{row.calls:,}",
+            f"{row.total * 1000:.1f}",
+            f"{row.self_time * 1000:.1f}",
+            f"{row.total / wall * 100:.0f}" if wall > 0 else "",
+            _format_details(row),
+        )
+    err.print(table)
+
+    footer = f"Profiled {wall * 1000:.1f} ms"
+    age = _process_age()
+    if age is not None:
+        # Interpreter start-up and importing the command line parser
+        footer += f", after {max(0.0, age - wall) * 1000:.0f} ms of process start-up"
+    err.print(f"[dim]{footer}[/dim]")
+
+
+def _write_chrome_trace(spans: List[Span], path: str) -> None:
+    """
+    Write spans in the Trace Event Format ("X" complete events, in µs).
+    """
+    import json
+
+    pid = os.getpid()
+    events = [
+        {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "notes"}},
+    ]
+    for s in spans:
+        args = {key: str(value) for key, value in s.args.items()}
+        args.update(s.counters)
+        events.append({
+            "name": s.name if s.name != "import" else f"import {s.args.get('module')}",
+            "cat": s.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": round((s.start - _origin) * 1e6, 3),
+            "dur": round(s.duration * 1e6, 3),
+            "pid": pid,
+            "tid": s.thread,
+            "args": args,
+        })
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+
+
+def _report_cprofile(profiler, err) -> None:
+    import pstats
+
+    profiler.dump_stats(_output)
+    # Plain text: wrapping pstats' columns would garble them
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+    err.print(f"[dim]cProfile statistics written to {_output} "
+              f"(python -m pstats {_output}, or snakeviz)[/dim]")